@@ -0,0 +1,175 @@
+import time
+import threading
+
+
+# --- Alarm Yaşam Döngüsü ---
+# Sürekli çalışma modunda ilk alarmda program sonlanmaz; her kamera bir durum makinesiyle izlenir:
+# IDLE → SUSPECT (alarm penceresinde isabet var) → ALARM (pencere koşulu sağlandı) → COOLDOWN (isabetler
+# kesildi) → IDLE. COOLDOWN sırasında koşul yeniden sağlanırsa doğrudan ALARM'a dönülür ve aynı olay sürer.
+# Bildirimler (arama/SMS) olay başına ve yeniden bildirim aralığıyla sınırlıdır (NotificationLimiter).
+
+STATE_IDLE = "IDLE"
+STATE_SUSPECT = "SUSPECT"
+STATE_ALARM = "ALARM"
+STATE_COOLDOWN = "COOLDOWN"
+ALARM_STATES = (STATE_IDLE, STATE_SUSPECT, STATE_ALARM, STATE_COOLDOWN)
+
+
+class AlarmStateMachine:
+    """
+    update() her işlenen karede alarm penceresiyle (tracking.SlidingWindowAlarm) çağrılır ve
+    (durum, geçiş) döndürür; geçiş yoksa None, varsa (önceki_durum, yeni_durum).
+    """
+
+    def __init__(self, alarm_clear_seconds=30, cooldown_seconds=300, suspect_clear_score=0.05):
+        self.alarm_clear_seconds = alarm_clear_seconds # Koşul bu süre sağlanmazsa ALARM → COOLDOWN
+        self.cooldown_seconds = cooldown_seconds # COOLDOWN bu süre sakin geçerse → IDLE (olay kapanır)
+        self.suspect_clear_score = suspect_clear_score # SUSPECT'te skor bunun altına düşerse → IDLE
+        self.state = STATE_IDLE
+        self.entered_at = time.monotonic()
+        self._last_triggered = None
+        self.episode = 0 # IDLE dışına her çıkışta artan olay numarası
+        self.alarms = 0
+        self.transitions = {state: 0 for state in ALARM_STATES}
+
+    def update(self, alarm_window, now=None):
+        now = time.monotonic() if now is None else now
+        triggered = alarm_window.triggered
+        if triggered:
+            self._last_triggered = now
+
+        new_state = self.state
+        if self.state == STATE_IDLE:
+            if triggered:
+                new_state = STATE_ALARM
+            elif alarm_window.score > self.suspect_clear_score:
+                new_state = STATE_SUSPECT
+        elif self.state == STATE_SUSPECT:
+            if triggered:
+                new_state = STATE_ALARM
+            elif alarm_window.score <= self.suspect_clear_score:
+                new_state = STATE_IDLE
+        elif self.state == STATE_ALARM:
+            if not triggered and now - self._last_triggered >= self.alarm_clear_seconds:
+                new_state = STATE_COOLDOWN
+        elif self.state == STATE_COOLDOWN:
+            if triggered:
+                new_state = STATE_ALARM
+            elif now - self.entered_at >= self.cooldown_seconds:
+                new_state = STATE_IDLE
+
+        if new_state == self.state:
+            return self.state, None
+        transition = (self.state, new_state)
+        if self.state == STATE_IDLE:
+            self.episode += 1
+        if new_state == STATE_ALARM:
+            self.alarms += 1
+        self.transitions[new_state] += 1
+        self.state = new_state
+        self.entered_at = now
+        return self.state, transition
+
+    @property
+    def active(self):
+        """Alarm sürüyor mu (ALARM veya COOLDOWN)."""
+        return self.state in (STATE_ALARM, STATE_COOLDOWN)
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "state_seconds": round(time.monotonic() - self.entered_at, 1),
+            "episode": self.episode,
+            "alarms": self.alarms,
+            "transitions": dict(self.transitions),
+        }
+
+    def format_stats(self):
+        s = self.stats()
+        return f"[alarm durumu] {s['state']} ({s['state_seconds']} sn) olay={s['episode']} alarm={s['alarms']}"
+
+
+class NotificationLimiter:
+    """
+    Kanal (arama, SMS) başına bildirim sıklığını sınırlar. Bir olayda ilk bildirim hemen gönderilir;
+    alarm sürdükçe en fazla renotify_interval_seconds aralıkla ve max_renotifications kez tekrarlanır.
+    Olay kapandığında (reset) sayaçlar sıfırlanır.
+    """
+
+    def __init__(self, renotify_interval_seconds=600, max_renotifications=3):
+        self.renotify_interval_seconds = renotify_interval_seconds
+        self.max_renotifications = max_renotifications
+        self._lock = threading.Lock()
+        self._sent = {} # kanal -> (son gönderim zamanı, olaydaki gönderim sayısı)
+        self._upgraded = set() # SUSPECT'teki erken bildirimi alarm bildirimiyle tamamlanmış kanallar
+        self._upgrade_retry = set() # Alarm bildirimi gönderilemeyen, sonraki alarm karesinde yeniden denenecek kanallar
+        self.suppressed = 0
+
+    def allow(self, channel, alarm_active, first_alarm=False, now=None):
+        """
+        Gönderim yapılabilirse kanalı işaretler ve True döndürür. first_alarm=True (olayda ALARM'a ilk giriş)
+        ise SUSPECT sırasında yapılmış erken bildirim aralık beklenmeden alarm bildirimiyle tamamlanır.
+        Bu tamamlama sayaca eklenmez; max_renotifications her iki yolda da aynı sayıda tekrar demektir.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            last = self._sent.get(channel)
+            if last is None:
+                self._sent[channel] = (now, 1)
+                return True
+            if (last[1] == 1 and channel not in self._upgraded
+                    and (first_alarm or (alarm_active and channel in self._upgrade_retry))):
+                self._sent[channel] = (now, 1)
+                self._upgraded.add(channel)
+                self._upgrade_retry.discard(channel)
+                return True
+            sent_at, count = last
+            if (alarm_active and count <= self.max_renotifications
+                    and now - sent_at >= self.renotify_interval_seconds):
+                self._sent[channel] = (now, count + 1)
+                return True
+            self.suppressed += 1
+            return False
+
+    def revoke(self, channel):
+        """Gönderim başarısız olduysa işareti geri alır; bir sonraki karede yeniden denenir."""
+        with self._lock:
+            last = self._sent.get(channel)
+            if last is None:
+                return
+            if last[1] == 1 and channel in self._upgraded:
+                # Alarm bildirimi gönderilemedi: erken bildirim korunur, sonraki alarm karesinde yeniden denenir
+                self._upgraded.discard(channel)
+                self._upgrade_retry.add(channel)
+            elif last[1] <= 1:
+                del self._sent[channel]
+            else:
+                self._sent[channel] = (last[0] - self.renotify_interval_seconds, last[1] - 1)
+
+    def reset(self):
+        with self._lock:
+            self._sent.clear()
+            self._upgraded.clear()
+            self._upgrade_retry.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sent": {channel: count for channel, (_, count) in self._sent.items()},
+                "suppressed": self.suppressed,
+            }
+
+
+def create_alarm_state_machine(config):
+    """CONFIG["alarm_lifecycle"] ayarlarından kamera başına alarm durum makinesini oluşturur."""
+    lifecycle_config = config.get("alarm_lifecycle") or {}
+    return AlarmStateMachine(alarm_clear_seconds=lifecycle_config.get("alarm_clear_seconds", 30),
+                             cooldown_seconds=lifecycle_config.get("cooldown_seconds", 300),
+                             suspect_clear_score=lifecycle_config.get("suspect_clear_score", 0.05))
+
+
+def create_notification_limiter(config):
+    """CONFIG["alarm_lifecycle"] ayarlarından bildirim sınırlayıcısını oluşturur."""
+    lifecycle_config = config.get("alarm_lifecycle") or {}
+    return NotificationLimiter(renotify_interval_seconds=lifecycle_config.get("renotify_interval_seconds", 600),
+                               max_renotifications=lifecycle_config.get("max_renotifications", 3))
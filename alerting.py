@@ -0,0 +1,183 @@
+import logging
+import threading
+from concurrent.futures import Future
+
+import metrics
+from logs import fields
+from modem_manager import PRIORITY_ALARM, CALL_ANSWERED, CALL_FAILED
+
+
+# --- Çok Alıcılı Uyarı ve Arama Yükseltme ---
+# Nöbet listesindeki her alıcı SMS alabilir ve/veya arama sırasına (call_order) sahip olabilir.
+# SMS eşiğinde mesaj tüm SMS alıcılarına tek modem işinde art arda gider (AT+CMGF bir kez) ve alıcı başına
+# gönderim durumu tutulur. Arama eşiğinde alıcılar call_order sırasıyla aranır; her arama ring_seconds
+# çalar ve biri açtığında (VOICE CALL: BEGIN veya +CLCC) yükseltme durur. Aramalar arasında modem
+# GPS/SMS işleri için serbesttir; tespit döngüsü hiçbir aşamada beklemez.
+
+log = logging.getLogger(__name__)
+ALERT_SMS = metrics.counter("alert_sms", "Alıcı başına uyarı SMS'i sonuçları", ("result",))
+ALERT_CALLS = metrics.counter("alert_calls", "Arama yükseltme sonuçları (answered, no_answer, busy, failed)", ("result",))
+
+
+def load_recipients(config):
+    """
+    CONFIG["recipients"] listesini doğrular ve {name, number, sms, call_order} sözlükleri döndürür.
+    Liste boşsa phone_number hem SMS hem arama alan tek alıcıdır (eski ayarlarla uyumluluk).
+    """
+    entries = config.get("recipients") or [{"name": "varsayılan", "number": config["phone_number"], "call_order": 1}]
+    recipients = []
+    for index, entry in enumerate(entries):
+        number = str(entry.get("number") or "").strip()
+        if not number:
+            raise ValueError(f"recipients[{index}]: 'number' eksik")
+        call_order = entry.get("call_order")
+        if call_order is not None and (not isinstance(call_order, int) or isinstance(call_order, bool)):
+            raise ValueError(f"recipients[{index}]: 'call_order' tam sayı veya None olmalı, verilen: {call_order!r}")
+        recipients.append({"name": entry.get("name") or number, "number": number,
+                           "sms": bool(entry.get("sms", True)), "call_order": call_order})
+    if not any(r["sms"] or r["call_order"] is not None for r in recipients):
+        raise ValueError("En az bir alıcı SMS veya arama almalı")
+    return recipients
+
+
+def primary_number(recipients):
+    """Arama sırasındaki ilk alıcının (yoksa ilk SMS alıcısının) numarası."""
+    callers = sorted((r for r in recipients if r["call_order"] is not None), key=lambda r: r["call_order"])
+    return (callers or [r for r in recipients if r["sms"]])[0]["number"]
+
+
+class AlertDispatcher:
+    """
+    send_sms(mesaj) : Tüm SMS alıcılarına art arda gönderir. Future sonucu: en az bir alıcıya gittiyse True.
+    escalate()      : Arama sırasıyla arar, biri açınca durur. Future sonucu: en az bir arama başlatıldıysa
+                      (arama listesi boşsa da) True.
+    Son gönderimin alıcı başına durumu stats() ile okunur.
+    """
+
+    def __init__(self, modem, recipients, ring_seconds=20, talk_seconds=20, rounds=1, priority=PRIORITY_ALARM):
+        self.modem = modem
+        self.sms_recipients = [r for r in recipients if r["sms"]]
+        self.call_recipients = sorted((r for r in recipients if r["call_order"] is not None), key=lambda r: r["call_order"])
+        self.ring_seconds = ring_seconds
+        self.talk_seconds = talk_seconds
+        self.rounds = rounds # Kimse açmazsa arama listesi kaç kez dolaşılır
+        self.priority = priority
+        self._lock = threading.Lock()
+        self.last_sms_status = {} # ad -> "sent" / "failed"
+        self.last_escalation = [] # (ad, arama sonucu)
+        self.answered_by = None
+        self.sms_sent = 0
+        self.sms_failed = 0
+        self.calls = 0
+        self.escalations = 0
+
+    def send_sms(self, message):
+        result = Future()
+        result.set_running_or_notify_cancel()
+        if not self.sms_recipients:
+            result.set_result(True) # SMS alacak alıcı yok; yeniden denenecek bir şey de yok
+            return result
+
+        def on_done(sms_future):
+            if sms_future.cancelled() or sms_future.exception() is not None:
+                result.set_result(False)
+                return
+            delivered = sms_future.result()
+            status = {r["name"]: "sent" if delivered.get(r["number"]) else "failed" for r in self.sms_recipients}
+            failed = [name for name, value in status.items() if value == "failed"]
+            with self._lock:
+                self.last_sms_status = status
+                self.sms_sent += len(status) - len(failed)
+                self.sms_failed += len(failed)
+            ALERT_SMS.labels(result="sent").inc(len(status) - len(failed))
+            if failed:
+                ALERT_SMS.labels(result="failed").inc(len(failed))
+                log.error("Uyarı SMS'i %d/%d alıcıya gönderilemedi: %s", len(failed), len(status), ", ".join(failed))
+            else:
+                log.info("Uyarı SMS'i tüm alıcılara gönderildi (%d).", len(status), extra=fields(recipients=", ".join(status)))
+            result.set_result(len(failed) < len(status))
+
+        numbers = [r["number"] for r in self.sms_recipients]
+        self.modem.send_short_messages(numbers, message, self.priority).add_done_callback(on_done)
+        return result
+
+    def escalate(self):
+        result = Future()
+        result.set_running_or_notify_cancel()
+        if not self.call_recipients:
+            result.set_result(True) # Yalnızca SMS alan liste; aranacak kimse yok, yeniden denenecek bir şey de yok
+            return result
+        order = self.call_recipients * self.rounds
+        attempts = []
+        with self._lock:
+            self.escalations += 1
+            self.last_escalation = attempts
+            self.answered_by = None
+
+        def finish(answered_by):
+            with self._lock:
+                self.answered_by = answered_by
+            if answered_by is None and order:
+                log.error("Arama yükseltmesi tamamlandı, kimse açmadı.", extra=fields(attempts=len(attempts)))
+            result.set_result(any(outcome != CALL_FAILED for _, outcome in attempts))
+
+        def call_next(index):
+            if index >= len(order):
+                finish(None)
+                return
+            recipient = order[index]
+            log.warning("Arama yükseltmesi %d/%d: %s aranıyor.", index + 1, len(order), recipient["name"],
+                        extra=fields(number=recipient["number"]))
+
+            def on_done(call_future):
+                if call_future.cancelled():
+                    finish(None) # Modem durduruluyor
+                    return
+                outcome = CALL_FAILED if call_future.exception() is not None else call_future.result()
+                attempts.append((recipient["name"], outcome))
+                with self._lock:
+                    self.calls += 1
+                ALERT_CALLS.labels(result=outcome).inc()
+                if outcome == CALL_ANSWERED:
+                    log.warning("Arama %s tarafından açıldı; yükseltme durduruldu.", recipient["name"])
+                    finish(recipient["name"])
+                    return
+                log.info("%s aramayı açmadı (%s).", recipient["name"], outcome)
+                call_next(index + 1)
+
+            self.modem.call(recipient["number"], self.ring_seconds, self.talk_seconds, self.priority).add_done_callback(on_done)
+
+        call_next(0)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sms_recipients": len(self.sms_recipients),
+                "call_recipients": len(self.call_recipients),
+                "last_sms_status": dict(self.last_sms_status),
+                "sms_sent": self.sms_sent,
+                "sms_failed": self.sms_failed,
+                "escalations": self.escalations,
+                "calls": self.calls,
+                "last_escalation": list(self.last_escalation),
+                "answered_by": self.answered_by,
+            }
+
+    def format_stats(self):
+        s = self.stats()
+        sms = " ".join(f"{name}={value}" for name, value in s["last_sms_status"].items()) or "-"
+        calls = " → ".join(f"{name}:{outcome}" for name, outcome in s["last_escalation"]) or "-"
+        return (f"[uyarı] sms: gönderilen={s['sms_sent']} hata={s['sms_failed']} (son: {sms}) "
+                f"arama: yükseltme={s['escalations']} arama={s['calls']} (son: {calls})")
+
+
+def create_alert_dispatcher(config, modem):
+    """CONFIG["recipients"] ve CONFIG["alerting"] ayarlarından uyarı dağıtıcısını oluşturur."""
+    alerting_config = config.get("alerting") or {}
+    return AlertDispatcher(
+        modem, load_recipients(config),
+        ring_seconds=alerting_config.get("ring_seconds", 20),
+        talk_seconds=alerting_config.get("talk_seconds", 20),
+        rounds=alerting_config.get("escalation_rounds", 1),
+    )
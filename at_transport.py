@@ -0,0 +1,286 @@
+import time
+import queue
+import logging
+import threading
+
+import metrics
+
+
+# --- Olay Güdümlü AT Komut Katmanı ---
+# Seri porttan gelen satırlar ayrı bir okuyucu iş parçacığında okunur. Bir komut, sonuç kodu
+# (OK, ERROR, +CME ERROR, +CMS ERROR veya '>' istemi) görüldüğü anda tamamlanır; zaman aşımı
+# yalnızca üst sınırdır. Komuta ait olmayan kendiliğinden gelen satırlar (URC) abonelere iletilir.
+
+FINAL_OK = ("OK",)
+FINAL_ERROR = ("ERROR", "+CME ERROR", "+CMS ERROR", "COMMAND NOT SUPPORT")
+PROMPT = ">"
+ESCAPE = b"\x1b" # Metin girişini (SMS '>' istemi) iptal eder
+# Zaman aşımına uğrayan komutun geç gelen sonuç kodu bu süre boyunca yok sayılır; sonraki komut bu süre
+# dolmadan gönderilmez, böylece geç OK/ERROR yeni komutu tamamlayamaz
+LATE_RESPONSE_GRACE_SECONDS = 0.5
+
+# Komut beklenirken de gelebilen, kendiliğinden (unsolicited) sonuç kodları
+DEFAULT_URC_PREFIXES = (
+    "RING", "+CLIP", "+CMTI", "+CMT:", "+CDS", "NO CARRIER", "BUSY", "NO ANSWER",
+    "VOICE CALL:", "MISSED_CALL", "+CREG:", "+CGREG:", "+CPIN:", "RDY", "SMS DONE", "PB DONE",
+    "+CGPSINFO:", "$GP", "$GN", "+CUSD:", "+CLCC:", "NORMAL POWER DOWN",
+)
+
+log = logging.getLogger(__name__)
+AT_COMMAND_SECONDS = metrics.histogram("at_command_seconds", "AT komutunun sonuç koduna kadar geçen süre",
+                                       ("command", "result"))
+
+
+class ATResponse:
+    """Bir AT komutunun sonucu: ara satırlar, sonuç kodu ve geçen süre."""
+
+    def __init__(self, command):
+        self.command = command
+        self.lines = []
+        self.final = None
+        self.timed_out = False
+        self.elapsed = 0.0
+
+    @property
+    def ok(self):
+        return self.final is not None and (self.final in FINAL_OK or self.final == PROMPT)
+
+    @property
+    def text(self):
+        """Modemin ham yanıtına benzer metin (eski send_at çağrılarıyla uyumluluk için)."""
+        lines = list(self.lines)
+        if self.final is not None:
+            lines.append(self.final)
+        return "\r\n".join(lines)
+
+    def __repr__(self):
+        return f"ATResponse({self.command!r}, final={self.final!r}, lines={self.lines!r}, {self.elapsed * 1000:.0f}ms)"
+
+
+def _is_final(line):
+    if line in FINAL_OK:
+        return True
+    return any(line == code or line.startswith(code + ":") for code in FINAL_ERROR)
+
+
+def _response_prefix(command):
+    """'AT+CGPSINFO' -> '+CGPSINFO', 'AT+CREG?' -> '+CREG'. Bilgi satırlarını komuta bağlamak için."""
+    body = command[2:] if command.upper().startswith("AT") else command
+    for sep in ("=", "?"):
+        body = body.split(sep)[0]
+    return body.upper() if body.startswith(("+", "$")) else None
+
+
+def command_label(command):
+    """Ölçüm etiketi: 'AT+CPIN="1234"' -> 'AT+CPIN', 'ATD+90...;' -> 'ATD' (numara ve PIN etikete girmez)."""
+    prefix = _response_prefix(command)
+    return "AT" + prefix if prefix else command[:3].upper()
+
+
+class ATTransport:
+    """
+    SIM7600 seri portu üzerinde olay güdümlü AT komut taşıyıcısı.
+    command() aynı anda yalnızca bir komutun yürütülmesine izin verir; diğer çağıranlar sırayla bekler.
+    subscribe(önek, geri_çağırma) ile kendiliğinden gelen satırlar ayrı bir dağıtıcı iş parçacığında işlenir,
+    böylece geri çağırmalar içinden de güvenle komut gönderilebilir.
+    """
+
+    def __init__(self, port, urc_prefixes=DEFAULT_URC_PREFIXES, echo=False):
+        self.port = port
+        self.urc_prefixes = tuple(urc_prefixes)
+        self.echo = echo # True ise gönderilen komut ve yanıtlar DEBUG seviyesinde günlüğe yazılır
+        self._subscribers = []
+        self._transaction_lock = threading.RLock()
+        self._state_lock = threading.Lock()
+        self._write_lock = threading.Lock() # Okuyucunun ESC'si ile komut yazımı porta iç içe geçmesin
+        self._pending = None
+        self._pending_prefix = None
+        self._pending_queue = None
+        self._pending_payload = False # Bekleyen komut '>' istemi bekliyor mu (SMS)
+        self._urc_queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._reader = None
+        self._dispatcher = None
+        self._rx_buffer = b""
+        self._late_until = 0.0 # Bu ana kadar beklenmeyen sonuç kodları ve '>' istemi yok sayılır (monotonic)
+        self.urc_count = 0
+        self.late_responses = 0
+
+    # --- Yaşam döngüsü ---
+    def start(self):
+        if self._reader is not None:
+            return
+        self._stop_event.clear()
+        self._reader = threading.Thread(target=self._read_loop, name="at-reader", daemon=True)
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="at-urc-dispatch", daemon=True)
+        self._reader.start()
+        self._dispatcher.start()
+
+    def stop(self, timeout=3):
+        self._stop_event.set()
+        self._urc_queue.put(None)
+        for thread in (self._reader, self._dispatcher):
+            if thread is not None:
+                thread.join(timeout)
+        self._reader = None
+        self._dispatcher = None
+
+    @property
+    def is_open(self):
+        return self.port is not None and self.port.is_open
+
+    # --- Abonelikler ---
+    def subscribe(self, prefix, callback):
+        """prefix ile başlayan kendiliğinden satırlar için callback(line) çağrılır. '' tüm URC'leri alır."""
+        self._subscribers.append((prefix, callback))
+
+    def unsubscribe(self, callback):
+        self._subscribers = [(p, cb) for p, cb in self._subscribers if cb is not callback]
+
+    # --- Komutlar ---
+    def command(self, command, timeout=5, payload=None):
+        """
+        Komutu gönderir ve sonuç kodu gelene kadar (en fazla timeout saniye) bekler.
+        payload verilirse (örn. SMS metni) '>' istemi alındıktan sonra payload + CTRL+Z gönderilir
+        ve asıl sonuç kodu beklenir.
+        Zaman aşımında payload'lı komut için ESC gönderilir (modem metin girişinde kalıp sonraki komutu
+        mesaj metni olarak yutmasın) ve geç gelen sonuç kodları LATE_RESPONSE_GRACE_SECONDS boyunca yok sayılır.
+        """
+        with self._transaction_lock:
+            wait = self._late_until - time.monotonic()
+            if wait > 0:
+                time.sleep(wait) # Önceki komutun geç sonuç kodu bu komutu tamamlamasın
+            response = ATResponse(command)
+            started = time.monotonic()
+            deadline = started + timeout
+            pending = queue.Queue()
+            with self._state_lock:
+                self._pending = response
+                self._pending_prefix = _response_prefix(command)
+                self._pending_queue = pending
+                self._pending_payload = payload is not None
+            try:
+                if self.echo:
+                    log.debug("Gönderiliyor AT: %s", command)
+                self._write((command + '\r\n').encode())
+                final = self._wait_final(pending, deadline)
+                if final == PROMPT and payload is not None:
+                    response.final = None
+                    self._write(payload.encode() + b'\x1A') # CTRL+Z karakteri (mesaj sonu)
+                    final = self._wait_final(pending, deadline)
+                response.final = final
+                response.timed_out = final is None
+                if response.timed_out:
+                    self._late_until = time.monotonic() + LATE_RESPONSE_GRACE_SECONDS
+                    if payload is not None:
+                        self._write(ESCAPE)
+                    log.debug("AT komutu zaman aşımına uğradı: %s", command_label(command))
+            finally:
+                with self._state_lock:
+                    self._pending = None
+                    self._pending_prefix = None
+                    self._pending_queue = None
+                    self._pending_payload = False
+                response.elapsed = time.monotonic() - started
+                result = "timeout" if response.timed_out else "ok" if response.ok else "error"
+                AT_COMMAND_SECONDS.labels(command=command_label(command), result=result).observe(response.elapsed)
+            if self.echo:
+                log.debug("Yanıt: %s (%.0f ms)", response.text.strip(), response.elapsed * 1000)
+            return response
+
+    def _wait_final(self, pending, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        try:
+            return pending.get(timeout=remaining)
+        except queue.Empty:
+            return None
+
+    def write_raw(self, data):
+        """İşlem kilidi altında ham bayt yazar (komut dışı veri için)."""
+        with self._transaction_lock:
+            self._write(data)
+
+    def _write(self, data):
+        """Porta tek parça yazar; okuyucu iş parçacığının ESC'si de buradan geçer, yazımlar bölünmez."""
+        with self._write_lock:
+            self.port.write(data)
+
+    # --- Okuma ---
+    def _read_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                waiting = self.port.in_waiting
+                chunk = self.port.read(waiting or 1)
+            except (OSError, TypeError) as e: # serial.SerialException da OSError'dır
+                if self._stop_event.is_set():
+                    break
+                log.warning("Seri port okuma hatası: %s", e)
+                self._stop_event.wait(0.5)
+                continue
+            if chunk:
+                self._feed(chunk)
+
+    def _feed(self, chunk):
+        self._rx_buffer += chunk
+        while True:
+            # SMS '>' istemi satır sonu olmadan gelir
+            stripped = self._rx_buffer.lstrip(b"\r\n")
+            if stripped.startswith(b">") and (self._pending is not None or time.monotonic() < self._late_until):
+                self._rx_buffer = stripped[1:].lstrip(b" ")
+                self._handle_line(PROMPT)
+                continue
+            idx = self._rx_buffer.find(b"\n")
+            if idx < 0:
+                break
+            raw, self._rx_buffer = self._rx_buffer[:idx], self._rx_buffer[idx + 1:]
+            line = raw.strip(b"\r").decode(errors='ignore').strip()
+            if line:
+                self._handle_line(line)
+
+    def _handle_line(self, line):
+        with self._state_lock:
+            pending = self._pending
+            prefix = self._pending_prefix
+            pending_queue = self._pending_queue
+            if pending is not None:
+                if line == pending.command:
+                    return # Modem yankısı (ATE1)
+                if line == PROMPT and not self._pending_payload:
+                    # Önceki (zaman aşımına uğramış) SMS komutunun geç istemi; metin girişi iptal edilir
+                    self.late_responses += 1
+                    self._write(ESCAPE)
+                    return
+                if line == PROMPT or _is_final(line):
+                    pending_queue.put(line)
+                    return
+                if prefix and line.upper().startswith(prefix):
+                    pending.lines.append(line)
+                    return
+                if not line.startswith(self.urc_prefixes):
+                    pending.lines.append(line)
+                    return
+            elif (line == PROMPT or _is_final(line)) and time.monotonic() < self._late_until:
+                # Zaman aşımına uğramış komutun geç yanıtı; geç '>' istemi metin girişi olarak kalmasın
+                self.late_responses += 1
+                log.debug("Geç yanıt yok sayıldı: %s", line)
+                if line == PROMPT:
+                    self._write(ESCAPE)
+                return
+        self.urc_count += 1
+        self._urc_queue.put(line)
+
+    def _dispatch_loop(self):
+        while True:
+            line = self._urc_queue.get()
+            if line is None or self._stop_event.is_set():
+                break
+            if self.echo:
+                log.debug("URC: %s", line)
+            for prefix, callback in list(self._subscribers):
+                if line.startswith(prefix):
+                    try:
+                        callback(line)
+                    except Exception as e:
+                        log.exception("URC işleyicisinde hata (%r): %s", prefix, e)
@@ -0,0 +1,266 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import functools
+import platform
+import resource
+import tempfile
+import subprocess
+from datetime import datetime
+
+import main as app
+from at_transport import ATTransport
+from camera import ReplaySource, camera_configs
+from event_store import create_event_store
+from fakes import FakeFirebaseServer, FakeModem
+from firebase_uploader import FirebaseUploader
+from gps import GpsTracker
+from hardware import open_serial
+from image_writer import ImageWriter
+from inference import create_backend
+from logs import setup_logging
+from modem_manager import ModemManager, PRIORITY_ROUTINE
+
+
+# --- Tespit Döngüsü Kıyaslama Aracı ---
+# Kaydedilmiş JPEG karelerini main.py'deki işlem hattının aynısından (çözme → model() → sınıflandırma
+# → kayıt → telemetri) geçirir. Modem ve Firebase yerine fakes.py'deki sahte cihazlar kullanılır;
+# sonuç JSON olarak yazılır, böylece farklı commit'ler ve Pi modelleri karşılaştırılabilir.
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _device_model():
+    try:
+        with open("/proc/device-tree/model", "r") as f:
+            return f.read().strip("\x00\n ")
+    except OSError:
+        return platform.machine()
+
+
+def _current_rss_bytes():
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def run_benchmark(frames_paths, backend=None, int8=None, loop=False, fps=None, keep_queue_policy=False,
+                  warmup=3, output_folder=None, full_telemetry=False):
+    """
+    frames_paths'teki her klasörü/videoyu ayrı bir kamera olarak işlem hattından geçirir ve ölçüm sözlüğünü döndürür.
+    keep_queue_policy=False ise tüm kuyruklar engelleyici yapılır; böylece her kare işlenir ve
+    sonuçlar çalıştırmalar arasında karşılaştırılabilir olur. True ise CONFIG'deki (kare atan) kuyruklar kullanılır.
+    full_telemetry=True her karede tam durum gönderir (değişiklik odaklı telemetriyle bayt karşılaştırması için).
+    """
+    config = app.CONFIG
+    config["continuous_mode"] = True # Alarm hattı durdurmasın, tüm kareler işlensin
+    # Kaynak beklemeden okunur; kare hızı yalnızca --fps ve işlem hattıyla sınırlıdır
+    config["capture_scheduler"] = dict(config["capture_scheduler"], idle_interval_seconds=0.0, min_interval_seconds=0.0)
+    if not keep_queue_policy:
+        config["pipeline_queues"] = {name: dict(q, drop_oldest=False) for name, q in config["pipeline_queues"].items()}
+    if backend is not None:
+        config["inference_backend"] = backend
+    if int8 is not None:
+        config["inference_int8"] = int8
+    if full_telemetry:
+        config["telemetry"] = dict(config["telemetry"], enabled=False)
+
+    temp_folder = None
+    if output_folder is None:
+        temp_folder = output_folder = tempfile.mkdtemp(prefix="bench_output_")
+    config["output_base_folder"] = output_folder
+    config["firebase_spool_path"] = os.path.join(output_folder, "firebase_spool.jsonl")
+    config["event_store"] = dict(config["event_store"], path=os.path.join(output_folder, "events.db"))
+
+    load_started = time.monotonic()
+    app.model = create_backend(config).load()
+    model_load_seconds = time.monotonic() - load_started
+
+    # Isınma: ilk çağrılardaki bellek ayırma ve çekirdek derleme süreleri ölçüme katılmasın
+    with ReplaySource(frames_paths[0]) as warmup_source:
+        for _, (_, image) in zip(range(warmup), warmup_source.frames(decode=True)):
+            app.model(image)
+    app.model.reset_stats()
+
+    fake_modem = FakeModem().start()
+    fake_firebase = FakeFirebaseServer().start()
+    gps_tracker = None
+    frame_sources = []
+    drained = False
+    app.image_writer = app.firebase = app.event_store = None
+    try:
+        app.setup_directories()
+        app.image_writer = ImageWriter(output_folder, config["confidence_levels"],
+                                       workers=config["image_writer_workers"],
+                                       queue_size=config["image_writer_queue_size"])
+        app.image_writer.start()
+        app.firebase = FirebaseUploader(fake_firebase.url + "/veri", config["firebase_spool_path"],
+                                        flush_interval=config["firebase_flush_interval_seconds"],
+                                        max_batch=config["firebase_max_batch"])
+        app.firebase.start()
+        app.event_store = create_event_store(config)
+        if app.event_store is not None:
+            app.event_store.start()
+        app.ser = open_serial(config, fake_modem.port, app.GPS_BAUDRATE, timeout=1)
+        app.at_transport = ATTransport(app.ser)
+        app.at_transport.start()
+        app.modem = ModemManager(app.at_transport)
+        app.modem.start()
+        gps_tracker = GpsTracker(functools.partial(app.send_at, priority=PRIORITY_ROUTINE),
+                                 poll_interval=config["gps_poll_interval_seconds"],
+                                 stale_after=config["gps_stale_after_seconds"],
+                                 no_lock_interval=config["gps_no_lock_interval_seconds"])
+        gps_tracker.start()
+
+        config["cameras"] = [{"id": f"cam{index}", "firebase_path": "" if len(frames_paths) == 1 else f"cameras/cam{index}"}
+                             for index in range(len(frames_paths))]
+        for camera, path in zip(camera_configs(config), frames_paths):
+            frame_source = ReplaySource(path, loop=loop, fps=fps)
+            frame_source.open()
+            frame_sources.append((camera, frame_source))
+        pipeline, state = app.build_detection_pipeline(frame_sources, gps_tracker)
+
+        usage_before = resource.getrusage(resource.RUSAGE_SELF)
+        started = time.monotonic()
+        pipeline.start()
+        pipeline.join()
+        pipeline_seconds = time.monotonic() - started
+        # Kayıt ve yükleme kuyruklarının boşalması da ölçüme dahildir
+        app.image_writer.stop()
+        app.firebase.stop(flush=True)
+        if app.event_store is not None:
+            app.event_store.stop()
+        drained = True
+        total_seconds = time.monotonic() - started
+        usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    finally:
+        if not drained:
+            # Ölçüm yarıda kaldı; geçici klasör silinmeden önce ona yazan iş parçacıkları durdurulur
+            if app.image_writer is not None:
+                app.image_writer.stop()
+            if app.firebase is not None:
+                app.firebase.stop(flush=False)
+            if app.event_store is not None:
+                app.event_store.stop()
+        if gps_tracker is not None:
+            gps_tracker.stop()
+        for _, frame_source in frame_sources:
+            frame_source.close()
+        if app.modem is not None:
+            app.modem.stop()
+        if app.at_transport is not None:
+            app.at_transport.stop()
+        if app.ser is not None:
+            app.ser.close()
+        fake_modem.stop()
+        fake_firebase.stop()
+        if temp_folder is not None:
+            shutil.rmtree(temp_folder, ignore_errors=True)
+
+    cpu_seconds = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+    pipeline_stats = pipeline.stats()
+    frames_inferred = pipeline_stats["stages"]["inference"]["processed"]
+    frames_captured = sum(stage["processed"] for name, stage in pipeline_stats["stages"].items() if name.startswith("capture"))
+    return {
+        "meta": {
+            "time": datetime.now().isoformat(),
+            "commit": _git_commit(),
+            "device": _device_model(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "frames_paths": frames_paths,
+            "inference_backend": config["inference_backend"],
+            "inference_int8": config["inference_int8"],
+            "queue_policy": "config" if keep_queue_policy else "blocking",
+        },
+        "frames": {
+            "captured": frames_captured,
+            "inferred": frames_inferred,
+            "dropped": sum(q["dropped"] for q in pipeline_stats["queues"].values()),
+        },
+        "fps": round(frames_inferred / pipeline_seconds, 3) if pipeline_seconds else 0.0,
+        # Ön filtre kareleri atladığında yakalanan kare hızı çıkarım hızından yüksek olur
+        "capture_fps": round(frames_captured / pipeline_seconds, 3) if pipeline_seconds else 0.0,
+        "pipeline_seconds": round(pipeline_seconds, 3),
+        "total_seconds": round(total_seconds, 3),
+        "model_load_seconds": round(model_load_seconds, 3),
+        "stages": pipeline_stats["stages"],
+        "queues": pipeline_stats["queues"],
+        "bottleneck": pipeline_stats["bottleneck"],
+        "inference": app.model.latency_stats(),
+        "resources": {
+            "cpu_seconds": round(cpu_seconds, 3),
+            # %100 = bir çekirdeğin tamamı; çok çekirdekte 100'ü aşabilir
+            "cpu_percent": round(100 * cpu_seconds / total_seconds, 1) if total_seconds else 0.0,
+            "peak_rss_mb": round(usage_after.ru_maxrss / 1024, 1), # Linux'ta ru_maxrss KB cinsindendir
+            "rss_mb": round((_current_rss_bytes() or 0) / 1e6, 1),
+        },
+        "image_writer": app.image_writer.stats(),
+        "event_store": app.event_store.stats() if app.event_store is not None else None,
+        "firebase": dict(app.firebase.stats(), requests_received=len(fake_firebase.requests),
+                         connections=fake_firebase.connections),
+        "telemetry": state["telemetry"].stats() if state["telemetry"] is not None else None,
+        "cameras": {
+            camera_id: {
+                "detector": camera_state["detector"].stats(),
+                "capture_scheduler": camera_state["capture_scheduler"].stats(),
+                "tracks_created": camera_state["tracker"].tracks_created,
+                "alarm_state": camera_state["alarm_state"].stats(),
+                "motion_gate": camera_state["motion_gate"].stats() if camera_state["motion_gate"] is not None else None,
+            }
+            for camera_id, camera_state in state["cameras"].items()
+        },
+        "modem": {"commands": len(fake_modem.received), "sms": len(fake_modem.sms_sent), "calls": len(fake_modem.calls)},
+        "alarm_triggered": state["fire_alert_triggered"],
+        "alarms": state["alarms"],
+        "notifications": state["notifier"].stats(),
+        "alerts": state["alerts"].stats(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kaydedilmiş kareleri tespit hattından geçirip performansı JSON olarak raporlar.")
+    parser.add_argument("frames", nargs="+", help="JPEG kare klasörü veya video dosyası (birden fazlası ayrı kameralar olarak işlenir)")
+    parser.add_argument("--backend", default=None, help="CONFIG['inference_backend'] yerine kullanılacak arka uç")
+    parser.add_argument("--int8", action="store_true", default=None)
+    parser.add_argument("--loop", action="store_true", help="Kareleri başa dönerek tekrar oynat (Ctrl+C ile durur)")
+    parser.add_argument("--fps", type=float, default=None, help="Kaynağı bu kare hızıyla sınırla (varsayılan: sınırsız)")
+    parser.add_argument("--keep-queue-policy", action="store_true",
+                        help="CONFIG'deki kare atan kuyrukları kullan (varsayılan: her kare işlenir)")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--full-telemetry", action="store_true",
+                        help="Her karede tam current_system_status gönder (bayt karşılaştırması için)")
+    parser.add_argument("--output", default=None, help="Sonuç JSON dosyası (varsayılan: yalnızca ekrana)")
+    parser.add_argument("--verbose", action="store_true", help="Hattın kare başına günlük satırlarını da yaz (DEBUG)")
+    args = parser.parse_args(argv)
+
+    # Kare başına günlük satırları DEBUG/INFO seviyesindedir; rapor dışında yalnızca uyarı ve hatalar yazılır
+    setup_logging(app.CONFIG, level="DEBUG" if args.verbose else "WARNING")
+    report = run_benchmark(args.frames, backend=args.backend, int8=args.int8, loop=args.loop, fps=args.fps,
+                           keep_queue_policy=args.keep_queue_policy, warmup=args.warmup,
+                           full_telemetry=args.full_telemetry)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,446 @@
+import os
+import time
+import logging
+import threading
+import subprocess
+
+import numpy as np
+
+import metrics
+
+
+# --- Kamera / Kare Kaynakları ---
+# Tüm kaynaklar aynı arayüzü sunar: frames() üreteci (jpeg_bytes, frame) demetleri üretir.
+# jpeg_bytes: kameradan gelen ham JPEG baytları (V4L2 gibi ham kaynaklarda None)
+# frame: çözülmüş BGR görüntü (decode=False ise JPEG kaynaklarında None)
+
+JPEG_SOI = b'\xff\xd8' # JPEG başlangıç işaretçisi
+JPEG_EOI = b'\xff\xd9' # JPEG bitiş işaretçisi
+
+CAMERA_SOURCES = ("oneshot", "libcamera_vid", "v4l2", "replay")
+REPLAY_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+log = logging.getLogger(__name__)
+# oneshot kaynağında capture_seconds, capture_photo_to_memory (libcamera-still) süresidir
+CAPTURE_SECONDS = metrics.histogram("capture_seconds", "Kaynaktan bir kare alma süresi", ("source",))
+CAPTURE_ERRORS = metrics.counter("capture_errors", "Kaynağın kare veremediği okumalar (hata veya akış sonu)", ("source",))
+DECODE_SECONDS = metrics.histogram("jpeg_decode_seconds", "cv2.imdecode ile JPEG çözme süresi")
+
+
+def capture_photo_to_memory(width, height, camera_index=None):
+    """
+    libcamera-still komutunu kullanarak fotoğrafı doğrudan belleğe çeker.
+    camera_index verilirse birden fazla kameralı sistemde o kamera kullanılır.
+    """
+    command = [
+        "libcamera-still",
+        "-t", "1",
+        "--nopreview",
+        "--width", str(width),
+        "--height", str(height),
+        "-o", "-"
+    ]
+    if camera_index is not None:
+        command[1:1] = ["--camera", str(camera_index)]
+    try:
+        result = subprocess.run(command, capture_output=True, check=True)
+        return result.stdout
+    except subprocess.CalledProcessError as e:
+        log.error("Fotoğraf belleğe çekilemedi! Komut: %s | Hata Kodu: %s | Standart Çıkış: %s | Hata Çıkışı: %s",
+                  ' '.join(e.cmd), e.returncode, e.stdout.decode(errors='ignore'), e.stderr.decode(errors='ignore'))
+        return None
+    except FileNotFoundError:
+        log.error("'libcamera-still' komutu bulunamadı. Lütfen yüklü olduğundan emin olun. "
+                  "Komut: sudo apt install libcamera-tools")
+        return None
+
+
+def decode_jpeg(jpeg_bytes):
+    """JPEG baytlarını OpenCV BGR görüntüsüne çözer. Çözülemezse None döndürür."""
+    if not jpeg_bytes:
+        return None
+    import cv2 # OpenCV içe aktarımı yavaştır; ilk çözmede yüklenir
+    with DECODE_SECONDS.time():
+        return cv2.imdecode(np.frombuffer(jpeg_bytes, np.uint8), cv2.IMREAD_COLOR)
+
+
+class JpegStreamParser:
+    """
+    Sürekli bir MJPEG bayt akışını parça parça okuyup tam JPEG karelerine ayırır.
+    Her kare SOI (FFD8) ile başlar ve EOI (FFD9) ile biter.
+    """
+
+    def __init__(self, max_frame_bytes=8 * 1024 * 1024):
+        self.max_frame_bytes = max_frame_bytes
+        self._buffer = bytearray()
+        self._search_from = 0
+
+    def feed(self, data):
+        """Yeni gelen baytları ekler ve tamamlanan karelerin listesini döndürür."""
+        self._buffer.extend(data)
+        frames = []
+        while True:
+            start = self._buffer.find(JPEG_SOI)
+            if start < 0:
+                # Başlangıç işaretçisi yok; son bayt yarım bir işaretçi olabilir
+                del self._buffer[:max(len(self._buffer) - 1, 0)]
+                self._search_from = 0
+                break
+            if start > 0:
+                del self._buffer[:start]
+                self._search_from = 0
+            end = self._buffer.find(JPEG_EOI, max(self._search_from, 2))
+            if end < 0:
+                # Kare henüz tamamlanmadı; bir sonraki aramayı kaldığı yerden sürdür
+                self._search_from = max(len(self._buffer) - 1, 2)
+                if len(self._buffer) > self.max_frame_bytes:
+                    log.warning("MJPEG akışında kare sonu bulunamadı, tampon temizleniyor.")
+                    self._buffer.clear()
+                    self._search_from = 0
+                break
+            frames.append(bytes(self._buffer[:end + 2]))
+            del self._buffer[:end + 2]
+            self._search_from = 0
+        return frames
+
+
+class FrameSource:
+    """Kare kaynakları için temel sınıf."""
+
+    name = "base"
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def read(self):
+        """Bir sonraki kareyi (jpeg_bytes, frame) olarak döndürür; kaynak bittiyse None."""
+        raise NotImplementedError
+
+    def frames(self, decode=True):
+        """Kaynak tükenene kadar (jpeg_bytes, frame) demetleri üretir."""
+        capture_seconds = CAPTURE_SECONDS.labels(source=self.name)
+        while True:
+            with capture_seconds.time():
+                item = self.read()
+            if item is None:
+                CAPTURE_ERRORS.labels(source=self.name).inc()
+                return
+            jpeg_bytes, frame = item
+            if decode and frame is None:
+                frame = decode_jpeg(jpeg_bytes)
+            yield jpeg_bytes, frame
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class OneShotCameraSource(FrameSource):
+    """Her kare için ayrı bir libcamera-still süreci başlatan eski (yedek) mod."""
+
+    name = "oneshot"
+
+    def __init__(self, width, height, camera_index=None):
+        self.width = width
+        self.height = height
+        self.camera_index = camera_index
+
+    def read(self):
+        jpeg_bytes = capture_photo_to_memory(self.width, self.height, self.camera_index)
+        if jpeg_bytes is None:
+            return None
+        return jpeg_bytes, None
+
+
+class LibcameraStreamSource(FrameSource):
+    """
+    Tek bir uzun ömürlü 'libcamera-vid --codec mjpeg -o -' sürecinden kare okur.
+    Arka plandaki okuyucu iş parçacığı akışı sürekli ayrıştırır ve yalnızca en güncel
+    kareyi tutar; böylece tüketici yavaş kalsa bile eski kareler birikmez.
+    Süreç canlı kalıp stall_timeout saniye kare üretmezse (takılma) yeniden başlatılır.
+    """
+
+    name = "libcamera_vid"
+
+    def __init__(self, width, height, framerate=5, camera_index=None, read_chunk_size=65536, first_frame_timeout=10,
+                 stall_timeout=None):
+        self.width = width
+        self.height = height
+        self.framerate = framerate
+        self.camera_index = camera_index
+        self.read_chunk_size = read_chunk_size
+        self.first_frame_timeout = first_frame_timeout
+        self.stall_timeout = stall_timeout or first_frame_timeout # Yeni kare için en uzun bekleme
+        self._process = None
+        self._reader = None
+        self._condition = threading.Condition()
+        self._latest = None
+        self._sequence = 0
+        self._consumed_sequence = 0
+        self._stopped = False
+        self.frames_received = 0
+        self.restarts = 0
+
+    def _command(self):
+        command = [
+            "libcamera-vid",
+            "-t", "0",
+            "--nopreview",
+            "--codec", "mjpeg",
+            "--width", str(self.width),
+            "--height", str(self.height),
+            "--framerate", str(self.framerate),
+            "-o", "-"
+        ]
+        if self.camera_index is not None:
+            command[1:1] = ["--camera", str(self.camera_index)]
+        return command
+
+    def open(self):
+        with self._condition:
+            self._stopped = False
+            self._latest = None
+            self._sequence = 0
+            self._consumed_sequence = 0
+        self._process = subprocess.Popen(self._command(), stdout=subprocess.PIPE,
+                                         stderr=subprocess.DEVNULL, bufsize=0)
+        self._reader = threading.Thread(target=self._read_loop, name="libcamera-vid-reader", daemon=True)
+        self._reader.start()
+        # İlk kare gelmeden kaynağı hazır sayma; kamera açılamazsa hemen hata ver
+        with self._condition:
+            ready = self._condition.wait_for(lambda: self._sequence > 0 or self._stopped,
+                                             timeout=self.first_frame_timeout)
+        if not ready or self._sequence == 0:
+            self.close()
+            raise RuntimeError("libcamera-vid akışından kare alınamadı.")
+        log.info("libcamera-vid akışı başlatıldı (%dx%d @ %s fps).", self.width, self.height, self.framerate)
+
+    def _read_loop(self):
+        parser = JpegStreamParser()
+        stdout = self._process.stdout
+        try:
+            while True:
+                chunk = stdout.read(self.read_chunk_size)
+                if not chunk:
+                    break
+                for jpeg_bytes in parser.feed(chunk):
+                    with self._condition:
+                        self._latest = jpeg_bytes
+                        self._sequence += 1
+                        self.frames_received += 1
+                        self._condition.notify_all()
+        except (OSError, ValueError) as e:
+            log.error("libcamera-vid akışı okunurken hata: %s", e)
+        finally:
+            with self._condition:
+                self._stopped = True
+                self._condition.notify_all()
+
+    def read(self):
+        with self._condition:
+            self._condition.wait_for(lambda: self._sequence != self._consumed_sequence or self._stopped,
+                                     timeout=self.stall_timeout)
+            if self._sequence != self._consumed_sequence:
+                self._consumed_sequence = self._sequence
+                return self._latest, None
+            stopped = self._stopped
+        if stopped:
+            log.error("libcamera-vid akışı sonlandı.")
+            return None
+        # Süreç canlı ama kare üretmiyor: yeniden başlatılır, başlatılamazsa kaynak sonlanır
+        log.error("libcamera-vid akışı %s sn boyunca kare üretmedi (takıldı), süreç yeniden başlatılıyor.", self.stall_timeout)
+        self.close()
+        try:
+            self.open()
+        except (RuntimeError, OSError) as e:
+            log.error("libcamera-vid yeniden başlatılamadı: %s", e)
+            return None
+        self.restarts += 1
+        with self._condition:
+            self._consumed_sequence = self._sequence
+            return self._latest, None
+
+    def close(self):
+        if self._process is not None:
+            if self._process.poll() is None:
+                self._process.terminate()
+                try:
+                    self._process.wait(timeout=3)
+                except subprocess.TimeoutExpired:
+                    self._process.kill()
+            self._process = None
+        if self._reader is not None:
+            self._reader.join(timeout=3)
+            self._reader = None
+
+
+class V4L2CameraSource(FrameSource):
+    """cv2.VideoCapture ile bir V4L2 cihazından sürekli (çözülmüş) kare okur."""
+
+    name = "v4l2"
+
+    def __init__(self, device, width, height):
+        self.device = device
+        self.width = width
+        self.height = height
+        self._capture = None
+
+    def open(self):
+        import cv2
+        self._capture = cv2.VideoCapture(self.device, cv2.CAP_V4L2)
+        if not self._capture.isOpened():
+            self._capture = None
+            raise RuntimeError(f"V4L2 cihazı açılamadı: {self.device}")
+        self._capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self._capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        # Sürücü tamponunu küçük tut, her okuma en güncel kareyi versin
+        self._capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        log.info("V4L2 cihazı açıldı: %s", self.device)
+
+    def read(self):
+        ok, frame = self._capture.read()
+        if not ok:
+            log.error("V4L2 cihazından kare okunamadı: %s", self.device)
+            return None
+        return None, frame
+
+    def close(self):
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+
+
+class ReplaySource(FrameSource):
+    """
+    Kamera olmadan test için kayıtlı kareleri oynatır.
+    path bir klasörse içindeki resimler ad sırasıyla, bir video dosyasıysa kareleri sırayla okunur.
+    fps verilirse kareler gerçek zamanlı hızda üretilir.
+    """
+
+    name = "replay"
+
+    def __init__(self, path, loop=False, fps=None):
+        self.path = path
+        self.loop = loop
+        self.fps = fps
+        self._files = None
+        self._index = 0
+        self._capture = None
+        self._next_time = None
+
+    def open(self):
+        if os.path.isdir(self.path):
+            self._files = sorted(
+                os.path.join(self.path, name) for name in os.listdir(self.path)
+                if name.lower().endswith(REPLAY_EXTENSIONS)
+            )
+            if not self._files:
+                raise RuntimeError(f"Oynatma klasöründe resim bulunamadı: {self.path}")
+        else:
+            import cv2
+            self._capture = cv2.VideoCapture(self.path)
+            if not self._capture.isOpened():
+                self._capture = None
+                raise RuntimeError(f"Oynatma dosyası açılamadı: {self.path}")
+        self._index = 0
+        self._next_time = None
+
+    def _pace(self):
+        if not self.fps:
+            return
+        now = time.monotonic()
+        if self._next_time is not None and self._next_time > now:
+            time.sleep(self._next_time - now)
+        self._next_time = max(now, self._next_time or now) + 1.0 / self.fps
+
+    def read(self):
+        self._pace()
+        if self._files is not None:
+            if self._index >= len(self._files):
+                if not self.loop:
+                    return None
+                self._index = 0
+            file_path = self._files[self._index]
+            self._index += 1
+            with open(file_path, "rb") as f:
+                data = f.read()
+            if file_path.lower().endswith((".jpg", ".jpeg")):
+                return data, None
+            return None, decode_jpeg(data)
+
+        ok, frame = self._capture.read()
+        if not ok and self.loop:
+            import cv2
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self._capture.read()
+        if not ok:
+            return None
+        return None, frame
+
+    def close(self):
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+
+
+def create_frame_source(config):
+    """CONFIG içindeki 'camera_source' ayarına göre kare kaynağını oluşturur."""
+    source = config.get("camera_source", "oneshot")
+    width = config["camera_width"]
+    height = config["camera_height"]
+    camera_index = config.get("camera_index")
+    if source == "libcamera_vid":
+        return LibcameraStreamSource(width, height, framerate=config.get("camera_framerate", 5),
+                                     camera_index=camera_index)
+    if source == "v4l2":
+        return V4L2CameraSource(config.get("v4l2_device", 0), width, height)
+    if source == "replay":
+        return ReplaySource(config["replay_path"], loop=config.get("replay_loop", False),
+                            fps=config.get("replay_fps"))
+    if source == "oneshot":
+        return OneShotCameraSource(width, height, camera_index)
+    raise ValueError(f"Bilinmeyen kamera kaynağı: '{source}'. Geçerli değerler: {', '.join(CAMERA_SOURCES)}")
+
+
+def open_frame_source(config):
+    """
+    Yapılandırılmış kaynağı açar. Sürekli akış kaynağı açılamazsa
+    her kare için libcamera-still çalıştıran tek çekim moduna geri düşer.
+    """
+    source = create_frame_source(config)
+    try:
+        source.open()
+        return source
+    except (RuntimeError, OSError) as e:
+        if source.name in ("oneshot", "replay"):
+            raise
+        log.warning("'%s' kamera kaynağı açılamadı (%s). Tek çekim (libcamera-still) moduna geçiliyor.", source.name, e)
+        fallback = OneShotCameraSource(config["camera_width"], config["camera_height"], config.get("camera_index"))
+        fallback.open()
+        return fallback
+
+
+def camera_configs(config):
+    """
+    CONFIG["cameras"] listesindeki her kamera için genel ayarlarla birleştirilmiş yapılandırma döndürür.
+    Kamera sözlüğündeki anahtarlar (camera_source, camera_index, replay_path, roi_polygons, motion_gate...)
+    genel değerlerin yerine geçer. Liste boşsa genel ayarlarla tek bir 'cam0' kamerası kullanılır.
+    """
+    cameras = config.get("cameras") or [{"id": "cam0"}]
+    merged = []
+    for index, camera in enumerate(cameras):
+        camera_config = dict(config)
+        camera_config.update(camera)
+        camera_config.setdefault("id", f"cam{index}")
+        merged.append(camera_config)
+    ids = [camera["id"] for camera in merged]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"Kamera kimlikleri benzersiz olmalıdır: {ids}")
+    return merged
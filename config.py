@@ -0,0 +1,282 @@
+import os
+import copy
+import signal
+import logging
+import threading
+
+from alerting import load_recipients
+
+
+# --- Ayar Dosyası ve Çalışırken Yeniden Yükleme ---
+# main.CONFIG varsayılanlardır. Ayar dosyası (TOML veya YAML) yalnızca değiştirilecek anahtarları içerir;
+# iç içe sözlükler birleştirilir, listeler tamamen değiştirilir. Dosya varsayılanlara göre doğrulanır
+# (bilinmeyen anahtar, yanlış tür, aralık dışı eşik). Çalışırken dosya değişince (mtime) veya SIGHUP ile
+# yeniden okunur; yalnızca RELOADABLE_KEYS uygulanır, diğer değişiklikler yeniden başlatmaya kadar bekler.
+# Geçersiz dosya çalışan ayarları bozmaz: hata günlüğe yazılır, eski ayarlarla devam edilir.
+
+CONFIG_FORMATS = (".toml", ".yaml", ".yml")
+# Çalışırken değiştirilebilen ayarlar; kamera, modem ve işlem hattı yapısına dokunmazlar
+RELOADABLE_KEYS = ("confidence_levels", "call_threshold", "sms_threshold", "sms_message", "recipients", "alerting", "logging",
+                   "capture_scheduler")
+# CONFIG dışında, main.py'deki modül sabitlerine karşılık gelen ayarlar (yalnızca açılışta)
+DEVICE_SETTINGS = {"firebase_url": str, "gps_port": str, "power_key": int}
+# 0-1 aralığında olması gereken güvenirlik eşikleri
+THRESHOLD_KEYS = ("call_threshold", "sms_threshold")
+
+log = logging.getLogger(__name__)
+
+
+def load_file(path):
+    """TOML veya YAML ayar dosyasını sözlük olarak okur."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in CONFIG_FORMATS:
+        raise ValueError(f"Desteklenmeyen ayar dosyası biçimi: '{path}'. Geçerli uzantılar: {', '.join(CONFIG_FORMATS)}")
+    if extension == ".toml":
+        try:
+            import tomllib
+        except ImportError: # Python 3.11 öncesi
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise RuntimeError("Python 3.11 öncesinde TOML ayar dosyası için tomli gerekli: pip install tomli")
+        with open(path, "rb") as f:
+            try:
+                data = tomllib.load(f)
+            except tomllib.TOMLDecodeError as e:
+                raise ValueError(f"Ayar dosyası okunamadı ({path}): {e}")
+    else:
+        try:
+            import yaml
+        except ImportError:
+            raise RuntimeError("YAML ayar dosyası için PyYAML gerekli: pip install pyyaml (veya TOML kullanın)")
+        with open(path, "r", encoding="utf-8") as f:
+            try:
+                data = yaml.safe_load(f) or {}
+            except yaml.YAMLError as e:
+                raise ValueError(f"Ayar dosyası okunamadı ({path}): {e}")
+    if not isinstance(data, dict):
+        raise ValueError(f"Ayar dosyası bir anahtar/değer tablosu olmalı: '{path}'")
+    return data
+
+
+def merge(defaults, overrides):
+    """overrides'ı defaults'un kopyasına uygular; iç içe sözlükler birleştirilir, diğer değerler değiştirilir."""
+    merged = copy.deepcopy(defaults)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+def _type_name(value):
+    return {bool: "bool", int: "sayı", float: "sayı", str: "metin", list: "liste", dict: "tablo"}.get(type(value), type(value).__name__)
+
+
+def _check_type(name, value, default, errors):
+    if default is None or value is None:
+        return True # Varsayılanı None olan (isteğe bağlı) ayarlar her türü kabul eder
+    if isinstance(default, bool) or isinstance(value, bool):
+        ok = isinstance(default, bool) and isinstance(value, bool)
+    elif isinstance(default, (int, float)):
+        ok = isinstance(value, (int, float))
+    else:
+        ok = isinstance(value, type(default))
+    if not ok:
+        errors.append(f"{name}: {_type_name(default)} bekleniyordu, verilen {_type_name(value)} ({value!r})")
+    return ok
+
+
+def _check_section(prefix, overrides, defaults, errors):
+    for key, value in overrides.items():
+        name = f"{prefix}{key}"
+        if key not in defaults:
+            errors.append(f"{name}: bilinmeyen ayar")
+            continue
+        default = defaults[key]
+        if _check_type(name, value, default, errors) and isinstance(value, dict) and isinstance(default, dict) and default:
+            _check_section(f"{name}.", value, default, errors)
+
+
+def _check_confidence_levels(levels, errors):
+    folders = set()
+    for index, level in enumerate(levels):
+        name = f"confidence_levels[{index}]"
+        if not isinstance(level, dict):
+            errors.append(f"{name}: tablo bekleniyordu")
+            continue
+        for key in ("threshold", "folder", "prefix", "firebase_tag"):
+            if key not in level:
+                errors.append(f"{name}: '{key}' eksik")
+        threshold = level.get("threshold")
+        if threshold is not None and (isinstance(threshold, bool) or not isinstance(threshold, (int, float)) or not 0 < threshold <= 1):
+            errors.append(f"{name}.threshold: 0 ile 1 arasında olmalı, verilen {threshold!r}")
+        quality = level.get("jpeg_quality")
+        if quality is not None and (not isinstance(quality, int) or not 1 <= quality <= 100):
+            errors.append(f"{name}.jpeg_quality: 1-100 arasında tam sayı olmalı, verilen {quality!r}")
+        if level.get("folder") in folders:
+            errors.append(f"{name}.folder: '{level['folder']}' birden fazla seviyede kullanılmış")
+        folders.add(level.get("folder"))
+    if not levels:
+        errors.append("confidence_levels: en az bir seviye olmalı")
+
+
+def validate(overrides, defaults, path="ayar dosyası"):
+    """
+    Dosyadan okunan overrides'ı varsayılanlara göre doğrular. Tüm hatalar tek ValueError'da listelenir.
+    (CONFIG'e uygulanacak birleştirilmiş ayarlar, DEVICE_SETTINGS değerleri) döndürür.
+    """
+    errors = []
+    overrides = dict(overrides)
+    settings = {}
+    for key, expected in DEVICE_SETTINGS.items():
+        if key in overrides:
+            value = overrides.pop(key)
+            if not isinstance(value, expected) or isinstance(value, bool):
+                errors.append(f"{key}: {_type_name(expected())} bekleniyordu, verilen {value!r}")
+            settings[key] = value
+    _check_section("", overrides, defaults, errors)
+    merged = merge(defaults, overrides)
+    for key in THRESHOLD_KEYS:
+        value = merged.get(key)
+        if isinstance(value, (int, float)) and not 0 <= value <= 1:
+            errors.append(f"{key}: 0 ile 1 arasında olmalı, verilen {value!r}")
+    if isinstance(merged.get("confidence_levels"), list):
+        _check_confidence_levels(merged["confidence_levels"], errors)
+    for key, value in (merged.get("capture_scheduler") or {}).items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and (value <= 0 if key == "idle_interval_seconds" else value < 0):
+            errors.append(f"capture_scheduler.{key}: {'pozitif' if key == 'idle_interval_seconds' else 'negatif olmayan'} bir sayı olmalı, verilen {value!r}")
+    if isinstance(merged.get("recipients"), list) and all(isinstance(entry, dict) for entry in merged["recipients"]):
+        try:
+            load_recipients(merged)
+        except ValueError as e:
+            errors.append(str(e))
+    elif "recipients" in overrides:
+        errors.append("recipients: tablo listesi bekleniyordu")
+    if errors:
+        raise ValueError(f"Ayar dosyası geçersiz ({path}):\n  - " + "\n  - ".join(errors))
+    return merged, settings
+
+
+def _folders(levels):
+    return sorted(level["folder"] for level in levels)
+
+
+class ConfigWatcher:
+    """
+    Ayar dosyasını izler ve değişince yeniden yükler. config (main.CONFIG) yerinde güncellenir; yalnızca
+    RELOADABLE_KEYS değişir. add_listener(callback) ile kayıtlı her callback(değişen_anahtarlar) yeniden
+    yüklemeden sonra çağrılır (örn. işlem hattının eşik tablolarını yeniden derlemek için).
+    Dosya değişikliği poll_interval aralıkla mtime'a bakılarak anlaşılır; SIGHUP hemen yeniden yükler.
+    """
+
+    def __init__(self, path, config, poll_interval=2.0):
+        self.path = path
+        self.config = config
+        self.poll_interval = poll_interval
+        self.defaults = copy.deepcopy(config) # Dosya uygulanmadan önceki varsayılanlar
+        self.settings = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._reload_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._previous_sighup = None
+        self._stamp = None
+        self.reloads = 0
+        self.failures = 0
+
+    def load(self):
+        """Dosyayı ilk kez okur ve tüm ayarları uygular (açılışta; hata durumunda ValueError/RuntimeError)."""
+        self._stamp = self._file_stamp()
+        merged, self.settings = validate(load_file(self.path), self.defaults, self.path)
+        self.config.update(merged)
+        return self
+
+    # --- Yaşam döngüsü ---
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        if hasattr(signal, "SIGHUP") and threading.current_thread() is threading.main_thread():
+            self._previous_sighup = signal.signal(signal.SIGHUP, lambda signum, frame: self._reload_event.set())
+        self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2):
+        self._stop_event.set()
+        self._reload_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._previous_sighup is not None and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGHUP, self._previous_sighup)
+            self._previous_sighup = None
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        self._listeners = [listener for listener in self._listeners if listener is not callback]
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            signalled = self._reload_event.wait(self.poll_interval)
+            self._reload_event.clear()
+            if self._stop_event.is_set():
+                break
+            stamp = self._file_stamp()
+            if signalled or (stamp is not None and stamp != self._stamp):
+                self._stamp = stamp
+                self.reload()
+
+    # --- Yeniden yükleme ---
+    def reload(self):
+        """Dosyayı yeniden okur ve çalışırken değiştirilebilen ayarları uygular. Uygulanan anahtarları döndürür."""
+        with self._lock:
+            try:
+                merged, _ = validate(load_file(self.path), self.defaults, self.path)
+            except (OSError, ValueError, RuntimeError) as e:
+                self.failures += 1
+                log.error("Ayarlar yeniden yüklenemedi, önceki ayarlarla devam ediliyor: %s", e)
+                return []
+
+            changed = [key for key in merged if merged[key] != self.config.get(key)]
+            applied, pending = [], []
+            for key in changed:
+                reloadable = key in RELOADABLE_KEYS
+                if key == "confidence_levels" and _folders(merged[key]) != _folders(self.config[key]):
+                    reloadable = False # Klasörler kaydedici ve disk kotası tarafından açılışta kurulur
+                if reloadable:
+                    self.config[key] = merged[key]
+                    applied.append(key)
+                else:
+                    pending.append(key)
+            if pending:
+                log.warning("Şu ayarlar yeniden başlatınca geçerli olacak: %s", ", ".join(pending))
+            if not applied:
+                return []
+            self.reloads += 1
+            log.info("Ayarlar yeniden yüklendi: %s", ", ".join(applied))
+            for listener in list(self._listeners):
+                try:
+                    listener(applied)
+                except Exception as e:
+                    log.exception("Ayar yeniden yükleme işleyicisinde hata: %s", e)
+            return applied
+
+    def stats(self):
+        return {"path": self.path, "reloads": self.reloads, "failures": self.failures}
+
+
+def create_config_watcher(path, config, poll_interval=2.0):
+    """path'teki ayar dosyasını doğrulayıp config'e uygular ve izleyiciyi döndürür (başlatılmamış)."""
+    return ConfigWatcher(path, config, poll_interval=poll_interval).load()
@@ -0,0 +1,392 @@
+import os
+import re
+import sys
+import json
+import time
+import queue
+import sqlite3
+import logging
+import argparse
+import threading
+from datetime import datetime
+
+import metrics
+
+
+# --- Yerel Olay Kaydı (SQLite) ---
+# İşlenen her karenin en yüksek güvenirliği, seviyesi, GPS konumu ve kaydedilen resim yolu yerel bir SQLite
+# veritabanına (WAL modu) yazılır. Kayıtlar kuyruğa bırakılır ve ayrı bir iş parçacığında tek işlemde (transaction)
+# toplu yazılır; işlem hattı disk G/Ç'sini beklemez. Zaman ve seviye üzerinde indeksler vardır.
+# Sıkıştırma işi raw_retention_days'ten eski kareleri zaman dilimli özetlere (rollups) toplayıp siler,
+# rollup_retention_days'ten eski özetleri de siler; böylece "geçen hafta kaç DIKKAT" sorusu ağ kullanmadan,
+# dosyalar listelenmeden yanıtlanır.
+
+DEFAULT_PATH = "./Output/events.db"
+NO_LEVEL = "none" # Hiçbir güvenirlik eşiğine ulaşmayan kareler
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS frames (
+        id INTEGER PRIMARY KEY,
+        ts REAL NOT NULL,
+        camera TEXT NOT NULL,
+        confidence REAL NOT NULL,
+        level TEXT NOT NULL,
+        latitude REAL,
+        longitude REAL,
+        gps_stale INTEGER,
+        image_path TEXT,
+        alarm_state TEXT,
+        track_id INTEGER
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_frames_ts ON frames (ts)",
+    "CREATE INDEX IF NOT EXISTS idx_frames_level_ts ON frames (level, ts)",
+    """CREATE TABLE IF NOT EXISTS rollups (
+        bucket_seconds INTEGER NOT NULL,
+        bucket_start INTEGER NOT NULL,
+        camera TEXT NOT NULL,
+        level TEXT NOT NULL,
+        frames INTEGER NOT NULL,
+        max_confidence REAL NOT NULL,
+        sum_confidence REAL NOT NULL,
+        PRIMARY KEY (bucket_seconds, bucket_start, camera, level)
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_rollups_level_start ON rollups (level, bucket_start)",
+)
+
+INSERT_FRAME = ("INSERT INTO frames (ts, camera, confidence, level, latitude, longitude, gps_stale, image_path, "
+                "alarm_state, track_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+log = logging.getLogger(__name__)
+EVENTS_WRITTEN = metrics.counter("event_store_frames_written", "Olay kaydına yazılan kareler")
+EVENTS_DROPPED = metrics.counter("event_store_frames_dropped", "Kuyruk dolu olduğu için yazılamayan kareler")
+BATCH_SECONDS = metrics.histogram("event_store_batch_seconds", "Bir toplu yazma işleminin (transaction) süresi")
+
+
+def connect(path, readonly=False):
+    """Veritabanına bağlanır; yazma bağlantısında WAL modu ve şema hazırlanır."""
+    if readonly:
+        conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    conn.row_factory = sqlite3.Row
+    # auto_vacuum yalnızca tablolar oluşturulmadan önce ayarlanabilir; sıkıştırmada boşalan sayfalar geri verilir
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL") # WAL'da güç kesintisinde en fazla son işlemler kaybolur, dosya bozulmaz
+    with conn:
+        for statement in SCHEMA:
+            conn.execute(statement)
+    return conn
+
+
+def compact(conn, raw_retention_seconds, rollup_bucket_seconds=3600, rollup_retention_seconds=None, now=None):
+    """
+    raw_retention_seconds'tan eski kareleri rollup_bucket_seconds'lık özetlere ekleyip siler; rollup_retention_seconds
+    verilirse daha eski özetleri de siler. Silinen kare ve özet sayılarını döndürür.
+    """
+    now = time.time() if now is None else now
+    # Kesim anı dilim sınırına yuvarlanır; bir dilim hem ham hem özet tabloda yarım kalmasın
+    cutoff = int(now - raw_retention_seconds) // rollup_bucket_seconds * rollup_bucket_seconds
+    with conn:
+        conn.execute(
+            """INSERT INTO rollups (bucket_seconds, bucket_start, camera, level, frames, max_confidence, sum_confidence)
+               SELECT ?, CAST(ts / ? AS INTEGER) * ?, camera, level, COUNT(*), MAX(confidence), SUM(confidence)
+               FROM frames WHERE ts < ? GROUP BY 2, camera, level
+               ON CONFLICT (bucket_seconds, bucket_start, camera, level) DO UPDATE SET
+                   frames = frames + excluded.frames,
+                   max_confidence = MAX(max_confidence, excluded.max_confidence),
+                   sum_confidence = sum_confidence + excluded.sum_confidence""",
+            (rollup_bucket_seconds, rollup_bucket_seconds, rollup_bucket_seconds, cutoff))
+        frames_removed = conn.execute("DELETE FROM frames WHERE ts < ?", (cutoff,)).rowcount
+        rollups_removed = 0
+        if rollup_retention_seconds:
+            rollups_removed = conn.execute("DELETE FROM rollups WHERE bucket_start < ?",
+                                           (now - rollup_retention_seconds,)).rowcount
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("PRAGMA incremental_vacuum")
+    return {"frames_compacted": frames_removed, "rollups_removed": rollups_removed, "cutoff": cutoff}
+
+
+def _filters(column, since=None, until=None, level=None, camera=None):
+    clauses, params = [], []
+    if since is not None:
+        clauses.append(f"{column} >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append(f"{column} < ?")
+        params.append(until)
+    if level is not None:
+        clauses.append("level = ?")
+        params.append(level)
+    if camera is not None:
+        clauses.append("camera = ?")
+        params.append(camera)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def summary(conn, since=None, until=None, level=None, camera=None):
+    """Seviye başına kare sayısı ve en yüksek güvenirlik (ham kareler ve sıkıştırılmış özetler birlikte)."""
+    raw_where, raw_params = _filters("ts", since, until, level, camera)
+    rollup_where, rollup_params = _filters("bucket_start", since, until, level, camera)
+    rows = conn.execute(
+        f"""SELECT level, SUM(frames) AS frames, MAX(max_confidence) AS max_confidence FROM (
+                SELECT level, COUNT(*) AS frames, MAX(confidence) AS max_confidence FROM frames{raw_where} GROUP BY level
+                UNION ALL
+                SELECT level, SUM(frames), MAX(max_confidence) FROM rollups{rollup_where} GROUP BY level
+            ) GROUP BY level ORDER BY level""", raw_params + rollup_params).fetchall()
+    return {row["level"]: {"frames": row["frames"], "max_confidence": round(row["max_confidence"], 3)} for row in rows}
+
+
+def rollup(conn, bucket_seconds, since=None, until=None, level=None, camera=None):
+    """
+    Zaman dilimi başına kare sayısı, en yüksek ve ortalama güvenirlik. Sıkıştırılmış dönemler için dilim,
+    özetlerin dilim süresinin katı olmalıdır (aksi halde özet, başladığı dilime sayılır).
+    """
+    raw_where, raw_params = _filters("ts", since, until, level, camera)
+    rollup_where, rollup_params = _filters("bucket_start", since, until, level, camera)
+    rows = conn.execute(
+        f"""SELECT bucket_start, camera, level, SUM(frames) AS frames, MAX(max_confidence) AS max_confidence,
+                   SUM(sum_confidence) AS sum_confidence FROM (
+                SELECT CAST(ts / ? AS INTEGER) * ? AS bucket_start, camera, level, COUNT(*) AS frames,
+                       MAX(confidence) AS max_confidence, SUM(confidence) AS sum_confidence
+                FROM frames{raw_where} GROUP BY 1, camera, level
+                UNION ALL
+                SELECT CAST(bucket_start / ? AS INTEGER) * ?, camera, level, frames, max_confidence, sum_confidence
+                FROM rollups{rollup_where}
+            ) GROUP BY 1, camera, level ORDER BY 1, camera, level""",
+        [bucket_seconds, bucket_seconds] + raw_params + [bucket_seconds, bucket_seconds] + rollup_params).fetchall()
+    return [{
+        "bucket_start": datetime.fromtimestamp(row["bucket_start"]).isoformat(),
+        "camera": row["camera"],
+        "level": row["level"],
+        "frames": row["frames"],
+        "max_confidence": round(row["max_confidence"], 3),
+        "mean_confidence": round(row["sum_confidence"] / row["frames"], 3),
+    } for row in rows]
+
+
+def recent(conn, limit=20, since=None, until=None, level=None, camera=None):
+    """En yeni ham kare kayıtları (sıkıştırılmış dönemler dahil değildir)."""
+    where, params = _filters("ts", since, until, level, camera)
+    rows = conn.execute(f"SELECT * FROM frames{where} ORDER BY ts DESC LIMIT ?", params + [limit]).fetchall()
+    return [dict(row, ts=datetime.fromtimestamp(row["ts"]).isoformat()) for row in rows]
+
+
+class EventStore:
+    """
+    record() kareyi kuyruğa bırakır ve hemen döner; yazıcı iş parçacığı kayıtları batch_size'a ulaşınca veya
+    flush_interval saniyede bir tek işlemde yazar. Kuyruk doluysa kayıt atlanır (dropped) ve hat beklemez.
+    Sıkıştırma aynı iş parçacığında compaction_interval saniyede bir çalışır.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, batch_size=200, flush_interval=2.0, queue_size=5000, raw_retention_days=7,
+                 rollup_bucket_seconds=3600, rollup_retention_days=365, compaction_interval=6 * 3600):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.raw_retention_seconds = raw_retention_days * 86400
+        self.rollup_bucket_seconds = rollup_bucket_seconds
+        self.rollup_retention_seconds = rollup_retention_days * 86400 if rollup_retention_days else None
+        self.compaction_interval = compaction_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.compactions = 0
+        self.last_compaction = None
+
+    # --- Yaşam döngüsü ---
+    def start(self):
+        """Yazıcıyı başlatır; veritabanı açılamazsa hatayı (sqlite3.Error / OSError) burada yükseltir."""
+        if self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._run, name="event-store", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            self._thread = None
+            raise self._error
+        return self
+
+    def stop(self, timeout=10):
+        """Kuyruktaki kayıtları yazar ve iş parçacığını durdurur."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    # --- Yazma ---
+    def record(self, camera, captured_at, confidence, level, fix=None, image_path=None, alarm_state=None, track_id=None):
+        """fix: GpsTracker.latest_fix() sonucu (yoksa None); level: seviye klasörü veya None."""
+        row = (captured_at, camera, float(confidence), level or NO_LEVEL,
+               fix.latitude if fix is not None else None, fix.longitude if fix is not None else None,
+               int(fix.stale) if fix is not None else None, image_path, alarm_state, track_id)
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            EVENTS_DROPPED.inc()
+            return False
+
+    def _run(self):
+        try:
+            conn = connect(self.path)
+        except (sqlite3.Error, OSError) as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        next_compaction = time.monotonic() # İlk sıkıştırma açılışta; önceki çalışmalardan kalanlar da toplanır
+        try:
+            stopping = False
+            while not stopping:
+                if self.compaction_interval and time.monotonic() >= next_compaction:
+                    self._compact(conn)
+                    next_compaction = time.monotonic() + self.compaction_interval
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    try:
+                        row = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if row is None:
+                        stopping = True
+                        break
+                    batch.append(row)
+                if batch:
+                    self._write(conn, batch)
+        finally:
+            conn.close()
+
+    def _write(self, conn, batch):
+        try:
+            with BATCH_SECONDS.time(), conn:
+                conn.executemany(INSERT_FRAME, batch)
+        except sqlite3.Error as e:
+            self.dropped += len(batch)
+            EVENTS_DROPPED.inc(len(batch))
+            log.error("Olay kaydına %d kare yazılamadı: %s", len(batch), e)
+            return
+        self.written += len(batch)
+        self.batches += 1
+        EVENTS_WRITTEN.inc(len(batch))
+
+    def _compact(self, conn):
+        try:
+            result = compact(conn, self.raw_retention_seconds, self.rollup_bucket_seconds, self.rollup_retention_seconds)
+        except sqlite3.Error as e:
+            log.error("Olay kaydı sıkıştırılamadı: %s", e)
+            return
+        self.compactions += 1
+        self.last_compaction = result
+        if result["frames_compacted"] or result["rollups_removed"]:
+            log.info("Olay kaydı sıkıştırıldı: %d kare özetlendi, %d eski özet silindi.",
+                     result["frames_compacted"], result["rollups_removed"])
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "compactions": self.compactions,
+        }
+
+
+def create_event_store(config):
+    """CONFIG["event_store"] ayarlarından olay kaydını oluşturur; devre dışıysa None döndürür."""
+    store_config = config.get("event_store") or {}
+    if not store_config.get("enabled", False):
+        return None
+    return EventStore(store_config.get("path", DEFAULT_PATH),
+                      batch_size=store_config.get("batch_size", 200),
+                      flush_interval=store_config.get("flush_interval_seconds", 2.0),
+                      queue_size=store_config.get("queue_size", 5000),
+                      raw_retention_days=store_config.get("raw_retention_days", 7),
+                      rollup_bucket_seconds=store_config.get("rollup_bucket_seconds", 3600),
+                      rollup_retention_days=store_config.get("rollup_retention_days", 365),
+                      compaction_interval=store_config.get("compaction_interval_hours", 6) * 3600)
+
+
+# --- Sorgu Aracı ---
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_time(value, now=None):
+    """'7d', '12h', '30m' (şimdiden geriye) veya ISO tarih ('2025-07-27', '2025-07-27T16:30') -> epoch saniye."""
+    if value is None:
+        return None
+    now = time.time() if now is None else now
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([smhdw])", value)
+    if match:
+        return now - float(match.group(1)) * DURATION_UNITS[match.group(2)]
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Geçersiz zaman: '{value}' (örn. 7d, 12h, 2025-07-27)")
+
+
+def parse_duration(value):
+    """'1h', '1d', '15m' veya saniye -> saniye (tamsayı)."""
+    match = re.fullmatch(r"(\d+)([smhdw]?)", value)
+    if not match:
+        raise argparse.ArgumentTypeError(f"Geçersiz süre: '{value}' (örn. 15m, 1h, 1d)")
+    return int(match.group(1)) * DURATION_UNITS.get(match.group(2) or "s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Yerel olay kaydını (SQLite) sorgular ve sıkıştırır.")
+    parser.add_argument("--db", default=DEFAULT_PATH, help=f"Veritabanı dosyası (varsayılan: {DEFAULT_PATH})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_filters(sub):
+        sub.add_argument("--since", type=parse_time, default=None, help="Başlangıç: 7d, 12h veya ISO tarih")
+        sub.add_argument("--until", type=parse_time, default=None, help="Bitiş: 7d, 12h veya ISO tarih")
+        sub.add_argument("--level", default=None, help=f"Seviye klasörü (ALARM, DIKKAT, AZ_ONEMLI, {NO_LEVEL})")
+        sub.add_argument("--camera", default=None)
+
+    add_filters(commands.add_parser("summary", help="Seviye başına kare sayısı"))
+    rollup_parser = commands.add_parser("rollup", help="Zaman dilimi başına kare sayısı ve güvenirlik")
+    add_filters(rollup_parser)
+    rollup_parser.add_argument("--bucket", type=parse_duration, default=3600, help="Dilim süresi (15m, 1h, 1d)")
+    recent_parser = commands.add_parser("recent", help="En yeni kare kayıtları")
+    add_filters(recent_parser)
+    recent_parser.add_argument("--limit", type=int, default=20)
+    compact_parser = commands.add_parser("compact", help="Eski kareleri özetle ve sil")
+    compact_parser.add_argument("--raw-retention-days", type=float, default=7)
+    compact_parser.add_argument("--rollup-bucket", type=parse_duration, default=3600)
+    compact_parser.add_argument("--rollup-retention-days", type=float, default=365)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        parser.error(f"Veritabanı bulunamadı: {args.db}")
+    if args.command == "compact":
+        conn = connect(args.db)
+        report = compact(conn, args.raw_retention_days * 86400, args.rollup_bucket,
+                         args.rollup_retention_days * 86400 if args.rollup_retention_days else None)
+    else:
+        conn = connect(args.db, readonly=True)
+        filters = {"since": args.since, "until": args.until, "level": args.level, "camera": args.camera}
+        if args.command == "summary":
+            report = summary(conn, **filters)
+        elif args.command == "rollup":
+            report = rollup(conn, args.bucket, **filters)
+        else:
+            report = recent(conn, args.limit, **filters)
+    conn.close()
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
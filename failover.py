@@ -0,0 +1,235 @@
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+
+import metrics
+from alerting import load_recipients, primary_number
+from modem_manager import split_message
+
+
+# --- SMS Yedek Kanalı ---
+# Tespit olayları normalde Firebase'e gider. Veri servisi kesilip SMS çalışmaya devam ederse olaylar
+# yükleyicinin yerel dosyasında bekler ve sahada kimse görmez. Bu katman, Firebase'e grace_seconds
+# süresince ulaşamayan olayları kısa satırlar halinde paketleyip SMS ile gönderir:
+#   YANGIN YEDEK 2 olay
+#   18.10 10:15:02 cam0 A73 41.06853,29.02757 #3x9Q2k
+# Satır: gün.ay saat, kamera, seviye harfi + güvenirlik (%), konum, Firebase anahtarının son 6 karakteri.
+# Birden fazla parça birleştirilmiş (concatenated) SMS olarak gider; saatlik parça bütçesi aşılmaz.
+# Firebase geri geldiğinde yükleyici aynı olayları aynı anahtarlarla yazar (tekrar kayıt oluşmaz) ve
+# henüz SMS ile gönderilmemiş olaylar kuyruktan düşer; bir olay SMS ile en fazla bir kez gönderilir.
+
+HEADER = "YANGIN YEDEK {count} olay"
+KEY_CHARS = 6 # SMS'teki anahtar soneki; Firebase kaydıyla eşleştirmek için
+BUDGET_WINDOW_SECONDS = 3600
+
+log = logging.getLogger(__name__)
+FAILOVER_EVENTS = metrics.counter("failover_events", "SMS yedek kanalındaki olaylar (sent, primary, dropped)", ("result",))
+FAILOVER_SMS_PARTS = metrics.counter("failover_sms_parts", "Yedek kanaldan gönderilen SMS parçaları", ("result",))
+FAILOVER_PENDING = metrics.gauge("failover_pending", "Firebase veya SMS ile gönderilmeyi bekleyen olaylar")
+
+
+def format_event(event):
+    """Olayı tek SMS satırına çevirir (yalnızca GSM 7 bit karakterler)."""
+    latitude, longitude = event["latitude"], event["longitude"]
+    if isinstance(latitude, (int, float)) and isinstance(longitude, (int, float)):
+        position = f"{latitude:.5f},{longitude:.5f}"
+    else:
+        position = "konum-yok"
+    return (f"{event['detected_at']:%d.%m %H:%M:%S} {event['camera']} {event['level'][:1]}{round(event['confidence'] * 100):02d} "
+            f"{position} #{event['key'][-KEY_CHARS:]}")
+
+
+def pack_events(events, max_parts):
+    """
+    Olayları sırayla, max_parts SMS parçasına sığdığı kadar tek mesajda toplar.
+    (metin, paketlenen olaylar) döndürür; hiçbiri sığmazsa ("", []).
+    """
+    lines = []
+    for event in events:
+        candidate = lines + [format_event(event)]
+        text = "\n".join([HEADER.format(count=len(candidate))] + candidate)
+        if len(split_message(text)) > max_parts:
+            break
+        lines = candidate
+    if not lines:
+        return "", []
+    return "\n".join([HEADER.format(count=len(lines))] + lines), list(events[:len(lines)])
+
+
+class SmsFailover:
+    """
+    Firebase yükleyicisini izleyen SMS yedek kanalı.
+    record(key, ...) push_to_firebase ile kuyruğa alınan her tespit olayı için çağrılır. Arka plan iş parçacığı
+    check_interval aralıklarla:
+      - yükleyicinin son tam başarılı gönderiminden (last_delivered_at) önce kaydedilen olayları düşürür,
+      - yükleyici çevrimdışıysa grace_seconds'tan eski olayları seviye önceliğiyle paketleyip send_sms ile gönderir.
+    send_sms(numara, metin) Future döndürür (ModemManager.send_short_message).
+    """
+
+    def __init__(self, uploader, send_sms, recipient, levels=("ALARM", "DIKKAT"), grace_seconds=120,
+                 check_interval=10, max_parts_per_hour=10, max_parts=3, queue_size=200, send_timeout=90):
+        self.uploader = uploader
+        self.send_sms = send_sms
+        self.recipient = recipient
+        self.levels = tuple(levels) # Öncelik sırasıyla yedek kanala alınan seviyeler (klasör adları)
+        self.grace_seconds = grace_seconds
+        self.check_interval = check_interval
+        self.max_parts_per_hour = max_parts_per_hour
+        self.max_parts = max_parts
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self._lock = threading.Lock()
+        self._pending = OrderedDict() # anahtar -> olay (kayıt sırasıyla)
+        self._sent_keys = deque(maxlen=queue_size * 4) # SMS ile gönderilmiş anahtarlar (tekrar gönderilmesin)
+        self._spent = deque() # (zaman, parça) son BUDGET_WINDOW_SECONDS içindeki gönderimler
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._budget_logged = False
+        self.sms_sent = 0
+        self.sms_failed = 0
+        self.parts_sent = 0
+        self.events_sent = 0
+        self.events_primary = 0
+        self.events_dropped = 0
+        FAILOVER_PENDING.set_function(lambda: len(self._pending))
+
+    # --- Yaşam döngüsü ---
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="sms-failover", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.check_interval):
+            try:
+                self.check()
+            except Exception as e:
+                log.exception("SMS yedek kanalı denetiminde hata: %s", e)
+
+    # --- Kayıt ---
+    def record(self, key, camera, detected_at, level, confidence, latitude, longitude):
+        """Firebase'e kuyruğa alınan tespit olayını izlemeye alır. Yedeklenmeyen seviyeler için False."""
+        if level not in self.levels:
+            return False
+        event = {"key": key, "camera": camera, "detected_at": detected_at, "level": level,
+                 "confidence": confidence, "latitude": latitude, "longitude": longitude,
+                 "recorded_at": time.monotonic()}
+        with self._lock:
+            if key in self._pending or key in self._sent_keys:
+                return False
+            if len(self._pending) >= self.queue_size:
+                self._pending.popitem(last=False) # En eski olay düşer; yenisi sahada daha anlamlıdır
+                self.events_dropped += 1
+                FAILOVER_EVENTS.labels(result="dropped").inc()
+            self._pending[key] = event
+        return True
+
+    # --- Denetim ---
+    def check(self, now=None):
+        """Firebase'e ulaşan olayları düşürür; gerekirse bir SMS gönderir. Gönderilen olay sayısını döndürür."""
+        now = time.monotonic() if now is None else now
+        delivered_before = self.uploader.last_delivered_at
+        with self._lock:
+            delivered = [key for key, event in self._pending.items() if event["recorded_at"] < delivered_before]
+            for key in delivered:
+                del self._pending[key]
+            waiting = [event for event in self._pending.values() if now - event["recorded_at"] >= self.grace_seconds]
+        if delivered:
+            self.events_primary += len(delivered)
+            FAILOVER_EVENTS.labels(result="primary").inc(len(delivered))
+        if not waiting or self.uploader.online:
+            return 0
+
+        budget = self.budget_remaining(now)
+        if budget <= 0:
+            if not self._budget_logged:
+                log.warning("SMS yedek kanalı saatlik bütçesi doldu (%d parça); %d olay bekliyor.",
+                            self.max_parts_per_hour, len(waiting))
+                self._budget_logged = True
+            return 0
+        self._budget_logged = False
+
+        # Yüksek seviyeler önce, aynı seviyede eski olaylar önce
+        waiting.sort(key=lambda event: (self.levels.index(event["level"]), event["recorded_at"]))
+        text, packed = pack_events(waiting, min(self.max_parts, budget))
+        if not packed:
+            return 0
+        parts = len(split_message(text))
+        self._spent.append((now, parts))
+        try:
+            ok = self.send_sms(self.recipient, text).result(timeout=self.send_timeout)
+        except Exception as e:
+            log.error("SMS yedek kanalı gönderim hatası: %s", e)
+            ok = False
+        if not ok:
+            self.sms_failed += 1
+            FAILOVER_SMS_PARTS.labels(result="error").inc(parts)
+            return 0
+
+        with self._lock:
+            for event in packed:
+                self._pending.pop(event["key"], None)
+                self._sent_keys.append(event["key"])
+        self.sms_sent += 1
+        self.parts_sent += parts
+        self.events_sent += len(packed)
+        FAILOVER_SMS_PARTS.labels(result="ok").inc(parts)
+        FAILOVER_EVENTS.labels(result="sent").inc(len(packed))
+        log.warning("Firebase'e ulaşılamıyor; %d olay SMS ile gönderildi (%d parça).", len(packed), parts)
+        return len(packed)
+
+    def budget_remaining(self, now=None):
+        """Son bir saatte kullanılmayan SMS parça bütçesi."""
+        now = time.monotonic() if now is None else now
+        while self._spent and now - self._spent[0][0] >= BUDGET_WINDOW_SECONDS:
+            self._spent.popleft()
+        return self.max_parts_per_hour - sum(parts for _, parts in self._spent)
+
+    def stats(self):
+        return {
+            "pending": len(self._pending),
+            "sms_sent": self.sms_sent,
+            "sms_failed": self.sms_failed,
+            "parts_sent": self.parts_sent,
+            "events_sent": self.events_sent,
+            "events_primary": self.events_primary,
+            "events_dropped": self.events_dropped,
+            "budget_remaining": self.budget_remaining(),
+        }
+
+    def format_stats(self):
+        s = self.stats()
+        return (f"[sms yedek] bekleyen={s['pending']} sms={s['sms_sent']} (hata {s['sms_failed']}, {s['parts_sent']} parça) "
+                f"olay: sms={s['events_sent']} firebase={s['events_primary']} düşen={s['events_dropped']} "
+                f"bütçe={s['budget_remaining']}/{self.max_parts_per_hour}")
+
+
+def failover_recipient(config):
+    """Yedek SMS alıcısı: CONFIG["sms_failover"]["recipient"], yoksa nöbet listesinin birincil numarası."""
+    return (config.get("sms_failover") or {}).get("recipient") or primary_number(load_recipients(config))
+
+
+def create_sms_failover(config, uploader, send_sms):
+    """CONFIG["sms_failover"] ayarlarından SMS yedek kanalını oluşturur; devre dışıysa None döndürür."""
+    failover_config = config.get("sms_failover") or {}
+    if not failover_config.get("enabled", False):
+        return None
+    return SmsFailover(
+        uploader, send_sms,
+        recipient=failover_recipient(config),
+        levels=failover_config.get("levels", ("ALARM", "DIKKAT")),
+        grace_seconds=failover_config.get("grace_seconds", 120),
+        check_interval=failover_config.get("check_interval_seconds", 10),
+        max_parts_per_hour=failover_config.get("max_parts_per_hour", 10),
+        max_parts=failover_config.get("max_parts_per_message", 3),
+        queue_size=failover_config.get("queue_size", 200),
+    )
@@ -0,0 +1,379 @@
+import os
+import tty
+import json
+import time
+import queue
+import select
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# --- Test Yardımcıları (Donanımsız Çalıştırma) ---
+# Gerçek SIM7600 ve Firebase olmadan AT katmanını, yükleyiciyi ve iş akışlarını denemek için sahte cihazlar.
+
+
+class InMemorySerial:
+    """serial.Serial'in ATTransport'un kullandığı kısmını taklit eden, FakeModem'e bağlı bellek içi port."""
+
+    def __init__(self, modem, timeout=1):
+        self.port = "fake"
+        self.timeout = timeout
+        self.is_open = True
+        self._modem = modem
+        self._buffer = bytearray()
+        self._cond = threading.Condition()
+
+    @property
+    def in_waiting(self):
+        with self._cond:
+            return len(self._buffer)
+
+    def read(self, size=1):
+        with self._cond:
+            if not self._buffer and self.is_open:
+                self._cond.wait(self.timeout)
+            if not self.is_open:
+                raise OSError("Port kapalı")
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            return data
+
+    def write(self, data):
+        if not self.is_open:
+            raise OSError("Port kapalı")
+        self._modem._inbound.put(bytes(data))
+        return len(data)
+
+    def reset_input_buffer(self):
+        with self._cond:
+            self._buffer.clear()
+
+    def close(self):
+        with self._cond:
+            self.is_open = False
+            self._cond.notify_all()
+
+    def _deliver(self, data):
+        with self._cond:
+            self._buffer += data
+            self._cond.notify_all()
+
+
+class FakeModem:
+    """
+    Sözde terminal (pty) üzerinden SIM7600 gibi davranan sahte modem.
+    port özniteliği serial.Serial() ile açılabilecek cihaz yoludur (örn. /dev/pts/5).
+    pty=False ise sözde terminal açılmaz; open_port() ile alınan bellek içi port kullanılır.
+    Yanıtlar responses sözlüğüyle özelleştirilebilir; inject() ile kendiliğinden satır (URC) gönderilir.
+    powered=False ile kapalı başlar; press_power_key() (FakeGpio on_pulse) açılış URC'leriyle açar/kapatır.
+    answer_after {numara: saniye} ile aranan numara bu süre sonra açar: answer_urc=True ise VOICE CALL: BEGIN gönderilir,
+    her durumda AT+CLCC görüşmeyi sürüyor (stat 0) olarak raporlar.
+    """
+
+    DEFAULT_RESPONSES = {
+        "AT": ["OK"],
+        "ATE0": ["OK"],
+        "AT+CPIN?": ["+CPIN: READY", "", "OK"],
+        "AT+CREG?": ["+CREG: 0,1", "", "OK"],
+        "AT+CGPS=1,1": ["OK"],
+        "AT+CGPS=0": ["OK"],
+        "AT+CGPSINFO": ["+CGPSINFO: 4104.123456,N,02901.654321,E,181026,101500.0,120.0,0.0,0.0", "", "OK"],
+        "AT+CMGF=1": ["OK"],
+        "AT+CHUP": ["OK"],
+        "AT+CLCC": ["OK"],
+    }
+
+    def __init__(self, responses=None, response_delay=0.01, echo=False, pty=True, powered=True, boot_seconds=3.0,
+                 answer_after=None, answer_urc=True):
+        self.responses = dict(self.DEFAULT_RESPONSES)
+        if responses:
+            self.responses.update(responses)
+        self.response_delay = response_delay
+        self.echo = echo
+        self.received = [] # Alınan komutların listesi (doğrulama için)
+        self.sms_sent = [] # (numara, metin) listesi
+        self.sms_cancelled = 0 # ESC ile iptal edilen metin girişleri
+        self.calls = [] # Aranan numaralar
+        self.answer_after = dict(answer_after or {})
+        self.answer_urc = answer_urc
+        self._call = None # [numara, açıldı mı]
+        self.sms_result = "+CMGS: 1"
+        self.powered = powered
+        self.boot_seconds = boot_seconds
+        self.power_key_presses = 0
+        self._memory_port = None
+        self._inbound = queue.Queue()
+        if pty:
+            self._master, self._slave = os.openpty()
+            tty.setraw(self._slave)
+            self.port = os.ttyname(self._slave)
+        else:
+            self._master = self._slave = None
+            self.port = "fake"
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._sms_number = None
+        self._write_lock = threading.Lock()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="fake-modem", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(2)
+        if self._memory_port is not None:
+            self._memory_port.close()
+        for fd in (self._master, self._slave):
+            if fd is None:
+                continue
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def open_port(self, timeout=1):
+        """Bellek içi seri portu döndürür (pty=False)."""
+        self._memory_port = InMemorySerial(self, timeout=timeout)
+        return self._memory_port
+
+    def press_power_key(self, pin=None, seconds=None):
+        """Güç anahtarı: kapalıysa boot_seconds sonra açılış URC'leriyle açılır, açıksa kapanır."""
+        self.power_key_presses += 1
+
+        def toggle():
+            if self.powered:
+                self._write_lines(["NORMAL POWER DOWN"])
+                self.powered = False
+                return
+            time.sleep(self.boot_seconds)
+            self.powered = True
+            for urc in ("RDY", "+CPIN: READY", "SMS DONE", "PB DONE"):
+                self._write_lines([urc])
+
+        threading.Thread(target=toggle, name="fake-modem-power", daemon=True).start()
+
+    def _answer(self, call):
+        if self._call is not call:
+            return # Arama bu arada kapatıldı
+        call[1] = True
+        if self.answer_urc:
+            self._write_lines(["VOICE CALL: BEGIN"])
+
+    def inject(self, line):
+        """Modemden kendiliğinden gelmiş gibi bir satır gönderir (örn. 'RING', '+CMTI: \"SM\",3')."""
+        self._write_lines([line])
+
+    def _write_lines(self, lines):
+        data = "".join(f"\r\n{line}\r\n" if line else "" for line in lines)
+        self._emit(data.encode())
+
+    def _emit(self, data):
+        with self._write_lock:
+            if self._master is not None:
+                os.write(self._master, data)
+            elif self._memory_port is not None:
+                self._memory_port._deliver(data)
+
+    def _respond(self, command):
+        self.received.append(command)
+        if not self.powered:
+            return # Kapalı modül yanıt vermez
+        if self.echo:
+            self._write_lines([command])
+        if self.response_delay:
+            time.sleep(self.response_delay)
+        if command.startswith(("AT+CMGS=", "AT+CMGSEX=")):
+            # Birleştirilmiş mesaj parçaları (AT+CMGSEX="numara",ref,sıra,toplam) ayrı kayıtlar olarak tutulur
+            self._sms_number = command.split("=", 1)[1].split(",")[0].strip('"')
+            self._emit(b"\r\n> ")
+            return
+        if command.startswith("ATD"):
+            number = command[3:].rstrip(";")
+            self.calls.append(number)
+            self._write_lines(self.responses.get("ATD", ["OK"]))
+            call = self._call = [number, False]
+            if number in self.answer_after:
+                timer = threading.Timer(self.answer_after[number], self._answer, args=(call,))
+                timer.daemon = True
+                timer.start()
+            return
+        if command == "AT+CHUP":
+            self._call = None
+        if command == "AT+CLCC" and self._call is not None:
+            number, answered = self._call
+            self._write_lines([f'+CLCC: 1,0,{0 if answered else 3},0,0,"{number}",129', "", "OK"])
+            return
+        response = self.responses.get(command)
+        if callable(response):
+            response = response(command)
+        self._write_lines(response if response is not None else ["ERROR"])
+
+    def _run(self):
+        buffer = b""
+        while not self._stop_event.is_set():
+            try:
+                if self._master is None:
+                    buffer += self._inbound.get(timeout=0.1)
+                else:
+                    ready, _, _ = select.select([self._master], [], [], 0.1)
+                    if not ready:
+                        continue
+                    buffer += os.read(self._master, 4096)
+            except queue.Empty:
+                continue
+            except OSError:
+                break
+            while True:
+                if self._sms_number is not None:
+                    # SMS metni CTRL+Z ile biter; ESC metin girişini iptal eder (mesaj gönderilmez)
+                    end = buffer.find(b"\x1a")
+                    escape = buffer.find(b"\x1b")
+                    if escape >= 0 and (end < 0 or escape < end):
+                        buffer = buffer[escape + 1:]
+                        self._sms_number = None
+                        self.sms_cancelled += 1
+                        continue
+                    if end < 0:
+                        break
+                    text, buffer = buffer[:end].decode(errors="ignore"), buffer[end + 1:]
+                    self.sms_sent.append((self._sms_number, text))
+                    self._sms_number = None
+                    time.sleep(self.response_delay)
+                    self._write_lines([self.sms_result, "", "OK"])
+                    continue
+                end = buffer.find(b"\r")
+                if end < 0:
+                    break
+                # Komut modunda ESC yok sayılır
+                line, buffer = buffer[:end].decode(errors="ignore").replace("\x1b", "").strip(), buffer[end + 1:].lstrip(b"\n")
+                if line:
+                    self._respond(line)
+
+
+class FakeFirebaseServer:
+    """
+    Firebase Realtime Database REST arayüzünü taklit eden yerel HTTP sunucusu (GET/PUT/POST/PATCH).
+    url özniteliği FIREBASE_URL yerine kullanılabilir. fail=True iken tüm istekler 503 ile reddedilir.
+    Açılan TCP bağlantıları sayılır; böylece keep-alive kullanımı doğrulanabilir.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.data = {}
+        self.requests = [] # (metot, yol, gövde)
+        self.connections = 0
+        self.fail = False
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self.url = f"http://{host}:{self._server.server_address[1]}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-firebase", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def get(self, path=""):
+        node = self.data
+        for part in [p for p in path.strip("/").split("/") if p]:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def _set(self, path, value):
+        parts = [p for p in path.strip("/").split("/") if p]
+        if not parts:
+            self.data = value if isinstance(value, dict) else {}
+            return
+        node = self.data
+        for part in parts[:-1]:
+            if not isinstance(node.get(part), dict):
+                node[part] = {}
+            node = node[part]
+        node[parts[-1]] = value
+
+    def _handle(self, method, path, body):
+        with self._lock:
+            self.requests.append((method, path, body))
+            if self.fail:
+                return 503, {"error": "service unavailable"}
+            if method == "GET":
+                return 200, self.get(path)
+            if method == "PUT":
+                self._set(path, body)
+                return 200, body
+            if method == "POST":
+                key = f"-fake{len(self.requests):08d}"
+                self._set(f"{path}/{key}", body)
+                return 200, {"name": key}
+            if method == "PATCH":
+                # Çok yollu güncelleme: her anahtar path'e göre göreli bir yoldur
+                for sub_path, value in body.items():
+                    self._set(f"{path}/{sub_path}", value)
+                return 200, body
+        return 405, {"error": "method not allowed"}
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # keep-alive
+
+            def setup(self):
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+
+            def _serve(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                body = json.loads(raw) if raw else None
+                path = self.path.split("?")[0]
+                if path.endswith(".json"):
+                    path = path[:-len(".json")]
+                status, payload = fake._handle(method, path, body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_PUT(self):
+                self._serve("PUT")
+
+            def do_POST(self):
+                self._serve("POST")
+
+            def do_PATCH(self):
+                self._serve("PATCH")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,311 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+
+# --- Firebase Yükleyici ---
+# Hücresel bağlantıda her kare için yeni TLS bağlantısı açmamak için tek bir kalıcı (keep-alive)
+# requests.Session kullanılır. Durum (PUT) yazıları yola göre birleştirilir, yalnızca en güncel
+# değer gönderilir; olay (POST) kayıtları tek bir çok yollu PATCH isteğinde toplu gönderilir.
+# Ağ yoksa olaylar yerel bir dosyaya eklenir ve bağlantı geri geldiğinde yeniden gönderilir.
+
+PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+log = logging.getLogger(__name__)
+FIREBASE_REQUEST_SECONDS = metrics.histogram("firebase_request_seconds", "Firebase PATCH isteğinin süresi", ("result",))
+FIREBASE_UPLOAD_FAILURES = metrics.counter("firebase_upload_failures", "Başarısız Firebase PATCH istekleri")
+FIREBASE_EVENTS_SPOOLED = metrics.counter("firebase_events_spooled", "Ağ olmadığı için yerel dosyaya yazılan olaylar")
+FIREBASE_BYTES_SENT = metrics.counter("firebase_bytes_sent", "Başarıyla gönderilen PATCH gövdesi (bayt)")
+BYTES_WINDOW_SECONDS = 3600 # bytes_last_hour() penceresi
+
+
+def generate_push_id(now_ms=None):
+    """
+    Firebase'in POST ile ürettiğine benzer, zamana göre sıralanan 20 karakterlik anahtar üretir.
+    Anahtar cihazda üretildiği için aynı olay yeniden gönderilse bile tekrar kayıt oluşmaz.
+    """
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    time_chars = []
+    for _ in range(8):
+        time_chars.append(PUSH_CHARS[now_ms % 64])
+        now_ms //= 64
+    return "".join(reversed(time_chars)) + "".join(random.choice(PUSH_CHARS) for _ in range(12))
+
+
+class FirebaseUploader:
+    """
+    Firebase Realtime Database'e arka planda toplu yazan yükleyici.
+    put(path, data)  : Yolun değerini değiştirir; aynı yola art arda yazılanlardan yalnızca sonuncusu gönderilir.
+    update(path, fields): Yalnızca verilen alanları yazar ("yol/alan"); yolun diğer alanları korunur.
+    push(path, data) : Yola yeni kayıt ekler; kayıtlar flush_interval aralıklarla tek PATCH ile gönderilir.
+    """
+
+    def __init__(self, base_url, spool_path, flush_interval=2.0, max_batch=50, timeout=10,
+                 retry_interval=30.0, session=None):
+        self.base_url = base_url.rstrip("/")
+        self.spool_path = spool_path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.retry_interval = retry_interval # Bağlantı yokken yeniden deneme aralığı
+        self.session = session or self._create_session()
+        self._lock = threading.Lock()
+        self._pending_puts = {} # yol -> en güncel değer
+        self._pending_events = [] # (yol/anahtar, değer)
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._online = True
+        self._next_attempt = 0.0
+        self.last_delivered_at = time.monotonic() # Bu andan önce eklenen her yazı gönderildi (tam başarılı son flush)
+        self.requests_sent = 0
+        self.requests_failed = 0
+        self.puts_coalesced = 0
+        self.events_sent = 0
+        self.events_spooled = 0
+        self.bytes_sent = 0 # Başarılı PATCH gövdeleri; TLS/HTTP başlıkları dahil değil
+        self._bytes_window = deque() # (zaman, bayt) son BYTES_WINDOW_SECONDS içindeki gönderimler
+
+    @staticmethod
+    def _create_session():
+        session = requests.Session()
+        # Tek bir kalıcı bağlantı yeterli; yeniden denemeler yükleyicinin kendisi tarafından yapılır
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    # --- Yaşam döngüsü ---
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="firebase-uploader", daemon=True)
+        self._thread.start()
+        spooled = self.spooled_count()
+        if spooled:
+            log.info("Firebase: önceki çalışmadan %d gönderilmemiş olay bulundu, yeniden gönderilecek.", spooled)
+
+    def stop(self, flush=True):
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._thread is not None:
+            self._thread.join(self.timeout + 5)
+            self._thread = None
+        if flush:
+            self.flush(force=True)
+        self.session.close()
+
+    @property
+    def online(self):
+        return self._online
+
+    # --- Yazma ---
+    def put(self, path, data):
+        with self._lock:
+            if path in self._pending_puts:
+                self.puts_coalesced += 1
+            # Çok yollu PATCH'te bir yol ile alt yolu birlikte bulunamaz; yeni tam değer alt yazıları kapsar
+            prefix = path + "/"
+            for child in [p for p in self._pending_puts if p.startswith(prefix)]:
+                del self._pending_puts[child]
+                self.puts_coalesced += 1
+            self._pending_puts[path] = data
+
+    def update(self, path, fields):
+        """Yolun yalnızca verilen alanlarını yazar. Yolun tam değeri henüz gönderilmediyse alanlar ona eklenir."""
+        with self._lock:
+            pending = self._pending_puts.get(path)
+            if isinstance(pending, dict):
+                self._pending_puts[path] = {**pending, **fields}
+                self.puts_coalesced += 1
+                return
+            for field, value in fields.items():
+                child = f"{path}/{field}"
+                if child in self._pending_puts:
+                    self.puts_coalesced += 1
+                self._pending_puts[child] = value
+
+    def push(self, path, data, urgent=False):
+        """Yeni kayıt ekler ve üretilen anahtarı döndürür. urgent=True ise hemen gönderim denenir."""
+        key = generate_push_id()
+        with self._lock:
+            self._pending_events.append((f"{path}/{key}", data))
+        if urgent:
+            self._next_attempt = 0.0 # Bağlantı yoksa bile yeniden denemeyi öne çek
+            self._wake_event.set()
+        return key
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wake_event.wait(self.flush_interval)
+            self._wake_event.clear()
+            if self._stop_event.is_set():
+                break
+            self.flush()
+
+    def flush(self, force=False):
+        """Bekleyen durum ve olay yazılarını gönderir. Gönderim başarılıysa True."""
+        if not force and not self._online and time.monotonic() < self._next_attempt:
+            # Bağlantı yok; yeni olaylar kaybolmasın diye dosyaya yazılır
+            with self._lock:
+                events, self._pending_events = self._pending_events, []
+            self._spool(events)
+            return False
+
+        started = time.monotonic()
+        with self._lock:
+            puts, self._pending_puts = self._pending_puts, {}
+            events, self._pending_events = self._pending_events, []
+
+        spooled = self._read_spool()
+        all_events = spooled + events
+        if not puts and not all_events:
+            self.last_delivered_at = started
+            return True
+
+        # Çok yollu PATCH: {"yol": değer, "olaylar/-Anahtar": olay, ...} tek istekte yazılır.
+        # Durumlar ilk partiye girer; olaylar max_batch büyüklüğünde partilere bölünür.
+        sent = 0
+        body = dict(puts)
+        while True:
+            take = self.max_batch - len(body) if body else self.max_batch
+            chunk = all_events[sent:sent + max(take, 0)]
+            body.update(chunk)
+            if not body:
+                break
+            if not self._patch(body):
+                self._rewrite_spool(all_events[sent:])
+                self.events_spooled += len(events)
+                FIREBASE_EVENTS_SPOOLED.inc(len(events))
+                with self._lock:
+                    # Gönderilemeyen durum yazıları, bu arada gelen daha yeni değerlerin önüne geçmesin
+                    for path, data in puts.items():
+                        self._requeue_put(path, data)
+                return False
+            sent += len(chunk)
+            self.events_sent += len(chunk)
+            puts = {}
+            body = {}
+            if sent >= len(all_events):
+                break
+        if spooled:
+            self._rewrite_spool([])
+            log.info("Firebase: bağlantı geri geldi, %d bekleyen olay gönderildi.", len(spooled))
+        self.last_delivered_at = started
+        return True
+
+    def _requeue_put(self, path, data):
+        # Kilit altında çağrılır. Bu arada gelen alan yazıları ("yol/alan") tam değerin içine katılır.
+        if path in self._pending_puts:
+            return
+        prefix = path + "/"
+        fields = {child[len(prefix):]: child for child in self._pending_puts if child.startswith(prefix)}
+        if fields:
+            if not isinstance(data, dict) or any("/" in field for field in fields):
+                return # Birleştirilemeyen daha yeni alt yazılar önceliklidir
+            data = {**data, **{field: self._pending_puts.pop(child) for field, child in fields.items()}}
+        self._pending_puts[path] = data
+
+    def _patch(self, body):
+        payload = json.dumps(body)
+        started = time.perf_counter()
+        try:
+            response = self.session.patch(f"{self.base_url}.json", data=payload, timeout=self.timeout)
+            response.raise_for_status()
+            FIREBASE_REQUEST_SECONDS.labels(result="ok").observe(time.perf_counter() - started)
+            self.requests_sent += 1
+            self._count_bytes(len(payload.encode()))
+            if not self._online:
+                log.info("Firebase bağlantısı yeniden kuruldu.")
+            self._online = True
+            return True
+        except requests.exceptions.RequestException as e:
+            FIREBASE_REQUEST_SECONDS.labels(result="error").observe(time.perf_counter() - started)
+            FIREBASE_UPLOAD_FAILURES.inc()
+            self.requests_failed += 1
+            if self._online:
+                log.warning("Firebase PATCH veri gönderme hatası: %s. Olaylar yerel dosyaya kaydedilecek.", e)
+            self._online = False
+            self._next_attempt = time.monotonic() + self.retry_interval
+            return False
+
+    def _count_bytes(self, size):
+        now = time.monotonic()
+        with self._lock:
+            self.bytes_sent += size
+            self._bytes_window.append((now, size))
+            while self._bytes_window and now - self._bytes_window[0][0] > BYTES_WINDOW_SECONDS:
+                self._bytes_window.popleft()
+        FIREBASE_BYTES_SENT.inc(size)
+
+    def bytes_last_hour(self):
+        """Son bir saatte gönderilen gövde baytı (veri paketi tüketimiyle karşılaştırmak için)."""
+        now = time.monotonic()
+        with self._lock:
+            return sum(size for sent_at, size in self._bytes_window if now - sent_at <= BYTES_WINDOW_SECONDS)
+
+    # --- Yerel kuyruk dosyası (spool) ---
+    def _spool(self, events):
+        if not events:
+            return
+        directory = os.path.dirname(self.spool_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.spool_path, "a", encoding="utf-8") as f:
+            for path, data in events:
+                f.write(json.dumps({"path": path, "data": data}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.events_spooled += len(events)
+        FIREBASE_EVENTS_SPOOLED.inc(len(events))
+
+    def _read_spool(self):
+        if not os.path.exists(self.spool_path):
+            return []
+        events = []
+        with open(self.spool_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    events.append((record["path"], record["data"]))
+                except (ValueError, KeyError):
+                    continue # Elektrik kesintisinde yarım kalmış satır
+        return events
+
+    def _rewrite_spool(self, events):
+        if not events:
+            if os.path.exists(self.spool_path):
+                os.remove(self.spool_path)
+            return
+        tmp_path = self.spool_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for path, data in events:
+                f.write(json.dumps({"path": path, "data": data}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.spool_path)
+
+    def spooled_count(self):
+        return len(self._read_spool())
+
+    def stats(self):
+        return {
+            "online": self._online,
+            "requests_sent": self.requests_sent,
+            "requests_failed": self.requests_failed,
+            "puts_coalesced": self.puts_coalesced,
+            "events_sent": self.events_sent,
+            "events_spooled": self.events_spooled,
+            "bytes_sent": self.bytes_sent,
+            "bytes_last_hour": self.bytes_last_hour(),
+        }
@@ -0,0 +1,131 @@
+import sys
+import time
+import logging
+from collections import deque
+
+import numpy as np
+
+from camera import decode_jpeg
+
+log = logging.getLogger(__name__)
+
+
+# --- Alarm Öncesi Kare Tamponu ---
+# ALARM seviyesindeki kareler çözülmüş BGR dizileri yerine kameradan gelen JPEG baytları ve tespit
+# kutularıyla birlikte saklanır (640x480 için ~0.9 MB yerine ~50 KB). Tampon boşaltılırken de kareler
+# çözülmez: her kare için render_annotated tembel bir çizim işi olarak kaydediciye verilir ve kayıt iş
+# parçacığında tek tek çözülüp çizilir, böylece alarm anında çözülmüş kareler bellekte birikmez.
+
+BOX_COLOR = (0, 0, 255) # BGR: kırmızı
+
+
+class BufferedFrame:
+    """Tampondaki tek kare: JPEG baytları, yakalanma zamanı ve tespitler."""
+
+    __slots__ = ("jpeg_bytes", "captured_at", "boxes", "confidences", "classes", "class_names")
+
+    def __init__(self, jpeg_bytes, captured_at, boxes, confidences, classes, class_names=None):
+        self.jpeg_bytes = jpeg_bytes
+        self.captured_at = captured_at
+        self.boxes = boxes # (N, 4) xyxy, float32
+        self.confidences = confidences # (N,) float32
+        self.classes = classes # (N,) int32
+        self.class_names = class_names # model sınıf adları sözlüğü (paylaşılan referans)
+
+    @property
+    def nbytes(self):
+        return len(self.jpeg_bytes) + self.boxes.nbytes + self.confidences.nbytes + self.classes.nbytes
+
+
+class AlarmFrameBuffer:
+    """
+    Sabit kapasiteli halka tampon. max_frames kareden fazlası veya window_seconds saniyeden eski kareler
+    otomatik olarak düşer (deque maxlen ile O(1)). window_seconds None ise yalnızca sayı sınırı uygulanır.
+    """
+
+    def __init__(self, max_frames=100, window_seconds=None, encode_quality=90):
+        self.max_frames = max_frames
+        self.window_seconds = window_seconds
+        self.encode_quality = encode_quality
+        self._frames = deque(maxlen=max_frames)
+
+    def __len__(self):
+        self._expire()
+        return len(self._frames)
+
+    def append(self, jpeg_bytes, boxes, confidences, classes, class_names=None, frame=None, captured_at=None):
+        """
+        Kareyi tampona ekler. JPEG baytları yoksa (örn. V4L2 kaynağı) frame bir kez JPEG'e kodlanır.
+        """
+        if jpeg_bytes is None:
+            import cv2 # OpenCV içe aktarımı yavaştır; ilk kullanımda yüklenir
+            ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.encode_quality])
+            if not ok:
+                log.warning("Alarm tamponu için kare JPEG'e kodlanamadı.")
+                return
+            jpeg_bytes = encoded.tobytes()
+        self._frames.append(BufferedFrame(
+            jpeg_bytes,
+            captured_at if captured_at is not None else time.time(),
+            np.asarray(boxes, dtype=np.float32).reshape(-1, 4),
+            np.asarray(confidences, dtype=np.float32).reshape(-1),
+            np.asarray(classes, dtype=np.int32).reshape(-1),
+            class_names,
+        ))
+        self._expire()
+
+    def _expire(self):
+        if not self.window_seconds:
+            return
+        cutoff = time.time() - self.window_seconds
+        while self._frames and self._frames[0].captured_at < cutoff:
+            self._frames.popleft()
+
+    def snapshot(self):
+        """Tampondaki karelerin (eskiden yeniye) kopya listesini döndürür."""
+        self._expire()
+        return list(self._frames)
+
+    def clear(self):
+        self._frames.clear()
+
+    def memory_bytes(self):
+        """Tamponun yaklaşık bellek kullanımı (JPEG baytları + kutu dizileri + nesne ek yükü)."""
+        return sum(entry.nbytes + sys.getsizeof(entry) for entry in self._frames)
+
+    def stats(self):
+        count = len(self)
+        memory = self.memory_bytes()
+        return {
+            "frames": count,
+            "max_frames": self.max_frames,
+            "window_seconds": self.window_seconds,
+            "memory_bytes": memory,
+            "avg_frame_bytes": memory // count if count else 0,
+        }
+
+
+def draw_detections(image, boxes, confidences, classes, class_names=None):
+    """Tespit kutularını güvenirlik etiketleriyle görüntünün üzerine çizer (yerinde) ve görüntüyü döndürür."""
+    import cv2
+    for (x1, y1, x2, y2), confidence, cls in zip(boxes, confidences, classes):
+        p1, p2 = (int(x1), int(y1)), (int(x2), int(y2))
+        cv2.rectangle(image, p1, p2, BOX_COLOR, 2)
+        name = class_names.get(int(cls), str(cls)) if class_names else str(cls)
+        label = f"{name} {confidence:.2f}"
+        (text_w, text_h), baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+        top = max(p1[1] - text_h - baseline, 0)
+        cv2.rectangle(image, (p1[0], top), (p1[0] + text_w, top + text_h + baseline), BOX_COLOR, -1)
+        cv2.putText(image, label, (p1[0], top + text_h), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
+    return image
+
+
+def render_annotated(entry):
+    """
+    Tampondaki bir kareyi çözer ve tespit kutularını güvenirlik etiketleriyle çizer; JPEG çözülemezse None.
+    Kayıt iş parçacığında çağrılmak üzere tasarlanmıştır (ImageWriter.submit_batch ile render işi olarak).
+    """
+    image = decode_jpeg(entry.jpeg_bytes)
+    if image is None:
+        return None
+    return draw_detections(image, entry.boxes, entry.confidences, entry.classes, entry.class_names)
@@ -0,0 +1,181 @@
+import time
+import logging
+import threading
+from datetime import datetime
+
+from logs import fields
+
+
+# --- GPS Takibi ---
+# Konum, tespit döngüsünden bağımsız olarak arka planda kendi hızında sorgulanır.
+# Döngü yalnızca önbellekteki son konumu okur, böylece GPS kilidi beklenirken kare işleme durmaz.
+
+log = logging.getLogger(__name__)
+
+def parse_cgpsinfo(cgpsinfo_str):
+    """
+    AT+CGPSINFO yanıtını ayrıştırır ve enlem, boylam, zamanı döndürür.
+    """
+    if not cgpsinfo_str or '+CGPSINFO:' not in cgpsinfo_str:
+        return None, None, None
+
+    parts = cgpsinfo_str.strip().split('+CGPSINFO: ')[1].split(',')
+
+    if len(parts) < 9:
+        log.warning("GPS ayrıştırma hatası: Beklenenden az parça (%d). Cümle: %s", len(parts), cgpsinfo_str)
+        return None, None, None
+
+    try:
+        lat_raw = parts[0]
+        lat_hemi = parts[1]
+        latitude = None
+        if lat_raw and lat_hemi:
+            lat_deg = float(lat_raw[0:2])
+            lat_min = float(lat_raw[2:])
+            latitude = lat_deg + (lat_min / 60)
+            if lat_hemi == 'S':
+                latitude *= -1
+
+        lon_raw = parts[2]
+        lon_hemi = parts[3]
+        longitude = None
+        if lon_raw and lon_hemi:
+            lon_deg = float(lon_raw[0:3])
+            lon_min = float(lon_raw[3:])
+            longitude = lon_deg + (lon_min / 60)
+            if lon_hemi == 'W':
+                longitude *= -1
+
+        date_raw = parts[4]
+        time_raw = parts[5]
+
+        timestamp = None
+        if date_raw and time_raw:
+            try:
+                year = int(date_raw[4:6]) + 2000
+                month = int(date_raw[2:4])
+                day = int(date_raw[0:2])
+                hour = int(time_raw[0:2])
+                minute = int(time_raw[2:4])
+                second = int(time_raw[4:6].split('.')[0])
+
+                timestamp = datetime(year, month, day, hour, minute, second).isoformat()
+            except ValueError as ve:
+                log.warning("Tarih/Zaman dönüştürme hatası: %s - Date: '%s', Time: '%s'", ve, date_raw, time_raw)
+                timestamp = datetime.now().isoformat()
+        else:
+            timestamp = datetime.now().isoformat()
+
+        return latitude, longitude, timestamp
+
+    except ValueError as e:
+        log.warning("GPS ayrıştırma hatası (ValueError): %s - Cümle: %s", e, cgpsinfo_str)
+        return None, None, None
+    except IndexError as e:
+        log.warning("GPS ayrıştırma hatası (IndexError): %s - Cümle: %s", e, cgpsinfo_str)
+        return None, None, None
+    except Exception as e:
+        log.exception("GPS ayrıştırma sırasında beklenmedik hata: %s - Cümle: %s", e, cgpsinfo_str)
+        return None, None, None
+
+
+class GpsFix:
+    """Son geçerli GPS konumu ve alınma zamanı."""
+
+    def __init__(self, latitude, longitude, timestamp, received_at, stale_after):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.timestamp = timestamp
+        self.received_at = received_at # time.monotonic() değeri
+        self.stale_after = stale_after
+
+    @property
+    def age_seconds(self):
+        return time.monotonic() - self.received_at
+
+    @property
+    def stale(self):
+        """Konum, yapılandırılan süreden daha eskiyse bayat kabul edilir."""
+        return self.age_seconds > self.stale_after
+
+    def __repr__(self):
+        return (f"GpsFix(lat={self.latitude}, lon={self.longitude}, time={self.timestamp}, "
+                f"age={self.age_seconds:.1f}s, stale={self.stale})")
+
+
+class GpsTracker:
+    """
+    SIM7600 GPS konumunu arka plan iş parçacığında periyodik olarak sorgular ve son geçerli
+    konumu önbellekte tutar. latest_fix() hiçbir zaman modemi beklemez.
+    send_at: (komut, beklenen_yanıt, zaman_aşımı) alıp yanıtı ya da None döndüren fonksiyon.
+    """
+
+    def __init__(self, send_at, poll_interval=2.0, stale_after=30.0, no_lock_interval=None):
+        self.send_at = send_at
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        # Kilit yokken daha seyrek sorgulama yapılabilir (varsayılan: poll_interval)
+        self.no_lock_interval = no_lock_interval or poll_interval
+        self._fix = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._has_lock = False
+        self.polls = 0
+        self.failed_polls = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="gps-tracker", daemon=True)
+        self._thread.start()
+        log.info("GPS takibi başlatıldı (sorgu aralığı %s sn, bayat sınırı %s sn).", self.poll_interval, self.stale_after)
+
+    def stop(self, timeout=5):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def latest_fix(self):
+        """Son geçerli konumu (GpsFix) döndürür; hiç konum alınmadıysa None. Engellemez."""
+        with self._lock:
+            return self._fix
+
+    def update_from_response(self, response):
+        """Bir +CGPSINFO yanıtını ayrıştırıp geçerliyse önbelleğe yazar. Konum alındıysa True."""
+        if not response or ',,,,,,' in response:
+            if self._has_lock:
+                log.warning('GPS konum kilidi kayboldu, son konum önbellekte tutuluyor.')
+            self._has_lock = False
+            return False
+        latitude, longitude, timestamp = parse_cgpsinfo(response)
+        if latitude is None or longitude is None:
+            return False
+        with self._lock:
+            self._fix = GpsFix(latitude, longitude, timestamp, time.monotonic(), self.stale_after)
+        if not self._has_lock:
+            log.info("GPS konumu kilitlendi.", extra=fields(lat=latitude, lon=longitude, time=timestamp))
+        self._has_lock = True
+        return True
+
+    def poll_once(self):
+        """AT+CGPSINFO ile bir kez sorgular."""
+        self.polls += 1
+        response = self.send_at('AT+CGPSINFO', '+CGPSINFO: ', 1) # Sadece bilgi sorgula
+        if response is None:
+            self.failed_polls += 1
+            return False
+        return self.update_from_response(response)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                got_fix = self.poll_once()
+            except Exception as e:
+                log.exception("GPS sorgusu sırasında beklenmedik hata: %s", e)
+                got_fix = False
+            interval = self.poll_interval if got_fix else self.no_lock_interval
+            self._stop_event.wait(max(0.0, interval - (time.monotonic() - started)))
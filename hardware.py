@@ -0,0 +1,99 @@
+import time
+import threading
+
+
+# --- Donanım Arayüzleri (GPIO ve Seri Port) ---
+# RPi.GPIO ve pyserial yalnızca gerçek donanım seçildiğinde, ilk kullanımda içe aktarılır. Böylece main.py ve
+# yardımcı araçlar Raspberry Pi kütüphaneleri olmadan içe aktarılabilir; "fake" seçildiğinde tüm işlem hattı
+# bellek içi sahte GPIO ve sahte modemle (fakes.py) sıradan bir Linux makinesinde çalışır.
+
+GPIO_BACKENDS = ("rpi", "fake")
+SERIAL_BACKENDS = ("pyserial", "fake")
+
+
+class RpiGpio:
+    """RPi.GPIO üzerinde BCM numaralı çıkış pinleri."""
+
+    name = "rpi"
+
+    def __init__(self):
+        import RPi.GPIO as GPIO # Yalnızca Raspberry Pi'de bulunur
+        self._gpio = GPIO
+        self._configured = set()
+
+    def setup_output(self, pin):
+        if pin in self._configured:
+            return
+        self._gpio.setmode(self._gpio.BCM)
+        self._gpio.setwarnings(False)
+        self._gpio.setup(pin, self._gpio.OUT)
+        self._configured.add(pin)
+
+    def write(self, pin, high):
+        self._gpio.output(pin, self._gpio.HIGH if high else self._gpio.LOW)
+
+    def cleanup(self):
+        self._gpio.cleanup()
+        self._configured.clear()
+
+
+class FakeGpio:
+    """
+    Bellek içi GPIO. Yazılan değerler writes listesinde tutulur; bir pin HIGH'dan LOW'a indiğinde
+    on_pulse(pin, basılı_kalma_süresi) çağrılır (örn. FakeModem.press_power_key).
+    """
+
+    name = "fake"
+
+    def __init__(self, on_pulse=None):
+        self.on_pulse = on_pulse
+        self.levels = {}
+        self.writes = [] # (zaman, pin, değer)
+        self._raised_at = {}
+        self._lock = threading.Lock()
+
+    def setup_output(self, pin):
+        with self._lock:
+            self.levels.setdefault(pin, False)
+
+    def write(self, pin, high):
+        now = time.monotonic()
+        with self._lock:
+            previous = self.levels.get(pin, False)
+            self.levels[pin] = bool(high)
+            self.writes.append((now, pin, bool(high)))
+            if high and not previous:
+                self._raised_at[pin] = now
+            raised_at = self._raised_at.pop(pin, None) if previous and not high else None
+        if raised_at is not None and self.on_pulse is not None:
+            self.on_pulse(pin, now - raised_at)
+
+    def cleanup(self):
+        with self._lock:
+            self.levels.clear()
+
+
+def create_gpio(config, on_pulse=None):
+    """CONFIG["gpio_backend"] değerine göre GPIO arayüzünü oluşturur."""
+    backend = config.get("gpio_backend", "rpi")
+    if backend == "rpi":
+        return RpiGpio()
+    if backend == "fake":
+        return FakeGpio(on_pulse=on_pulse)
+    raise ValueError(f"Bilinmeyen GPIO arka ucu: '{backend}'. Geçerli değerler: {', '.join(GPIO_BACKENDS)}")
+
+
+def open_serial(config, port, baudrate, timeout=1, fake_modem=None):
+    """
+    CONFIG["serial_backend"] değerine göre seri portu açar. "fake" için fake_modem (fakes.FakeModem)
+    bellek içi portu döndürür. Açılamazsa OSError (serial.SerialException da OSError'dır) yükseltilir.
+    """
+    backend = config.get("serial_backend", "pyserial")
+    if backend == "pyserial":
+        import serial
+        return serial.Serial(port, baudrate, timeout=timeout)
+    if backend == "fake":
+        if fake_modem is None:
+            raise OSError("Sahte seri port için FakeModem verilmedi.")
+        return fake_modem.open_port(timeout=timeout)
+    raise ValueError(f"Bilinmeyen seri port arka ucu: '{backend}'. Geçerli değerler: {', '.join(SERIAL_BACKENDS)}")
@@ -0,0 +1,231 @@
+import os
+import time
+import queue
+import logging
+import threading
+from collections import deque
+
+import metrics
+
+
+# --- Eşzamansız Görüntü Kaydedici ---
+# JPEG kodlama ve SD karta yazma arka plandaki iş parçacıklarında yapılır; çıkarım hiçbir zaman
+# disk G/Ç'sini beklemez. Her klasör için JPEG kalitesi ve dakikalık kayıt sınırı ayrı ayarlanır.
+# Disk kotası aşılırsa önce en düşük önemdeki klasörün en eski resimleri silinir.
+
+log = logging.getLogger(__name__)
+# cv2.imwrite yerine kodlama (imencode) ve yazma ayrıdır; image_write_seconds ikisini birlikte ölçer
+IMAGE_WRITE_SECONDS = metrics.histogram("image_write_seconds", "Bir resmin JPEG kodlanıp diske yazılma süresi", ("folder",))
+IMAGES_SKIPPED = metrics.counter("images_skipped", "Kaydedilmeyen resimler", ("folder", "reason"))
+IMAGE_QUEUE_DEPTH = metrics.gauge("image_writer_queue_depth", "Yazılmayı bekleyen resim sayısı")
+
+
+class ImageWriter:
+    """
+    levels: CONFIG["confidence_levels"] biçiminde seviye listesi. Her seviyede isteğe bağlı
+    'jpeg_quality' ve 'max_images_per_minute' anahtarları bulunabilir.
+    Seviyeler eşiğe göre sıralanır; en düşük eşikli klasör kota aşımında ilk boşaltılan klasördür.
+    """
+
+    def __init__(self, base_folder, levels, workers=2, queue_size=32, quota_bytes=None,
+                 default_quality=90, enqueue_timeout=2.0):
+        self.base_folder = base_folder
+        self.quota_bytes = quota_bytes
+        self.default_quality = default_quality
+        self.enqueue_timeout = enqueue_timeout # Önemli (korumalı) kayıtlar için kuyrukta bekleme üst sınırı
+        ordered = sorted(levels, key=lambda x: x["threshold"])
+        self.eviction_order = [level["folder"] for level in ordered] # düşük önem -> yüksek önem
+        self.quality = {level["folder"]: level.get("jpeg_quality", default_quality) for level in levels}
+        self.rate_limits = {level["folder"]: level.get("max_images_per_minute") for level in levels}
+        self._recent_writes = {folder: deque() for folder in self.eviction_order}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._workers = [threading.Thread(target=self._run, name=f"image-writer-{i}", daemon=True)
+                         for i in range(max(1, workers))]
+        self._index_lock = threading.Lock()
+        self._files = {folder: deque() for folder in self.eviction_order} # (mtime, yol, boyut), eskiden yeniye
+        self._total_bytes = 0
+        self.written = 0
+        self.bytes_written = 0
+        self.rate_limited = 0
+        self.dropped = 0
+        self.evicted = 0
+        self.errors = 0
+
+    # --- Yaşam döngüsü ---
+    def start(self):
+        self._scan_existing()
+        for worker in self._workers:
+            worker.start()
+        IMAGE_QUEUE_DEPTH.set_function(self._queue.qsize)
+        quota = f"{self.quota_bytes / 1e6:.0f} MB" if self.quota_bytes else "sınırsız"
+        log.info("Görüntü kaydedici başlatıldı: %d iş parçacığı, disk kullanımı %.1f MB / %s.",
+                 len(self._workers), self._total_bytes / 1e6, quota)
+
+    def stop(self, timeout=10):
+        """Kuyruktaki kayıtları tamamlar ve iş parçacıklarını durdurur."""
+        for _ in self._workers:
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                break
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            worker.join(max(0.0, deadline - time.monotonic()))
+
+    def _scan_existing(self):
+        """Önceki çalışmalardan kalan dosyaları kota hesabına katar."""
+        for folder in self.eviction_order:
+            folder_path = os.path.join(self.base_folder, folder)
+            if not os.path.isdir(folder_path):
+                continue
+            entries = []
+            for entry in os.scandir(folder_path):
+                if entry.is_file() and entry.name.lower().endswith(".jpg"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.path, stat.st_size))
+            entries.sort()
+            self._files[folder].extend(entries)
+            self._total_bytes += sum(size for _, _, size in entries)
+
+    def update_levels(self, levels):
+        """
+        Çalışırken JPEG kalitesini, dakikalık sınırları ve boşaltma sırasını yeniler (ayar yeniden yükleme).
+        Klasör kümesi aynı kalmalıdır; sözlükler bütün olarak değiştirildiği için iş parçacıkları kilitsiz okur.
+        """
+        ordered = sorted(levels, key=lambda x: x["threshold"])
+        self.quality = {level["folder"]: level.get("jpeg_quality", self.default_quality) for level in levels}
+        self.rate_limits = {level["folder"]: level.get("max_images_per_minute") for level in levels}
+        self.eviction_order = [level["folder"] for level in ordered]
+
+    # --- Kayıt ---
+    def _allow(self, folder):
+        limit = self.rate_limits.get(folder)
+        if not limit:
+            return True
+        now = time.monotonic()
+        recent = self._recent_writes.setdefault(folder, deque())
+        while recent and now - recent[0] > 60:
+            recent.popleft()
+        if len(recent) >= limit:
+            return False
+        recent.append(now)
+        return True
+
+    def submit(self, folder, filename, image=None, jpeg_bytes=None, protected=False, render=None):
+        """
+        Bir resmi kayıt kuyruğuna ekler. image (BGR dizi), hazır jpeg_bytes ya da render verilmelidir.
+        render: görüntüyü üreten fonksiyon (örn. kutuları çizen); kayıt iş parçacığında çağrılır, böylece
+        sınıra takılan veya kuyruğa alınmayan kayıtlar için çizim yapılmaz.
+        protected=True (örn. alarm anı kareleri) ise dakikalık sınır uygulanmaz ve kuyruk doluysa
+        kısa süre beklenir; aksi halde kuyruk doluysa kayıt atlanır. Kuyruğa alındıysa True döner.
+        """
+        if not protected and not self._allow(folder):
+            self.rate_limited += 1
+            IMAGES_SKIPPED.labels(folder=folder, reason="rate_limited").inc()
+            return False
+        job = (folder, [(filename, image, jpeg_bytes, render)])
+        try:
+            if protected:
+                self._queue.put(job, timeout=self.enqueue_timeout)
+            else:
+                self._queue.put_nowait(job)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            IMAGES_SKIPPED.labels(folder=folder, reason="queue_full").inc()
+            log.warning("Görüntü kayıt kuyruğu dolu, '%s' kaydedilmedi.", os.path.basename(filename))
+            return False
+
+    def submit_batch(self, folder, renders):
+        """
+        renders: (dosya_adı, render) listesi (örn. alarm tamponunun tüm kareleri). Tek kuyruk işi olarak eklenir;
+        kareler bir kayıt iş parçacığında sırayla çizilip yazılır, böylece çağıran iş parçacığı kare başına
+        kuyrukta beklemez. Korumalı kayıt gibi dakikalık sınır uygulanmaz. Kuyruğa alındıysa True döner.
+        """
+        if not renders:
+            return True
+        try:
+            self._queue.put((folder, [(filename, None, None, render) for filename, render in renders]),
+                            timeout=self.enqueue_timeout)
+            return True
+        except queue.Full:
+            self.dropped += len(renders)
+            IMAGES_SKIPPED.labels(folder=folder, reason="queue_full").inc(len(renders))
+            log.warning("Görüntü kayıt kuyruğu dolu, %d resimlik toplu kayıt yapılmadı.", len(renders))
+            return False
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            folder, entries = job
+            for filename, image, jpeg_bytes, render in entries:
+                self._process(folder, filename, image, jpeg_bytes, render)
+
+    def _process(self, folder, filename, image, jpeg_bytes, render):
+        try:
+            if image is None and jpeg_bytes is None and render is not None:
+                image = render()
+                if image is None:
+                    # Çizim işi görüntü üretemedi (örn. alarm tamponundaki JPEG çözülemedi)
+                    self.errors += 1
+                    IMAGES_SKIPPED.labels(folder=folder, reason="render_failed").inc()
+                    log.error("Kaydedilecek görüntü oluşturulamadı, '%s' atlandı.", os.path.basename(filename))
+                    return
+            with IMAGE_WRITE_SECONDS.labels(folder=folder).time():
+                self._write(folder, filename, image, jpeg_bytes)
+        except Exception as e:
+            self.errors += 1
+            IMAGES_SKIPPED.labels(folder=folder, reason="error").inc()
+            log.error("Görüntü kaydedilirken hata ('%s'): %s", filename, e)
+
+    def _write(self, folder, filename, image, jpeg_bytes):
+        if jpeg_bytes is None:
+            import cv2 # OpenCV içe aktarımı yavaştır; ilk kodlamada yüklenir
+            quality = self.quality.get(folder, self.default_quality)
+            ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+            if not ok:
+                raise RuntimeError("JPEG kodlama başarısız")
+            jpeg_bytes = encoded.tobytes()
+        with open(filename, "wb") as f:
+            f.write(jpeg_bytes)
+        size = len(jpeg_bytes)
+        with self._index_lock:
+            self._files.setdefault(folder, deque()).append((time.time(), filename, size))
+            self._total_bytes += size
+            self.written += 1
+            self.bytes_written += size
+            self._enforce_quota()
+
+    def _enforce_quota(self):
+        if not self.quota_bytes:
+            return
+        # En düşük önemdeki klasörden başlayarak en eski dosyaları sil
+        for folder in self.eviction_order:
+            files = self._files.get(folder)
+            while files and self._total_bytes > self.quota_bytes:
+                _, path, size = files.popleft()
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    log.warning("Kota için eski resim silinemedi ('%s'): %s", path, e)
+                    continue
+                self._total_bytes -= size
+                self.evicted += 1
+            if self._total_bytes <= self.quota_bytes:
+                return
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize(),
+            "written": self.written,
+            "bytes_written": self.bytes_written,
+            "disk_bytes": self._total_bytes,
+            "rate_limited": self.rate_limited,
+            "dropped": self.dropped,
+            "evicted": self.evicted,
+            "errors": self.errors,
+        }
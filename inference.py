@@ -0,0 +1,366 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+import metrics
+from frame_buffer import draw_detections
+
+
+# --- Çıkarım Arka Uçları ---
+# best.pt PyTorch ağırlıkları Pi CPU'sunda en yavaş yoldur. Aynı model ONNX Runtime, OpenVINO veya NCNN
+# biçimine bir kez dışa aktarılır ve ultralytics'in ortak arayüzüyle yüklenir; böylece model(frame)
+# çağrısı ve sonuç nesneleri (r.boxes, r.plot()) arka uçtan bağımsız kalır.
+
+BACKENDS = ("pytorch", "onnx", "openvino", "ncnn")
+
+log = logging.getLogger(__name__)
+INFERENCE_SECONDS = metrics.histogram("inference_seconds", "Bir model() çağrısının süresi (toplu çağrıda tüm görüntüler)",
+                                      ("backend",))
+
+
+def exported_model_path(weights, backend, int8=False):
+    """ultralytics'in dışa aktarma adlandırmasına göre arka uç model yolunu döndürür."""
+    stem, _ = os.path.splitext(weights)
+    if backend == "pytorch":
+        return weights
+    if backend == "onnx":
+        return f"{stem}_int8.onnx" if int8 else f"{stem}.onnx"
+    if backend == "openvino":
+        return f"{stem}_int8_openvino_model" if int8 else f"{stem}_openvino_model"
+    if backend == "ncnn":
+        return f"{stem}_ncnn_model"
+    raise ValueError(f"Bilinmeyen çıkarım arka ucu: '{backend}'. Geçerli değerler: {', '.join(BACKENDS)}")
+
+
+def ensure_exported(weights, backend, int8=False, imgsz=640, calibration_data=None):
+    """
+    Arka uç modeli yoksa best.pt'den dışa aktarır ve yolunu döndürür.
+    INT8: OpenVINO için kalibrasyon verisiyle (calibration_data, ultralytics veri yaml'ı) nicemleme yapılır;
+    ONNX için onnxruntime dinamik nicemleme kullanılır. NCNN için INT8 desteklenmez.
+    """
+    if backend == "pytorch":
+        return weights
+    if backend == "ncnn" and int8:
+        log.warning("NCNN arka ucu için INT8 dışa aktarma desteklenmiyor, FP32 model kullanılacak.")
+        int8 = False
+    path = exported_model_path(weights, backend, int8)
+    if os.path.exists(path):
+        return path
+
+    log.info("'%s' modeli bulunamadı, '%s' dışa aktarılıyor (bir kez yapılır)...", backend, weights)
+    from ultralytics import YOLO # PyTorch ile birlikte içe aktarımı saniyeler sürer; yalnızca gerektiğinde
+    started = time.monotonic()
+    if backend == "onnx":
+        fp32_path = exported_model_path(weights, "onnx")
+        if not os.path.exists(fp32_path):
+            YOLO(weights).export(format="onnx", imgsz=imgsz, simplify=True)
+        if int8:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(fp32_path, path, weight_type=QuantType.QUInt8)
+    elif backend == "openvino":
+        export_args = {"format": "openvino", "imgsz": imgsz}
+        if int8:
+            export_args.update(int8=True, data=calibration_data)
+        YOLO(weights).export(**export_args)
+    else:
+        YOLO(weights).export(format=backend, imgsz=imgsz)
+    if not os.path.exists(path):
+        raise RuntimeError(f"Dışa aktarma tamamlandı ancak beklenen model bulunamadı: {path}")
+    log.info("Dışa aktarma tamamlandı: %s (%.1f sn)", path, time.monotonic() - started)
+    return path
+
+
+class InferenceBackend:
+    """
+    Seçilen arka uçtaki YOLO modelini saran çağrılabilir nesne. backend(frame) eski model(frame) ile aynı
+    sonuçları döndürür ve her çağrının süresini ölçer. Görüntü listesi verilirse görüntü başına bir sonuç döner;
+    PyTorch dışındaki arka uçlarda liste tek tek işlenir (dışa aktarılan grafik 1'lik toplu boyutludur).
+    """
+
+    def __init__(self, backend="pytorch", weights="best.pt", int8=False, imgsz=640, calibration_data=None,
+                 latency_window=500):
+        if backend not in BACKENDS:
+            raise ValueError(f"Bilinmeyen çıkarım arka ucu: '{backend}'. Geçerli değerler: {', '.join(BACKENDS)}")
+        self.backend = backend
+        self.weights = weights
+        self.int8 = int8
+        self.imgsz = imgsz
+        self.calibration_data = calibration_data
+        self.model = None
+        self.model_path = None
+        self.load_seconds = None
+        self._latencies = deque(maxlen=latency_window)
+        self.calls = 0
+
+    def load(self):
+        started = time.monotonic()
+        from ultralytics import YOLO # PyTorch ile birlikte içe aktarımı saniyeler sürer; yalnızca gerektiğinde
+        self.model_path = ensure_exported(self.weights, self.backend, self.int8, self.imgsz, self.calibration_data)
+        self.model = YOLO(self.model_path, task="detect")
+        self.load_seconds = time.monotonic() - started
+        log.info("YOLO modeli yüklendi: %s (arka uç: %s%s, %.1f sn)", self.model_path, self.backend,
+                 ", INT8" if self.int8 else "", self.load_seconds)
+        return self
+
+    def load_async(self):
+        """
+        Modeli arka plan iş parçacığında yükler (ör. modem başlatılırken). Future sonucu yüklenmiş arka uçtur;
+        yükleme hatası result() çağrısında yükseltilir.
+        """
+        future = Future()
+        future.set_running_or_notify_cancel()
+
+        def run():
+            try:
+                future.set_result(self.load())
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="model-load", daemon=True).start()
+        return future
+
+    @property
+    def names(self):
+        return self.model.names
+
+    def __call__(self, source, **kwargs):
+        kwargs.setdefault("verbose", False)
+        kwargs.setdefault("imgsz", self.imgsz)
+        started = time.perf_counter()
+        if self.backend != "pytorch" and isinstance(source, (list, tuple)) and len(source) > 1:
+            # Dışa aktarılan modeller sabit 1'lik toplu boyutla derlenir; toplu çağrı görüntü görüntü işlenir
+            results = [result for image in source for result in self.model(image, **kwargs)]
+        else:
+            results = self.model(source, **kwargs)
+        elapsed = time.perf_counter() - started
+        self._latencies.append(elapsed)
+        INFERENCE_SECONDS.labels(backend=self.backend).observe(elapsed)
+        self.calls += 1
+        return results
+
+    def reset_stats(self):
+        self._latencies.clear()
+        self.calls = 0
+
+    def latency_stats(self):
+        if not self._latencies:
+            return {"backend": self.backend, "calls": self.calls}
+        values = np.array(self._latencies) * 1000
+        return {
+            "backend": self.backend,
+            "int8": self.int8,
+            "calls": self.calls,
+            "mean_ms": round(float(values.mean()), 2),
+            "p50_ms": round(float(np.percentile(values, 50)), 2),
+            "p95_ms": round(float(np.percentile(values, 95)), 2),
+            "max_ms": round(float(values.max()), 2),
+        }
+
+    def format_stats(self):
+        s = self.latency_stats()
+        if "mean_ms" not in s:
+            return f"[çıkarım] arka uç={s['backend']} henüz çağrı yok"
+        return (f"[çıkarım] arka uç={s['backend']}{' INT8' if s['int8'] else ''} çağrı={s['calls']} "
+                f"ort={s['mean_ms']}ms p50={s['p50_ms']}ms p95={s['p95_ms']}ms")
+
+
+def create_backend(config):
+    """CONFIG içindeki inference_* ayarlarından çıkarım arka ucunu oluşturur (henüz yüklemez)."""
+    return InferenceBackend(
+        backend=config.get("inference_backend", "pytorch"),
+        weights=config.get("inference_weights", "best.pt"),
+        int8=config.get("inference_int8", False),
+        imgsz=config.get("inference_imgsz", 640),
+        calibration_data=config.get("inference_int8_calibration_data"),
+    )
+
+
+# --- Tespit Sonuçları ---
+class Detections:
+    """
+    Arka uçtan ve karo/ROI birleştirmesinden bağımsız tespit kümesi: (N,4) xyxy kutular,
+    (N,) güvenirlikler ve (N,) sınıflar NumPy dizileri olarak tutulur.
+    """
+
+    __slots__ = ("boxes", "confidences", "classes", "class_names")
+
+    def __init__(self, boxes=None, confidences=None, classes=None, class_names=None):
+        self.boxes = np.asarray(boxes if boxes is not None else (), dtype=np.float32).reshape(-1, 4)
+        self.confidences = np.asarray(confidences if confidences is not None else (), dtype=np.float32).reshape(-1)
+        self.classes = np.asarray(classes if classes is not None else (), dtype=np.int32).reshape(-1)
+        self.class_names = class_names
+
+    @classmethod
+    def from_result(cls, result, offset=(0, 0)):
+        """Tek bir ultralytics Results nesnesini dönüştürür; offset karo/ROI kırpmasının sol üst köşesidir."""
+        boxes = result.boxes
+        xyxy = boxes.xyxy.cpu().numpy().reshape(-1, 4)
+        if offset != (0, 0):
+            xyxy = xyxy + np.array([offset[0], offset[1], offset[0], offset[1]], dtype=np.float32)
+        return cls(xyxy, boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy(), result.names)
+
+    @classmethod
+    def concat(cls, parts, class_names=None):
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls(class_names=class_names)
+        return cls(np.concatenate([p.boxes for p in parts]),
+                   np.concatenate([p.confidences for p in parts]),
+                   np.concatenate([p.classes for p in parts]),
+                   class_names or parts[0].class_names)
+
+    def __len__(self):
+        return len(self.confidences)
+
+    def select(self, indices):
+        return Detections(self.boxes[indices], self.confidences[indices], self.classes[indices], self.class_names)
+
+    def plot(self, image):
+        """Kutuları görüntünün bir kopyasına çizer."""
+        return draw_detections(image.copy(), self.boxes, self.confidences, self.classes, self.class_names)
+
+
+def nms(detections, iou_threshold=0.5):
+    """
+    Sınıf bazlı NMS: her sınıfın kutuları yalnızca kendi aralarında bastırılır
+    (kutular sınıf numarasıyla kaydırılarak tek bir vektörel geçişte).
+    """
+    if len(detections) < 2:
+        return detections
+    shift = (detections.classes.astype(np.float32) * (detections.boxes.max() + 1))[:, None]
+    boxes = detections.boxes + shift
+    order = np.argsort(-detections.confidences)
+    keep = []
+    while order.size:
+        best = order[0]
+        keep.append(best)
+        if order.size == 1:
+            break
+        overlaps = box_iou(boxes[best:best + 1], boxes[order[1:]])[0]
+        order = order[1:][overlaps < iou_threshold]
+    return detections.select(np.array(keep, dtype=np.int64))
+
+
+# --- Referans Karşılaştırması ---
+def box_iou(boxes_a, boxes_b):
+    """(N,4) ve (M,4) xyxy kutular arasındaki IoU matrisini (N,M) vektörel olarak hesaplar."""
+    boxes_a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+
+def _detections(results):
+    detections = Detections.from_result(results[0])
+    return detections.boxes, detections.confidences, detections.classes
+
+
+def compare_detections(reference, candidate, iou_threshold=0.5, conf_tolerance=0.05):
+    """
+    İki tespit kümesini (xyxy, conf, cls) aynı sınıftaki en yüksek IoU'ya göre açgözlü eşleştirir.
+    Eşleşmeyen referans kutuları 'missed', fazladan aday kutuları 'extra' sayılır.
+    """
+    ref_boxes, ref_conf, ref_cls = reference
+    cand_boxes, cand_conf, cand_cls = candidate
+    iou = box_iou(ref_boxes, cand_boxes)
+    iou[ref_cls[:, None] != cand_cls[None, :]] = 0.0
+    matched_ref, matched_cand, conf_diffs = set(), set(), []
+    for flat_index in np.argsort(-iou, axis=None):
+        i, j = np.unravel_index(flat_index, iou.shape)
+        if iou[i, j] < iou_threshold:
+            break
+        if i in matched_ref or j in matched_cand:
+            continue
+        matched_ref.add(i)
+        matched_cand.add(j)
+        conf_diffs.append(abs(float(ref_conf[i]) - float(cand_conf[j])))
+    max_conf_diff = max(conf_diffs) if conf_diffs else 0.0
+    missed = len(ref_conf) - len(matched_ref)
+    extra = len(cand_conf) - len(matched_cand)
+    return {
+        "reference": int(len(ref_conf)),
+        "matched": len(matched_ref),
+        "missed": missed,
+        "extra": extra,
+        "max_conf_diff": round(max_conf_diff, 4),
+        "ok": missed == 0 and extra == 0 and max_conf_diff <= conf_tolerance,
+    }
+
+
+def verify_backend(candidate, reference, image_paths, iou_threshold=0.5, conf_tolerance=0.05, warmup=2):
+    """
+    Sabit bir resim kümesinde aday arka ucun tespitlerini PyTorch referansıyla karşılaştırır
+    ve her iki arka ucun gecikmesini raporlar.
+    """
+    from camera import decode_jpeg
+
+    images = []
+    for path in image_paths:
+        with open(path, "rb") as f:
+            image = decode_jpeg(f.read())
+        if image is not None:
+            images.append((path, image))
+    if not images:
+        raise RuntimeError("Karşılaştırma için okunabilir resim bulunamadı.")
+
+    for backend in (reference, candidate):
+        for _, image in images[:warmup]:
+            backend(image)
+        backend.reset_stats()
+
+    per_image = []
+    for path, image in images:
+        report = compare_detections(_detections(reference(image)), _detections(candidate(image)),
+                                    iou_threshold, conf_tolerance)
+        report["image"] = os.path.basename(path)
+        per_image.append(report)
+    return {
+        "reference": reference.latency_stats(),
+        "candidate": candidate.latency_stats(),
+        "images": len(per_image),
+        "failed_images": [r["image"] for r in per_image if not r["ok"]],
+        "max_conf_diff": max(r["max_conf_diff"] for r in per_image),
+        "ok": all(r["ok"] for r in per_image),
+        "details": per_image,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Çıkarım arka ucunu dışa aktarır, gecikmesini ölçer ve PyTorch referansıyla karşılaştırır.")
+    parser.add_argument("--backend", choices=BACKENDS, required=True)
+    parser.add_argument("--weights", default="best.pt")
+    parser.add_argument("--images", required=True, help="Karşılaştırma resimlerinin bulunduğu klasör")
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--data", default=None, help="OpenVINO INT8 kalibrasyonu için veri yaml'ı")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--iou", type=float, default=0.5)
+    parser.add_argument("--conf-tolerance", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    image_paths = sorted(
+        os.path.join(args.images, name) for name in os.listdir(args.images)
+        if name.lower().endswith((".jpg", ".jpeg", ".png"))
+    )
+    reference = InferenceBackend("pytorch", args.weights, imgsz=args.imgsz).load()
+    candidate = InferenceBackend(args.backend, args.weights, int8=args.int8, imgsz=args.imgsz,
+                                 calibration_data=args.data).load()
+    report = verify_backend(candidate, reference, image_paths, args.iou, args.conf_tolerance)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
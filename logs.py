@@ -0,0 +1,115 @@
+import sys
+import json
+import time
+import logging
+import threading
+
+
+# --- Seviyeli, Hız Sınırlı Yapılandırılmış Günlük ---
+# print() yerine standart logging kullanılır. Her satır seviye, zaman, modül ve isteğe bağlı anahtar=değer
+# alanlarıyla yazılır (text) veya tek satır JSON olarak (json). Aynı çağrı noktasından (dosya:satır) gelen
+# kayıtlar belirli bir aralıkta en fazla burst kez yazılır; bastırılan satır sayısı bir sonraki kayda eklenir.
+# Böylece kare başına tekrar eden satırlar SD kartı ve konsolu boğmaz. rate_limit_min_level (varsayılan
+# WARNING) ve üzeri kayıtlar sınırlanmaz; uyarı ve hatalar hiçbir zaman kaybolmaz.
+
+LOG_FORMATS = ("text", "json")
+
+
+def fields(**values):
+    """Kayda yapılandırılmış alan ekler: log.info("...", extra=fields(camera=0, confidence=0.8))."""
+    return {"fields": values}
+
+
+class RateLimitFilter(logging.Filter):
+    """Çağrı noktası başına interval_seconds içinde en fazla burst kayıt geçirir."""
+
+    def __init__(self, burst=5, interval_seconds=60, min_level=logging.WARNING):
+        super().__init__()
+        self.burst = burst
+        self.interval_seconds = interval_seconds
+        self.min_level = min_level # Bu seviye ve üzeri sınırlanmaz
+        self._lock = threading.Lock()
+        self._sites = {} # (dosya, satır) -> [pencere başlangıcı, pencerede geçen, bastırılan]
+        self.suppressed = 0
+
+    def filter(self, record):
+        if self.burst <= 0 or record.levelno >= self.min_level:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.interval_seconds:
+                dropped = site[2] if site is not None else 0
+                self._sites[key] = [now, 1, 0]
+                if dropped:
+                    record.suppressed = dropped
+                return True
+            if site[1] < self.burst:
+                site[1] += 1
+                return True
+            site[2] += 1
+            self.suppressed += 1
+            return False
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s", "%Y-%m-%d %H:%M:%S")
+
+    def format(self, record):
+        line = super().format(record)
+        extra = dict(getattr(record, "fields", None) or {})
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            extra["suppressed"] = suppressed
+        if extra:
+            line += " | " + " ".join(f"{key}={value}" for key, value in extra.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(config, level=None):
+    """
+    CONFIG["logging"] ayarlarından kök günlükçüyü yapılandırır. level verilirse ayardaki seviyeyi ezer
+    (örn. bench.py'nin sessiz çalışması için WARNING).
+    """
+    log_config = config.get("logging") or {}
+    log_format = log_config.get("format", "text")
+    if log_format not in LOG_FORMATS:
+        raise ValueError(f"Bilinmeyen günlük biçimi: '{log_format}'. Geçerli değerler: {', '.join(LOG_FORMATS)}")
+    requested = level or log_config.get("level", "INFO")
+    level = logging.getLevelName(requested.upper()) if isinstance(requested, str) else requested
+    if not isinstance(level, int):
+        raise ValueError(f"Bilinmeyen günlük seviyesi: '{requested}'")
+
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+    handler.addFilter(RateLimitFilter(burst=log_config.get("rate_limit_burst", 5),
+                                      interval_seconds=log_config.get("rate_limit_interval_seconds", 60),
+                                      min_level=logging.getLevelName(log_config.get("rate_limit_min_level", "WARNING"))))
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    # Üçüncü taraf kütüphanelerin ayrıntılı kayıtları kendi seviyelerinde kalsın
+    for noisy in log_config.get("quiet_loggers", ("urllib3", "ultralytics", "PIL")):
+        logging.getLogger(noisy).setLevel(max(level, logging.WARNING))
+    return root
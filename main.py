@@ -1,53 +1,264 @@
-import cv2
 import os
 import time
-from ultralytics import YOLO
 import sys
-import subprocess
+import logging
+import sqlite3
 import numpy as np
-import requests
-import json
-import random
+import functools
 from datetime import datetime
-import serial
-import RPi.GPIO as GPIO
+
+import metrics
+
+from alerting import create_alert_dispatcher, load_recipients
+from alarm_state import create_alarm_state_machine, create_notification_limiter, STATE_ALARM, STATE_COOLDOWN, STATE_IDLE, STATE_SUSPECT
+from at_transport import ATTransport, command_label
+from camera import camera_configs, decode_jpeg, open_frame_source
+from config import create_config_watcher
+from event_store import create_event_store
+from failover import create_sms_failover, failover_recipient
+from firebase_uploader import FirebaseUploader
+from frame_buffer import AlarmFrameBuffer, render_annotated
+from gps import GpsTracker
+from hardware import create_gpio, open_serial
+from image_writer import ImageWriter
+from inference import create_backend
+from logs import fields, setup_logging
+from modem_bringup import create_bring_up
+from metrics import create_metrics_server
+from modem_manager import ModemManager, PRIORITY_NORMAL, PRIORITY_ROUTINE
+from motion_gate import create_motion_gate
+from pipeline import Pipeline
+from roi import capture_config, create_region_detector, detect_batch
+from scheduler import create_capture_scheduler, scheduler_settings
+from telemetry import create_telemetry_encoder
+from tracking import create_alarm_window, create_tracker
 
 
 # --- CONFIGURASYON AYARLARI ---
 CONFIG = {
     "camera_width": 640,
     "camera_height": 480,
-    "detection_count_threshold": 50,      # Yangın ilan etmek için kümülatif yüksek doğruluklu tespit sayısı
+    "camera_source": "libcamera_vid",     # Kare kaynağı: libcamera_vid (sürekli akış), v4l2, oneshot (her kare için libcamera-still), replay
+    "camera_framerate": 5,                # Sürekli akış kaynaklarında sensör kare hızı
+    "v4l2_device": 0,                     # v4l2 kaynağı için cihaz numarası veya yolu (örn. /dev/video0)
+    "replay_path": "",                    # replay kaynağı için resim klasörü veya video dosyası
+    "replay_loop": False,                 # replay kaynağı sona gelince başa dönsün mü
+    "replay_fps": None,                   # replay kaynağında kare hızı sınırı (None: sınırsız)
+    # Alarm kararı: ALARM seviyesindeki kutular kareler arasında IoU ile izlenir, karar kayan pencereli skorla verilir
+    "tracker": {
+        "iou_threshold": 0.3,             # Kutunun mevcut bir ize eşlenmesi için en düşük IoU
+        "max_missed_frames": 5            # Bu kadar kare görülmeyen iz silinir
+    },
+    "alarm_decision": {
+        "mode": "k_of_n",                 # k_of_n (son n karenin k'sında isabet) veya ewma (üstel ağırlıklı güvenirlik)
+        "window_frames": 20,              # n: pencere uzunluğu (kare)
+        "min_hits": 12,                   # k: alarm için penceredeki en az ALARM seviyesi kare sayısı
+        "window_seconds": 60,             # Pencereden bu süreden eski kareler çıkarılır (None: yalnızca kare sayısı)
+        "ewma_alpha": 0.3,                # ewma modunda yeni karenin ağırlığı
+        "ewma_threshold": 0.6,            # ewma modunda alarm eşiği
+        "min_track_hits": 2               # Tek karelik parlamalar sayılmasın: iz en az bu kadar karedir görülmüş olmalı
+    },
     "output_base_folder": "./Output",     # Tüm çıktıların kaydedileceği ana klasör
-    "photo_capture_delay_seconds": 1,      # Her fotoğraf çekimi arasındaki gecikme (saniye)
+    # Uyarlamalı kare yakalama: tespit yokken yavaş, bir güvenirlik seviyesine ulaşılınca işleme hızının izin verdiği en hızlı aralıkta
+    "capture_scheduler": {
+        "idle_interval_seconds": 2.0,     # Tespit yokken iki kare arasındaki süre (saniye)
+        "min_interval_seconds": 0.0,      # Aktif modda en kısa aralık (0: yalnızca ölçülen işleme süresiyle sınırlı)
+        "hold_seconds": 15,               # Son tespitten sonra en hızlı aralıkta kalınan süre
+        "decay_seconds": 60               # Ardından boşta aralığına kademeli dönüş süresi
+    },
+    # Sürekli çalışma: alarmda program sonlanmaz, tespit/GPS/telemetri sürer ve modem açık kalır (False: ilk alarmda dur)
+    "continuous_mode": True,
+    "alarm_lifecycle": {
+        "alarm_clear_seconds": 30,        # Alarm koşulu bu süre sağlanmazsa ALARM → COOLDOWN
+        "cooldown_seconds": 300,          # COOLDOWN bu süre sakin geçerse olay kapanır (→ IDLE)
+        "suspect_clear_score": 0.05,      # SUSPECT'te alarm skoru bunun altına düşerse → IDLE
+        "renotify_interval_seconds": 600, # Alarm sürerken arama/SMS en fazla bu aralıkla tekrarlanır
+        "max_renotifications": 3          # Olay başına en fazla yeniden bildirim sayısı
+    },
     "fire_alert_filename_prefix": "YANGIN_ALARM", # Yangın alarmı verildiğinde kaydedilen fotoğrafların öneki
-    "buffer_max_size": 100,               # Bellekte tutulacak maksimum tespit edilmiş kare sayısı
+    "buffer_max_size": 100,               # Bellekte tutulacak maksimum tespit edilmiş kare sayısı (JPEG olarak)
+    "buffer_window_seconds": None,        # Yalnızca son N saniyedeki kareleri tut (None: yalnızca sayı sınırı)
+
+    # İşlem hattı kuyrukları: drop_oldest=True ise kuyruk dolunca en eski kare atılır (çıkarım hep en güncel kareyi görür)
+    "pipeline_queues": {
+        "gate": {"maxsize": 2, "drop_oldest": True},
+        "decode": {"maxsize": 2, "drop_oldest": True},
+        "inference": {"maxsize": 1, "drop_oldest": True},
+        "persist": {"maxsize": 8, "drop_oldest": False},
+        "telemetry": {"maxsize": 16, "drop_oldest": False}
+    },
+    "pipeline_stats_interval_seconds": 60, # Aşama istatistiklerinin (kuyruk derinliği, fps) yazdırılma aralığı
+
+    # --- Hareket / Değişim Ön Filtresi (değişmeyen sahnede YOLO çalıştırılmaz) ---
+    "motion_gate": {
+        "enabled": True,
+        "width": 160,                     # Karşılaştırmanın yapıldığı küçültülmüş kare genişliği (piksel)
+        "pixel_threshold": 25,            # Arka plandan gri seviye farkı bu değeri aşan piksel değişmiş sayılır
+        "min_changed_ratio": 0.005,       # Değişmiş piksel oranı bunu aşarsa kare çıkarıma gönderilir
+        "background_alpha": 0.05,         # Arka plan modelinin uyum hızı (yavaş ışık değişimlerini emer)
+        "flame_min_ratio": 0.001,         # Alev renginde (HSV) piksel oranı bunu aşarsa kare çıkarıma gönderilir
+        "force_interval_seconds": 30,     # Sahne değişmese bile en az bu aralıkla çıkarım yapılır
+        "hold_seconds": 10                # Tespitten sonra bu süre boyunca filtre uygulanmaz
+    },
+
+    # --- Kameralar ---
+    # Her kamera genel ayarların üzerine yazan bir sözlüktür: id, camera_source, camera_index (libcamera --camera),
+    # v4l2_device, replay_path, roi_polygons, inference_tiling, motion_gate, capture_scheduler,
+    # confidence_overrides ({"ALARM": 0.60} gibi klasör -> eşik) ve firebase_path.
+    # firebase_path verilmezse "cameras/<id>" kullanılır; "" tek kameralı eski Firebase yapısını korur.
+    # Örnek: {"id": "cam1", "camera_index": 1, "roi_polygons": [[[0, 0.4], [1, 0.4], [1, 1], [0, 1]]]}
+    "cameras": [
+        {"id": "cam0", "firebase_path": ""}
+    ],
+    "inference_batch_timeout_seconds": 0.05, # Toplu çıkarım için diğer kameraların karelerini bekleme süresi
+
+    # --- İlgi Bölgesi (ROI) ve Karolu Çıkarım ---
+    # ROI çokgenleri: [[x, y], ...] köşe listeleri; 0-1 arası değerler kare boyutuna oransaldır. Boş liste: tüm kare
+    # Örnek (üst %35'teki gökyüzünü dışarıda bırak): [[[0, 0.35], [1, 0.35], [1, 1], [0, 1]]]
+    "roi_polygons": [],
+    "inference_tiling": {
+        "enabled": False,                 # Yüksek çözünürlüklü kareyi örtüşen karolarda işle (uzaktaki küçük duman için)
+        "capture_width": 1920,            # Karolu modda kamera çözünürlüğü
+        "capture_height": 1080,
+        "tile_size": 640,                 # Karo boyutu (model giriş boyutuyla aynı olmalı)
+        "overlap": 0.2,                   # Komşu karoların örtüşme oranı
+        "include_full_frame": True,       # Karolara ek olarak kareyi bütün halinde de işle (büyük alevler için)
+        "nms_iou": 0.5                    # Karolardan gelen kutuları birleştirirken NMS IoU eşiği
+    },
+
+    # --- Çıkarım Arka Ucu ---
+    "inference_backend": "pytorch",       # pytorch (best.pt), onnx (ONNX Runtime), openvino veya ncnn; ilk çalıştırmada dışa aktarılır
+    "inference_weights": "best.pt",       # Dışa aktarmada kaynak olarak kullanılan PyTorch ağırlıkları
+    "inference_int8": False,              # INT8 nicemlenmiş model kullan (onnx ve openvino; ncnn desteklemez)
+    "inference_int8_calibration_data": None, # OpenVINO INT8 kalibrasyonu için ultralytics veri yaml'ı
+    "inference_imgsz": 640,               # Model giriş boyutu (dışa aktarma ve çıkarımda aynı olmalı)
 
     # Güvenirlik Eşikleri ve İlgili Klasörler/Önekler
     "confidence_levels": [
-        {"threshold": 0.50, "folder": "ALARM", "prefix": "YANGIN_ALARM", "firebase_tag": "fire_alarm_high"}, # %50 ve üzeri
-        {"threshold": 0.25, "folder": "DIKKAT", "prefix": "DIKKAT_EDILMELI", "firebase_tag": "fire_attention"}, # %25 - %50 arası
-        {"threshold": 0.10, "folder": "AZ_ONEMLI", "prefix": "AZ_ONEMLI", "firebase_tag": "fire_low_importance"} # %10 - %25 arası
+        # jpeg_quality: kaydedilen resmin JPEG kalitesi, max_images_per_minute: klasöre dakikada en fazla kayıt (None: sınırsız)
+        {"threshold": 0.50, "folder": "ALARM", "prefix": "YANGIN_ALARM", "firebase_tag": "fire_alarm_high", "jpeg_quality": 95, "max_images_per_minute": None}, # %50 ve üzeri
+        {"threshold": 0.25, "folder": "DIKKAT", "prefix": "DIKKAT_EDILMELI", "firebase_tag": "fire_attention", "jpeg_quality": 85, "max_images_per_minute": 30}, # %25 - %50 arası
+        {"threshold": 0.10, "folder": "AZ_ONEMLI", "prefix": "AZ_ONEMLI", "firebase_tag": "fire_low_importance", "jpeg_quality": 70, "max_images_per_minute": 6} # %10 - %25 arası
     ],
+    "image_writer_workers": 2,            # Resimleri arka planda kodlayıp yazan iş parçacığı sayısı
+    "image_writer_queue_size": 32,        # Yazılmayı bekleyen en fazla resim sayısı (doluysa düşük önemli kayıtlar atlanır)
+    "disk_quota_mb": 2048,                # Output klasörü için disk kotası; aşılınca önce AZ_ONEMLI'nin en eski resimleri silinir
 
     # --- İletişim Ayarları ---
-    "phone_number": os.getenv("PHONE_NUMBER", "+901234567"),
+    "phone_number": os.getenv("PHONE_NUMBER", "+901234567"), # recipients boşsa tek alıcı (SMS + arama)
+    # Nöbet listesi: sms=True olanların hepsine SMS gider; call_order verilenler bu sırayla, biri açana kadar aranır.
+    # Örn: [{"name": "Ayşe", "number": "+90...", "call_order": 1}, {"name": "Mehmet", "number": "+90...", "sms": True, "call_order": None}]
+    "recipients": [],
+    "alerting": {
+        "ring_seconds": 20,               # Açılmayan arama bu süre sonra kapatılır ve sıradaki alıcı aranır
+        "talk_seconds": 20,               # Açılan arama bu süre sonra kapatılır
+        "escalation_rounds": 1            # Kimse açmazsa arama listesi kaç kez dolaşılır
+    },
     "sms_message": "UYARI: Yuksek dogrulukta yangin tespit edildi! Konum bilgisi Firebase'de.",
     "pin_code": os.getenv("SIM_PIN", ""),
     "call_threshold": 0.80,         # Arama tetiklemek için güvenirlik eşiği
-    "sms_threshold": 0.70           # SMS tetiklemek için güvenirlik eşiği
+    "sms_threshold": 0.70,          # SMS tetiklemek için güvenirlik eşiği
+
+    # --- Modem Başlatma (sabit beklemeler yerine AT yoklaması, URC'ler ve üstel geri çekilme) ---
+    "modem_bringup": {
+        "power_on_pulse_seconds": 2.0,    # Açmak için güç anahtarının basılı tutulduğu süre
+        "power_off_pulse_seconds": 3.0,   # Kapatmak için güç anahtarının basılı tutulduğu süre
+        "boot_timeout_seconds": 30,       # Güç anahtarından sonra AT yanıtı / RDY için en uzun bekleme
+        "sim_timeout_seconds": 15,        # SIM READY için en uzun bekleme
+        "pb_done_timeout_seconds": 10,    # Soğuk açılışta PB DONE (SMS için telefon defteri hazır) beklemesi
+        "registration_timeout_seconds": 60, # Ağ kaydı için en uzun bekleme
+        "power_down_timeout_seconds": 20, # Kapanma onayı (NORMAL POWER DOWN) için en uzun bekleme
+        "backoff_initial_seconds": 0.25,  # Sorgular arası ilk bekleme; her denemede iki katına çıkar
+        "backoff_max_seconds": 4.0,       # Sorgular arası en uzun bekleme
+        "power_down_on_exit": True        # Çıkışta modülü kapat (False: açık kalır, sonraki başlatma yoklamayla hızlanır)
+    },
+
+    # --- Donanım ---
+    # "fake": bellek içi sahte GPIO ve sahte modem (fakes.py); Raspberry Pi olmadan tüm hat çalıştırılabilir
+    "gpio_backend": os.getenv("GPIO_BACKEND", "rpi"),        # rpi veya fake
+    "serial_backend": os.getenv("SERIAL_BACKEND", "pyserial"), # pyserial veya fake
+
+    # --- GPS Ayarları ---
+    "gps_poll_interval_seconds": 2,       # Arka plan GPS sorgu aralığı (saniye)
+    "gps_no_lock_interval_seconds": 5,    # GPS kilidi yokken sorgu aralığı (saniye)
+    "gps_stale_after_seconds": 60,        # Bu süreden eski konumlar bayat (stale) olarak işaretlenir
+
+    # --- Firebase Yükleyici Ayarları ---
+    "firebase_flush_interval_seconds": 2, # Bekleyen yazıların toplu gönderim aralığı
+    "firebase_max_batch": 50,             # Tek PATCH isteğindeki en fazla yol sayısı
+    "firebase_retry_interval_seconds": 30, # Bağlantı yokken yeniden deneme aralığı
+    "firebase_spool_path": "./Output/firebase_spool.jsonl", # Gönderilemeyen olayların saklandığı dosya
+    "telemetry": {
+        "enabled": True,                  # False: her karede tam current_system_status gönderilir (eski davranış)
+        "confidence_deadband": 0.05,      # Güvenirlik bu kadar değişmedikçe yeniden gönderilmez
+        "alarm_score_deadband": 0.05,     # Alarm skoru için aynı eşik
+        "gps_deadband_meters": 25,        # Konum bu mesafeden az değiştiyse gönderilmez (bayat/kilit değişimi her zaman gönderilir)
+        "heartbeat_seconds": 300          # Değişiklik yoksa bu aralıkla yalnızca system_time gönderilir (cihaz canlı)
+    },
+    "sms_failover": {
+        "enabled": True,                  # Firebase'e ulaşılamazken tespit olaylarını SMS ile gönder
+        "recipient": None,                # None: arama sırasındaki ilk alıcı (recipients boşsa phone_number)
+        "levels": ["ALARM", "DIKKAT"],    # Yedek kanala alınan seviyeler (öncelik sırasıyla klasör adları)
+        "grace_seconds": 120,             # Olay bu süre Firebase'e ulaşamazsa SMS ile gönderilir
+        "check_interval_seconds": 10,
+        "max_parts_per_hour": 10,         # Saatlik SMS parça bütçesi (birleştirilmiş mesajın her parçası ayrı ücretlenir)
+        "max_parts_per_message": 3,       # Tek mesajdaki en fazla parça (~450 karakter, ~9 olay)
+        "queue_size": 200                 # Bekleyen en fazla olay (doluysa en eskisi düşer)
+    },
+
+    # --- Yerel Olay Kaydı (SQLite, WAL) ---
+    "event_store": {
+        "enabled": True,
+        "path": "./Output/events.db",     # Sorgu: python event_store.py summary --since 7d --level DIKKAT
+        "batch_size": 200,                # Tek işlemde (transaction) yazılan en fazla kare
+        "flush_interval_seconds": 2,      # Kuyruktaki karelerin en geç yazılma aralığı
+        "queue_size": 5000,               # Yazılmayı bekleyen en fazla kare (doluysa kayıt atlanır, hat beklemez)
+        "raw_retention_days": 7,          # Kare başına kayıtların saklanma süresi; daha eskileri özetlenip silinir
+        "rollup_bucket_seconds": 3600,    # Özet (rollup) dilim süresi
+        "rollup_retention_days": 365,     # Özetlerin saklanma süresi (None: sınırsız)
+        "compaction_interval_hours": 6    # Sıkıştırma işinin çalışma aralığı (açılışta da bir kez çalışır)
+    },
+
+    # --- Günlük ve Ölçümler ---
+    "logging": {
+        "level": os.getenv("LOG_LEVEL", "INFO"), # DEBUG (kare başına satırlar ve AT yankısı), INFO, WARNING, ERROR
+        "format": "text",                 # text veya json (satır başına bir JSON nesnesi, günlük toplayıcılar için)
+        "rate_limit_burst": 5,            # Aynı satırdan (dosya:satır) aralık başına en fazla kayıt; 0: sınırsız
+        "rate_limit_interval_seconds": 60,
+        "rate_limit_min_level": "WARNING" # Bu seviye ve üzeri kayıtlar hiçbir zaman bastırılmaz
+    },
+    "metrics": {
+        "enabled": True,                  # Prometheus metin biçiminde GET /metrics sunucusu
+        "host": "127.0.0.1",              # Yalnızca yerel erişim; ağdan okumak için "0.0.0.0"
+        "port": 9108
+    }
 }
 # ------------------------------
 
+# Ayar dosyası (TOML veya YAML): CONFIG'deki varsayılanların üzerine yazılır, değişince çalışırken yeniden yüklenir
+CONFIG_FILE = os.getenv("CONFIG_FILE", "./config.toml")
+
 # --- Firebase ve GPS Ayarları ---
 FIREBASE_URL = os.getenv("FIREBASE_RTDB_URL", "https://your-project-id-default-rtdb.firebaseio.com/veri")
-GPS_PORT = '/dev/ttyS0'
+GPS_PORT = os.getenv("SIM7600_PORT", '/dev/ttyS0')
 GPS_BAUDRATE = 115200
 ser = None # Global seri port objesi
+at_transport = None # Seri port üzerindeki olay güdümlü AT komut katmanı
+modem = None # Seri portu sahiplenen, AT işlerini öncelik sırasıyla yürüten modem yöneticisi
+firebase = None # Kalıcı bağlantılı, toplu gönderim yapan Firebase yükleyicisi
+image_writer = None # Resimleri arka planda kaydeden, hız ve disk kotası sınırlı kaydedici
+model = None # Seçilen arka uçtaki YOLO modeli (main() içinde yüklenir)
+gpio = None # Güç anahtarını süren GPIO arayüzü (hardware.py; main() içinde oluşturulur)
+event_store = None # İşlenen karelerin yerel SQLite kaydı (event_store.py; devre dışıysa None)
+sms_failover = None # Firebase'e ulaşılamazken olayları SMS ile gönderen yedek kanal (failover.py; devre dışıysa None)
 power_key = 6 # SIM7600X güç anahtarı GPIO pini
+config_watcher = None # Ayar dosyasını izleyip eşikleri çalışırken yenileyen izleyici (config.py; dosya yoksa None)
 
-# --- YOLO Modeli Yükle ---
-model = YOLO("best.pt")
+log = logging.getLogger("main")
+SEND_AT_SECONDS = metrics.histogram("send_at_seconds", "send_at çağrısının modem kuyruğunda bekleme dahil süresi", ("command",))
+DETECTIONS = metrics.counter("detections", "Güvenirlik seviyesine göre işlenen kareler", ("camera", "tier"))
+GATE_FRAMES = metrics.counter("gate_frames", "Ön filtre kararları (gated: çıkarım atlandı)", ("camera", "result"))
+ALARM_TRANSITIONS = metrics.counter("alarm_transitions", "Alarm durum makinesi geçişleri (hedef duruma göre)", ("camera", "state"))
 
 # --- Ortak Fonksiyonlar ---
 def setup_directories():
@@ -55,588 +266,783 @@ def setup_directories():
     base_folder = CONFIG["output_base_folder"]
     if not os.path.exists(base_folder):
         os.makedirs(base_folder)
-        print(f"'{base_folder}' klasörü oluşturuldu.")
+        log.info("'%s' klasörü oluşturuldu.", base_folder)
     else:
-        print(f"'{base_folder}' klasörü zaten mevcut.")
+        log.debug("'%s' klasörü zaten mevcut.", base_folder)
 
     for level in CONFIG["confidence_levels"]:
         folder_path = os.path.join(base_folder, level["folder"])
         if not os.path.exists(folder_path):
             os.makedirs(folder_path)
-            print(f"'{folder_path}' klasörü oluşturuldu.")
+            log.info("'%s' klasörü oluşturuldu.", folder_path)
         else:
-            print(f"'{folder_path}' klasörü zaten mevcut.")
-
-def capture_photo_to_memory(width, height):
-    """
-    libcamera-still komutunu kullanarak fotoğrafı doğrudan belleğe çeker.
-    """
-    command = [
-        "libcamera-still",
-        "-t", "1",
-        "--nopreview",
-        "--width", str(width),
-        "--height", str(CONFIG["camera_height"]),
-        "-o", "-"
-    ]
-    try:
-        result = subprocess.run(command, capture_output=True, check=True)
-        return result.stdout
-    except subprocess.CalledProcessError as e:
-        print(f"Hata: Fotoğraf belleğe çekilemedi! Komut: {' '.join(e.cmd)}")
-        print(f"Hata Kodu: {e.returncode}")
-        print(f"Standart Çıkış: {e.stdout.decode(errors='ignore')}")
-        print(f"Hata Çıkışı: {e.stderr.decode(errors='ignore')}")
-        return None
-    except FileNotFoundError:
-        print("Hata: 'libcamera-still' komutu bulunamadı. Lütfen yüklü olduğundan emin olun.")
-        print("Komut: sudo apt install libcamera-tools")
-        return None
+            log.debug("'%s' klasörü zaten mevcut.", folder_path)
 
 def send_to_firebase(path, data):
     """
-    Belirtilen yola JSON verisi gönderir (PUT metodu ile).
-    PUT, belirtilen yoldaki veriyi tamamen değiştirir.
+    Belirtilen yola JSON verisi yazar (PUT eşdeğeri, yoldaki veriyi tamamen değiştirir).
+    Yazı arka plandaki yükleyiciye bırakılır; aynı yola art arda yazılanlardan yalnızca en günceli gönderilir.
     path parametresi FIREBASE_URL'den sonraki yolu temsil eder.
     Örn: FIREBASE_URL = "...", path = "current_system_status"
     """
-    full_url = f"{FIREBASE_URL}/{path}.json"
-    try:
-        response = requests.put(full_url, json=data)
-        response.raise_for_status()
-        # print(f"Firebase'e PUT ile veri gönderildi: {path}")
-    except requests.exceptions.RequestException as e:
-        print(f"Firebase PUT veri gönderme hatası: {e}")
-    except Exception as e:
-        print(f"Firebase PUT sırasında beklenmedik bir hata oluştu: {e}")
+    firebase.put(path, data)
 
-def push_to_firebase(path, data):
+def push_to_firebase(path, data, urgent=False):
     """
-    Belirtilen yola yeni bir veri girişi ekler (POST metodu ile).
-    POST, Firebase'de otomatik olarak benzersiz bir anahtar oluşturur.
+    Belirtilen yola yeni bir veri girişi ekler (POST eşdeğeri).
+    Benzersiz anahtar cihazda üretilir; kayıtlar toplu PATCH ile gönderilir, ağ yoksa yerel dosyada bekletilir.
+    urgent=True ise (örn. alarm) bir sonraki gönderim aralığı beklenmez.
     path parametresi FIREBASE_URL'den sonraki yolu temsil eder.
     Örn: FIREBASE_URL = "...", path = "fire_detections"
     """
-    full_url = f"{FIREBASE_URL}/{path}.json"
-    try:
-        response = requests.post(full_url, json=data)
-        response.raise_for_status()
-        print(f"Firebase'e POST ile yeni veri eklendi: {path}")
-    except requests.exceptions.RequestException as e:
-        print(f"Firebase POST veri gönderme hatası: {e}")
-    except Exception as e:
-        print(f"Firebase POST sırasında beklenmedik bir hata oluştu: {e}")
+    key = firebase.push(path, data, urgent=urgent)
+    log.debug("Firebase'e yeni veri eklendi (kuyrukta): %s/%s", path, key)
+    return key
 
 # --- SIM7600 İletişim Fonksiyonları ---
-def send_at(command, expected_response, timeout):
+def send_at(command, expected_response, timeout, priority=PRIORITY_NORMAL):
     """
     SIM7600X modülüne AT komutu gönderir ve belirli bir yanıtı bekler.
+    Komut modem yöneticisinin öncelikli kuyruğundan geçer; modem sonuç kodunu (OK, ERROR, '>')
+    gönderdiği anda döner, timeout yalnızca üst sınırdır.
     Başarılı olursa yanıtı döndürür, aksi takdirde None.
     """
-    rec_buff = ''
-    if ser is None or not ser.is_open:
-        print(f"Seri port {GPS_PORT} açık değil, AT komutu gönderilemiyor.")
+    if modem is None or not modem.is_open:
+        log.error("Seri port %s açık değil, AT komutu gönderilemiyor.", GPS_PORT)
         return None
 
     try:
-        print(f"Gönderiliyor AT: {command}")
-        ser.write((command + '\r\n').encode())
-        time.sleep(timeout)
-
-        if ser.inWaiting():
-            time.sleep(0.05)
-            rec_buff = ser.read(ser.inWaiting())
-
-        decoded_rec_buff = rec_buff.decode(errors='ignore')
-        print(f"Yanıt: {decoded_rec_buff.strip()}")
+        log.debug("Gönderiliyor AT: %s", command)
+        with SEND_AT_SECONDS.labels(command=command_label(command)).time():
+            response = modem.command(command, timeout, priority).result()
+        decoded_rec_buff = response.text
+        log.debug("Yanıt: %s (%.0f ms)", decoded_rec_buff.strip(), response.elapsed * 1000)
 
         if expected_response not in decoded_rec_buff:
-            print(f"HATA: '{command}' komutu için '{expected_response}' yanıtı alınamadı.")
+            if response.timed_out:
+                log.error("'%s' komutu %s sn içinde yanıt vermedi.", command, timeout)
+            else:
+                log.error("'%s' komutu için '%s' yanıtı alınamadı.", command, expected_response)
             return None
         else:
             return decoded_rec_buff
-    except serial.SerialException as e:
-        print(f"Seri port hatası send_at içinde: {e}")
+    except OSError as e: # serial.SerialException da OSError'dır
+        log.error("Seri port hatası send_at içinde: %s", e)
         return None
     except Exception as e:
-        print(f"send_at sırasında beklenmedik hata: {e}")
+        log.exception("send_at sırasında beklenmedik hata: %s", e)
         return None
 
-def parse_cgpsinfo(cgpsinfo_str):
+def press_power_key(power_key_pin, hold_seconds):
     """
-    AT+CGPSINFO yanıtını ayrıştırır ve enlem, boylam, zamanı döndürür.
+    SIM7600X güç anahtarına basar (açma ve kapama aynı darbedir).
+    Modülün açılması/kapanması beklenmez; hazır olma durumu modem_bringup.py'de AT ve URC'lerle izlenir.
     """
-    if not cgpsinfo_str or '+CGPSINFO:' not in cgpsinfo_str:
-        return None, None, None
+    gpio.setup_output(power_key_pin)
+    gpio.write(power_key_pin, True)
+    time.sleep(hold_seconds)
+    gpio.write(power_key_pin, False)
 
-    parts = cgpsinfo_str.strip().split('+CGPSINFO: ')[1].split(',')
-    
-    if len(parts) < 9:
-        print(f"GPS ayrıştırma hatası: Beklenenden az parça ({len(parts)}). Cümle: {cgpsinfo_str}")
-        return None, None, None
-
-    try:
-        lat_raw = parts[0]
-        lat_hemi = parts[1]
-        latitude = None
-        if lat_raw and lat_hemi:
-            lat_deg = float(lat_raw[0:2])
-            lat_min = float(lat_raw[2:])
-            latitude = lat_deg + (lat_min / 60)
-            if lat_hemi == 'S':
-                latitude *= -1
-
-        lon_raw = parts[2]
-        lon_hemi = parts[3]
-        longitude = None
-        if lon_raw and lon_hemi:
-            lon_deg = float(lon_raw[0:3])
-            lon_min = float(lon_raw[3:])
-            longitude = lon_deg + (lon_min / 60)
-            if lon_hemi == 'W':
-                longitude *= -1
-
-        date_raw = parts[4]
-        time_raw = parts[5]
-        
-        timestamp = None
-        if date_raw and time_raw:
-            try:
-                year = int(date_raw[4:6]) + 2000
-                month = int(date_raw[2:4])
-                day = int(date_raw[0:2])
-                hour = int(time_raw[0:2])
-                minute = int(time_raw[2:4])
-                second = int(time_raw[4:6].split('.')[0])
-                
-                timestamp = datetime(year, month, day, hour, minute, second).isoformat()
-            except ValueError as ve:
-                print(f"Tarih/Zaman dönüştürme hatası: {ve} - Date: '{date_raw}', Time: '{time_raw}'")
-                timestamp = datetime.now().isoformat()
+def power_down(bring_up):
+    """
+    SIM7600X modülünü kapatır ve kapanana kadar (en fazla power_down_timeout_seconds) bekler.
+    """
+    log.info('SIM7600X kapatılıyor...')
+    if bring_up.power_down():
+        if bring_up.already_off:
+            log.info("SIM7600X zaten kapalı (AT yanıtı yok), güç anahtarı atlandı.")
         else:
-            timestamp = datetime.now().isoformat()
+            log.info("SIM7600X kapandı (%.1f sn).", bring_up.timings['power_down'])
+    else:
+        log.warning("SIM7600X'in kapandığı doğrulanamadı.")
 
-        return latitude, longitude, timestamp
+# --- Ana Entegrasyon Logiği ---
+def job_pending(future):
+    """Modem yöneticisine verilmiş bir iş (arama/SMS) hâlâ sürüyorsa True."""
+    return future is not None and not future.done()
 
-    except ValueError as e:
-        print(f"GPS ayrıştırma hatası (ValueError): {e} - Cümle: {cgpsinfo_str}")
-        return None, None, None
-    except IndexError as e:
-        print(f"GPS ayrıştırma hatası (IndexError): {e} - Cümle: {cgpsinfo_str}")
-        return None, None, None
-    except Exception as e:
-        print(f"GPS ayrıştırma sırasında beklenmedik hata: {e} - Cümle: {cgpsinfo_str}")
-        return None, None, None
+def revoke_on_failure(notifier, channel):
+    """İş başarısız olursa kanalın bildirim işaretini geri alan Future geri çağırması döndürür."""
+    def callback(future):
+        if future.cancelled() or future.exception() is not None or not future.result():
+            notifier.revoke(channel)
+    return callback
 
-def get_gps_position_from_module():
+def gps_data(fix):
     """
-    SIM7600'den GPS konumunu alır (GPS'in zaten açık olduğu varsayılır).
+    Firebase kayıtlarında kullanılan ortak GPS bloğunu oluşturur.
+    fix, GpsTracker.latest_fix() sonucudur; hiç konum alınmadıysa None.
     """
-    max_attempts = 5 # GPS kilidi için deneme sayısı
-    attempts = 0
-    while attempts < max_attempts:
-        response = send_at('AT+CGPSINFO','+CGPSINFO: ',1) # Sadece bilgi sorgula
-        if response:
-            if ',,,,,,' in response: # Henüz konum kilitlenmedi
-                print('GPS konum kilitlenmesi bekleniyor...')
-                time.sleep(1)
-            else:
-                latitude, longitude, timestamp = parse_cgpsinfo(response)
-                if latitude is not None and longitude is not None:
-                    print(f"GPS verisi alındı: Lat={latitude}, Lon={longitude}, Time={timestamp}")
-                    return latitude, longitude, timestamp
-        else:
-            print('AT+CGPSINFO komutuna yanıt alınamadı.')
-            
-        attempts += 1
-        time.sleep(1) # Denemeler arasında bekle
+    if fix is None:
+        return {"latitude": "N/A", "longitude": "N/A", "timestamp": datetime.now().isoformat()}
+    return {
+        "latitude": fix.latitude,
+        "longitude": fix.longitude,
+        "timestamp": fix.timestamp if fix.timestamp else datetime.now().isoformat(),
+        "fix_age_seconds": round(fix.age_seconds, 1),
+        "stale": fix.stale
+    }
 
-    print(f"GPS konum kilitlenemedi veya {max_attempts} denemede veri alınamadı.")
-    # GPS'i burada kapatmıyoruz, main döngüsünde açık kalacak
-    return None, None, None
-
-def power_on(power_key_pin):
+def camera_confidence_levels(camera):
     """
-    SIM7600X modülünü açar.
+    Kameranın güvenirlik seviyelerini büyükten küçüğe sıralı döndürür (öncelik sırası için).
+    Kamera ayarındaki 'confidence_overrides' ({klasör: eşik}) genel eşiklerin yerine geçer.
     """
-    print('SIM7600X başlatılıyor...')
-    GPIO.setmode(GPIO.BCM)
-    GPIO.setwarnings(False)
-    GPIO.setup(power_key_pin, GPIO.OUT)
-    time.sleep(0.1)
-    GPIO.output(power_key_pin, GPIO.HIGH)
-    time.sleep(2)
-    GPIO.output(power_key_pin, GPIO.LOW)
-    time.sleep(20) # Modülün tam olarak açılması için bekleme süresi artırıldı
-    if ser and ser.is_open:
-        ser.flushInput()
-    print('SIM7600X hazır.')
-    time.sleep(5) # Dahili sistemlerin başlaması için ek bekleme
-
-def power_down(power_key_pin):
+    overrides = camera.get("confidence_overrides") or {}
+    levels = [dict(level, threshold=overrides.get(level["folder"], level["threshold"])) for level in CONFIG["confidence_levels"]]
+    return sorted(levels, key=lambda x: x["threshold"], reverse=True)
+
+def tier_table(confidence_levels):
     """
-    SIM7600X modülünü kapatır.
+    Büyükten küçüğe sıralı güvenirlik seviyelerinden np.searchsorted için artan eşik dizisini ve
+    aynı sıradaki seviye listesini döndürür (kamera başına bir kez hesaplanır).
     """
-    print('SIM7600X kapatılıyor...')
-    if GPIO.getmode() == GPIO.BCM:
-        GPIO.output(power_key_pin, GPIO.HIGH)
-        time.sleep(3)
-        GPIO.output(power_key_pin, GPIO.LOW)
-        time.sleep(18)
-    print('SIM7600X kapandı.')
-
-def make_call(number):
+    ascending = confidence_levels[::-1]
+    return np.array([level["threshold"] for level in ascending], dtype=np.float32), ascending
+
+def confidence_tier(tiers, confidence):
+    """Güvenirliğin ulaştığı en yüksek seviye; hiçbir eşiğe ulaşmıyorsa None."""
+    thresholds, levels = tiers
+    index = int(np.searchsorted(thresholds, np.float32(confidence), side="right")) - 1
+    return levels[index] if index >= 0 else None
+
+def alert_settings():
+    """Telemetri aşamasının okuduğu bildirim eşikleri ve mesajı; yeniden yüklemede sözlük bütün olarak değiştirilir."""
+    return {"call_threshold": CONFIG["call_threshold"], "sms_threshold": CONFIG["sms_threshold"], "sms_message": CONFIG["sms_message"]}
+
+def camera_path(camera_state, path):
+    """Firebase yolunu kameranın kök yoluna göre oluşturur ('' ise tek kameralı eski yapı korunur)."""
+    prefix = camera_state["firebase_path"]
+    return f"{prefix}/{path}" if prefix else path
+
+def build_detection_pipeline(frame_sources, gps_tracker):
     """
-    Belirtilen numarayı arar.
+    Yakalama → ön filtre → çözme → çıkarım → kayıt / telemetri aşamalarını sınırlı kuyruklarla
+    birbirine bağlar ve (başlatılmamış) işlem hattını durum sözlüğüyle birlikte döndürür.
+    frame_sources: (kamera_ayarı, kare_kaynağı) listesi. Her kameranın kendi yakalama aşaması vardır;
+    tüm kameraların kareleri çıkarım aşamasında tek bir toplu model çağrısında işlenir.
+    Her aşama kendi iş parçacığında çalıştığı için kare hızı aşamaların toplamıyla değil,
+    en yavaş aşamayla sınırlıdır.
     """
-    print(f"Arama yapılıyor: {number}")
-    if send_at(f'ATD{number};', 'OK', 10):
-        print("Arama başlatıldı. 20 saniye bekliyor...")
-        time.sleep(20)
-        print("Aramayı sonlandırılıyor...")
-        if send_at('AT+CHUP', 'OK', 3):
-            print('Arama başarıyla sonlandırıldı.')
-            return True
+    # Konfigürasyon değerlerini değişkene ata
+    output_base_folder = CONFIG["output_base_folder"]
+    fire_alert_filename_prefix = CONFIG["fire_alert_filename_prefix"]
+    buffer_max_size = CONFIG["buffer_max_size"]
+
+    continuous_mode = CONFIG["continuous_mode"]
+    multi_camera = len(frame_sources) > 1
+
+    # Takipçi, alarm penceresi, alarm durumu, tampon, ön filtre ve zamanlayıcı kamera başınadır ve yalnızca çıkarım
+    # aşamasında değişir; bildirim sınırlayıcısı (tek telefon numarası) ortaktır ve yalnızca telemetri aşamasında değişir
+    state = {
+        "fire_alert_triggered": False, # En az bir alarm verildi mi (sürekli modda hat durmaz)
+        "alarms": 0,
+        "notifier": create_notification_limiter(CONFIG),
+        "alerts": create_alert_dispatcher(CONFIG, modem), # Alıcı listesine SMS ve sıralı arama
+        "alert_settings": alert_settings(), # Arama/SMS eşikleri (ayar yeniden yüklemede değişir)
+        "telemetry": create_telemetry_encoder(CONFIG), # None ise her karede tam durum gönderilir
+        "call_future": None,
+        "sms_future": None,
+        "cameras": {},
+    }
+    for camera, _ in frame_sources:
+        confidence_levels = camera_confidence_levels(camera)
+        state["cameras"][camera["id"]] = {
+            "id": camera["id"],
+            "confidence_levels": confidence_levels,
+            "tiers": tier_table(confidence_levels),
+            "firebase_path": camera.get("firebase_path", f"cameras/{camera['id']}"),
+            "file_tag": f"{camera['id']}_" if multi_camera else "",
+            "fire_alert_triggered": False,
+            "tracker": create_tracker(camera),
+            "alarm_window": create_alarm_window(camera),
+            "alarm_state": create_alarm_state_machine(camera),
+            "alarm_frame_buffer": AlarmFrameBuffer(buffer_max_size, window_seconds=camera["buffer_window_seconds"]),
+            "motion_gate": create_motion_gate(camera),
+            "capture_scheduler": create_capture_scheduler(camera),
+            "detector": create_region_detector(model, camera),
+        }
+
+    pipeline = Pipeline("tespit")
+    # Kuyruk boyutları kamera sayısıyla ölçeklenir; bir kameranın kareleri diğerininkini düşürmesin
+    queues = {name: pipeline.add_queue(name, maxsize=q["maxsize"] * len(frame_sources), drop_oldest=q["drop_oldest"])
+              for name, q in CONFIG["pipeline_queues"].items()}
+
+    def capture_frames(camera_state, frame_source):
+        # Kaynak JPEG baytlarını çözmeden üretir; çözme ayrı aşamada yapılır
+        for jpeg_bytes, frame in frame_source.frames(decode=False):
+            yield {"camera": camera_state, "jpeg_bytes": jpeg_bytes, "frame": frame, "captured_at": time.time()}
+
+    def gate_frame(item):
+        # Sahne değişmediyse ve alev rengi yoksa kare çözülmeden ve çıkarıma gönderilmeden atlanır
+        motion_gate = item["camera"]["motion_gate"]
+        if motion_gate is None:
+            return item
+        run_inference, reason = motion_gate.check(jpeg_bytes=item["jpeg_bytes"], frame=item["frame"])
+        GATE_FRAMES.labels(camera=item["camera"]["id"], result=reason).inc()
+        if not run_inference:
+            return None
+        item["gate_reason"] = reason
+        return item
+
+    def decode_frame(item):
+        # Bellekten alınan JPEG baytlarını OpenCV görüntüsüne dönüştür
+        if item["frame"] is None:
+            item["frame"] = decode_jpeg(item["jpeg_bytes"])
+        if item["frame"] is None:
+            log.error("[%s] Bellekteki fotoğraf verisi okunamadı veya çözülemedi.", item['camera']['id'])
+            return None
+        return item
+
+    def detect_fire(items):
+        if state["fire_alert_triggered"] and not continuous_mode:
+            return [] # Durdurma modunda alarm verildikten sonra gelen kareler işlenmez
+
+        # YOLO modeli ile tespiti gerçekleştir: tüm kameraların kareleri (ve ROI/karo alt görüntüleri)
+        # tek toplu çağrıda işlenir; kutular her karenin tam kare koordinatlarındadır
+        inference_started = time.monotonic()
+        detections_list = detect_batch(model, [item["camera"]["detector"] for item in items],
+                                       [item["frame"] for item in items])
+        inference_seconds = time.monotonic() - inference_started
+        return [classify_frame(item, detections, inference_seconds)
+                for item, detections in zip(items, detections_list)]
+
+    def classify_frame(item, detections, inference_seconds):
+        if state["fire_alert_triggered"] and not continuous_mode:
+            return None
+        camera_state = item["camera"]
+        camera_id = camera_state["id"]
+        tiers = camera_state["tiers"] # Yeniden yüklemede bütün olarak değişir; kare boyunca tek tablo kullanılır
+        frame = item["frame"]
+        alarm_frame_buffer = camera_state["alarm_frame_buffer"]
+
+        # Güvenirlikler tek seferde NumPy dizisi olarak alınır; kare kategorisi en yüksek güvenirliğin seviyesidir.
+        # Kutular burada çizilmez: yalnızca kare kaydedilecekse kayıt iş parçacığında çizilir
+        confidences = detections.confidences
+        highest_confidence_in_frame = float(confidences.max()) if len(confidences) else 0.0
+        fire_detected_this_frame = highest_confidence_in_frame > 0
+        level = confidence_tier(tiers, highest_confidence_in_frame)
+        detection_category = level["firebase_tag"] if level is not None else "no_detection"
+        current_frame_has_high_confidence_fire = level is tiers[1][-1]
+        DETECTIONS.labels(camera=camera_id, tier=level["folder"] if level is not None else "none").inc()
+
+        if current_frame_has_high_confidence_fire:
+            # En yüksek alarm seviyesi için tampona kaydet (kare başına bir kez).
+            # Çözülmüş kare yerine kameradan gelen JPEG baytları ve kutular saklanır;
+            # kutular yalnızca tampon diske boşaltılırken çizilir
+            alarm_frame_buffer.append(item["jpeg_bytes"], detections.boxes, detections.confidences,
+                                      detections.classes, class_names=detections.class_names, frame=frame,
+                                      captured_at=item["captured_at"])
+
+        if fire_detected_this_frame and camera_state["motion_gate"] is not None:
+            camera_state["motion_gate"].notify_detection()
+        # Zamanlayıcı: herhangi bir güvenirlik seviyesine ulaşıldıysa yakalama hızı artırılır
+        camera_state["capture_scheduler"].record_processing(inference_seconds)
+        camera_state["capture_scheduler"].on_detection(detection_category != "no_detection")
+
+        # Takip ve alarm penceresi: ALARM seviyesindeki en güvenilir kutu, izi yeterince uzunsa isabet sayılır
+        tracker = camera_state["tracker"]
+        alarm_window = camera_state["alarm_window"]
+        track_ids = tracker.update(detections.boxes, detections.confidences, detections.classes)
+        alarm_confidence, track_hits, track_id = 0.0, 0, None
+        if current_frame_has_high_confidence_fire:
+            best = int(np.argmax(detections.confidences))
+            track_id = int(track_ids[best])
+            alarm_confidence, track_hits = float(detections.confidences[best]), tracker.get(track_id).hits
+        alarm_window.update(alarm_confidence, track_hits)
+        alarm_state, alarm_transition = camera_state["alarm_state"].update(alarm_window)
+        if alarm_transition is not None:
+            ALARM_TRANSITIONS.labels(camera=camera_id, state=alarm_transition[1]).inc()
+            log.info("[%s] Alarm durumu: %s -> %s", camera_id, alarm_transition[0], alarm_transition[1],
+                     extra=fields(camera=camera_id, window=alarm_window.describe()))
+        camera_state["fire_alert_triggered"] = camera_state["alarm_state"].active
+
+        # Loglama: kare başına satırlar çağrı noktası başına hız sınırlıdır; tespitsiz kareler yalnızca DEBUG'da yazılır
+        if current_frame_has_high_confidence_fire:
+            log.info("[%s] ALARM seviyesi tespit!", camera_id,
+                     extra=fields(camera=camera_id, confidence=round(highest_confidence_in_frame, 2), track=track_id,
+                                  track_hits=track_hits, window=alarm_window.describe()))
+        elif fire_detected_this_frame:
+            log.info("[%s] Tespit var (%s)!", camera_id, detection_category,
+                     extra=fields(camera=camera_id, confidence=round(highest_confidence_in_frame, 2),
+                                  window=alarm_window.describe()))
         else:
-            print('Arama sonlandırılamadı.')
-            return False
-    else:
-        print('Arama başlatılamadı.')
-        return False
+            log.debug("[%s] Tespit yok veya düşük seviye.", camera_id,
+                      extra=fields(camera=camera_id, window=alarm_window.describe()))
+
+        item.update({
+            "detections": detections,
+            "level": level,
+            "timestamp_file": time.strftime("%Y%m%d_%H%M%S"),
+            "highest_confidence": highest_confidence_in_frame,
+            "detection_category": detection_category,
+            "fire_detected": fire_detected_this_frame,
+            "high_confidence_fire": current_frame_has_high_confidence_fire,
+            "track_id": track_id,
+            "cumulative_fire_detections": alarm_window.hits,
+            "alarm_score": alarm_window.score,
+            "fire_alert_triggered": camera_state["fire_alert_triggered"],
+            "alarm_state": alarm_state,
+            "alarm_transition": alarm_transition,
+            "alarm_episode": camera_state["alarm_state"].episode,
+            "alarm_frames": None,
+        })
+
+        # Alarm durumuna yeni girildi mi? (COOLDOWN'dan geri dönüş de aynı olayın yeni alarm anıdır)
+        if alarm_transition is not None and alarm_transition[1] == STATE_ALARM:
+            buffer_stats = alarm_frame_buffer.stats()
+            log.critical("!!! [%s] YÜKSEK GÜVENİLİRLİKLİ YANGIN ALARMI TETİKLENDİ! %s. !!! '%d' adet ALARM seviyesi tespit kaydediliyor...",
+                         camera_id, 'İZLEME DEVAM EDİYOR' if continuous_mode else 'SİSTEM DURDURULUYOR', buffer_stats['frames'],
+                         extra=fields(camera=camera_id, window=alarm_window.describe(), episode=camera_state["alarm_state"].episode,
+                                      buffer_kb=round(buffer_stats['memory_bytes'] / 1024)))
+            state["fire_alert_triggered"] = True
+            state["alarms"] += 1
+            item["alarm_frames"] = alarm_frame_buffer.snapshot()
+            alarm_frame_buffer.clear() # Sonraki alarm anında aynı kareler tekrar kaydedilmesin
+            if not continuous_mode:
+                # Yeni kare almayı durdur; kuyruktaki kayıt ve telemetri işleri tamamlansın
+                pipeline.stop(drain=True)
+        return item
+
+    def persist_frame(item):
+        # Tespit edilen kareyi doğruluk oranına göre ilgili klasöre kaydet (çok kameralıda dosya adında kamera kimliği bulunur)
+        confidence_levels = item["camera"]["confidence_levels"]
+        file_tag = item["camera"]["file_tag"]
+        highest_confidence_in_frame = item["highest_confidence"]
+        timestamp_file = item["timestamp_file"]
+        level = item["level"]
+        image_path = None
+        if level is not None:
+            target_folder = os.path.join(output_base_folder, level["folder"])
+            filename = os.path.join(target_folder, f'{level["prefix"]}_{file_tag}{timestamp_file}_{highest_confidence_in_frame:.2f}.jpg')
+            # Tespit kutuları ve etiketler yalnızca kayıt kabul edilirse, kayıt iş parçacığında çizilir (orijinal kare değiştirilmez)
+            if image_writer.submit(level["folder"], filename, render=functools.partial(item["detections"].plot, item["frame"])):
+                image_path = filename
+
+        # Her işlenen kare yerel olay kaydına bırakılır (toplu yazma ayrı iş parçacığında)
+        if event_store is not None:
+            event_store.record(item["camera"]["id"], item["captured_at"], highest_confidence_in_frame,
+                               level["folder"] if level is not None else None, fix=gps_tracker.latest_fix(),
+                               image_path=image_path, alarm_state=item["alarm_state"], track_id=item["track_id"])
+
+        if item["alarm_frames"] is not None:
+            # Tampondaki kareler burada çözülüp çizilmez: tek toplu iş olarak kaydediciye verilir ve
+            # kayıt iş parçacığında sırayla çizilir (çözülemeyen kareyi kaydedici atlar ve günlüğe yazar)
+            alert_folder = confidence_levels[0]["folder"]
+            alert_output_folder = os.path.join(output_base_folder, alert_folder)
+            renders = [(os.path.join(alert_output_folder, f'{fire_alert_filename_prefix}_ALARM_ANIT_{file_tag}part{idx+1}_{timestamp_file}.jpg'),
+                        functools.partial(render_annotated, buffered_frame))
+                       for idx, buffered_frame in enumerate(item["alarm_frames"])]
+            if image_writer.submit_batch(alert_folder, renders):
+                log.info("Alarm anı fotoğrafları (%d) kayıt kuyruğuna alındı: %s", len(renders), alert_output_folder)
+
+    def publish_telemetry(item):
+        camera_state = item["camera"]
+        highest_confidence_in_frame = item["highest_confidence"]
+        fire_detected_this_frame = item["fire_detected"]
+        detection_category = item["detection_category"]
+
+        # --- Arama ve SMS Tetikleme Mantığı ---
+        # Arama ve SMS modem yöneticisinde eşzamansız yürütülür; bu aşama sonucu beklemez.
+        # Yalnızca kamera SUSPECT veya ALARM durumundayken bildirim yapılır (tek karelik parlamalar aramaz).
+        # Bildirim olay başına bir kez gönderilir; alarm sürdükçe yeniden bildirim aralığıyla sınırlı tekrarlanır.
+        # İş başarısız olursa işaret geri alınır ve bir sonraki karede yeniden denenir.
+        notifier = state["notifier"]
+        settings = state["alert_settings"]
+        call_threshold, sms_threshold = settings["call_threshold"], settings["sms_threshold"]
+        alarm_active = item["alarm_state"] == STATE_ALARM
+        entered_alarm = item["alarm_transition"] is not None and item["alarm_transition"][1] == STATE_ALARM
+        first_alarm = entered_alarm and item["alarm_transition"][0] != STATE_COOLDOWN # COOLDOWN'dan dönüş aralıkla sınırlı
+        if item["alarm_state"] in (STATE_SUSPECT, STATE_ALARM) and (fire_detected_this_frame or entered_alarm):
+            # Arama eşiği aşıldıysa arama yap (arama listesi boşsa, yalnızca SMS alan nöbet listesi, atlanır)
+            if (highest_confidence_in_frame >= call_threshold and state["alerts"].call_recipients
+                    and not job_pending(state["call_future"])
+                    and notifier.allow("call", alarm_active, first_alarm)):
+                log.warning("Güvenirlik %.2f >= Arama Eşiği %s. Arama yükseltmesi başlatılıyor...", highest_confidence_in_frame, call_threshold)
+                state["call_future"] = state["alerts"].escalate()
+                state["call_future"].add_done_callback(revoke_on_failure(notifier, "call"))
+
+            # SMS eşiği aşıldıysa veya alarm durumuna yeni girildiyse SMS gönder
+            if ((highest_confidence_in_frame >= sms_threshold or entered_alarm) and not job_pending(state["sms_future"])
+                    and notifier.allow("sms", alarm_active, first_alarm)):
+                log.warning("Güvenirlik %.2f (eşik %s), alarm durumu %s. SMS gönderiliyor...",
+                            highest_confidence_in_frame, sms_threshold, item['alarm_state'])
+                state["sms_future"] = state["alerts"].send_sms(settings["sms_message"])
+                state["sms_future"].add_done_callback(revoke_on_failure(notifier, "sms"))
+        elif all(camera["alarm_state"].state == STATE_IDLE for camera in state["cameras"].values()):
+            # Tüm kameralarda olay kapandığında bildirim sayaçlarını sıfırla
+            notifier.reset()
+
+        # --- Firebase'e Veri Gönderimi (Her Karede Güncel Durum ve Yangın Tespitinde Olay Kaydı) ---
+        # Son konum arka plandaki GPS takibinden okunur, modem beklenmez
+        gps_fix = gps_tracker.latest_fix()
+
+        # Her karede güncel sistem durumunu Firebase'e gönder (PUT)
+        # path'ler FIREBASE_URL'ye göre göreceli olmalı (örn. "current_system_status"); ek kameralar
+        # kendi kök yolları altına yazar (örn. "cameras/cam1/current_system_status")
+        current_system_status_data = {
+            "camera_id": camera_state["id"],
+            "system_time": datetime.now().isoformat(),
+            "last_processed_frame_confidence": f"{highest_confidence_in_frame:.2f}",
+            "last_processed_frame_category": detection_category,
+            "fire_detected_in_last_frame": fire_detected_this_frame,
+            "gps": gps_data(gps_fix),
+            "cumulative_fire_detections": item["cumulative_fire_detections"], # Alarm penceresindeki isabetli kare sayısı
+            "alarm_score": round(item["alarm_score"], 3),
+            "alarm_state": item["alarm_state"],
+            "fire_alert_triggered": item["fire_alert_triggered"]
+        }
+        status_path = camera_path(camera_state, "current_system_status")
+        encoder = state["telemetry"]
+        if encoder is None:
+            send_to_firebase(status_path, current_system_status_data)
+            log.debug("[%s] Firebase'e güncel sistem durumu gönderildi (yangın tespit: %s).", camera_state['id'], fire_detected_this_frame)
+        else:
+            # Yalnızca eşik üstünde değişen alanlar (veya sessiz dönemde nabız) gönderilir; şema aynı kalır
+            kind, payload = encoder.encode(status_path, current_system_status_data)
+            if kind == "full":
+                send_to_firebase(status_path, payload)
+            elif kind is not None:
+                firebase.update(status_path, payload)
+            if kind is not None:
+                log.debug("[%s] Firebase durum güncellemesi (%s): %s", camera_state['id'], kind, ", ".join(payload))
+
+        if fire_detected_this_frame: # Sadece yangın tespit edildiğinde ayrıca bir olay kaydı ekle (POST)
+            firebase_event_data = {
+                "camera_id": camera_state["id"],
+                "detection_time": datetime.now().isoformat(),
+                "confidence": f"{highest_confidence_in_frame:.2f}",
+                "category": detection_category,
+                "track_id": item["track_id"],
+                "gps": gps_data(gps_fix)
+            }
+            event_key = push_to_firebase(camera_path(camera_state, "fire_detections"), firebase_event_data)
+            if sms_failover is not None and item["level"] is not None:
+                # Firebase'e ulaşamazsa yedek kanal olayı SMS ile gönderir; ulaşırsa kuyruktan düşer
+                sms_failover.record(event_key, camera_state["id"], datetime.fromtimestamp(item["captured_at"]),
+                                    item["level"]["folder"], highest_confidence_in_frame,
+                                    firebase_event_data["gps"]["latitude"], firebase_event_data["gps"]["longitude"])
+            # Eğer ALARM seviyesindeyse en son alarm detayını da güncelleyebiliriz
+            if item["high_confidence_fire"]:
+                send_to_firebase(camera_path(camera_state, "current_status/last_alarm_details"), firebase_event_data)
+
+        if item["alarm_frames"] is not None:
+            # Alarm tetiklendiğinde Firebase'e özel bir durum gönder
+            alarm_data = {
+                "camera_id": camera_state["id"],
+                "alarm_time": datetime.now().isoformat(),
+                "message": "CUMULATIVE HIGH CONFIDENCE FIRE ALERT TRIGGERED!",
+                "final_confidence": f"{highest_confidence_in_frame:.2f}",
+                "gps": gps_data(gps_fix)
+            }
+            push_to_firebase(camera_path(camera_state, "system_alerts"), alarm_data, urgent=True) # Yeni bir alarm kaydı olarak ekle
+            send_to_firebase(camera_path(camera_state, "current_status/system_alarm_status"), {"status": "ACTIVE", "last_alarm_time": datetime.now().isoformat(), "triggered_by_confidence": f"{highest_confidence_in_frame:.2f}", "episode": item["alarm_episode"]})
+        elif item["alarm_transition"] is not None and item["alarm_transition"][1] == STATE_IDLE and item["alarm_transition"][0] != STATE_SUSPECT:
+            # Soğuma süresi sakin geçti, olay kapandı
+            send_to_firebase(camera_path(camera_state, "current_status/system_alarm_status"), {"status": "CLEARED", "cleared_time": datetime.now().isoformat(), "episode": item["alarm_episode"]})
 
-def send_short_message(number, message):
+    for camera, frame_source in frame_sources:
+        camera_state = state["cameras"][camera["id"]]
+        pipeline.add_stage(f"capture_{camera['id']}" if multi_camera else "capture",
+                           source=capture_frames(camera_state, frame_source), output_queues=[queues["gate"]],
+                           interval=camera_state["capture_scheduler"].next_interval)
+    pipeline.add_stage("gate", gate_frame, input_queue=queues["gate"], output_queues=[queues["decode"]])
+    pipeline.add_stage("decode", decode_frame, input_queue=queues["decode"], output_queues=[queues["inference"]])
+    # Kameralardan gelen kareler batch_timeout kadar beklenip tek çıkarım çağrısında toplanır
+    pipeline.add_stage("inference", detect_fire, input_queue=queues["inference"],
+                       output_queues=[queues["persist"], queues["telemetry"]],
+                       batch_size=len(frame_sources), batch_timeout=CONFIG["inference_batch_timeout_seconds"])
+    pipeline.add_stage("persist", persist_frame, input_queue=queues["persist"])
+    pipeline.add_stage("telemetry", publish_telemetry, input_queue=queues["telemetry"])
+    return pipeline, state
+
+def apply_runtime_config(state, frame_sources, changed):
     """
-    Belirtilen numaraya kısa mesaj gönderir.
+    Ayar dosyasından yeniden yüklenen anahtarları (config.RELOADABLE_KEYS) çalışan hatta uygular.
+    Eşikler kamera başına arama tablolarına yeniden derlenir; tablolar, eşik sözlüğü ve uyarı dağıtıcısı
+    bütün olarak değiştirilir. Yakalama, çıkarım ve modem oturumu durmaz; kuyruktaki kareler eski
+    tabloyla, sonrakiler yenisiyle sınıflandırılır.
     """
-    print("SMS modunu ayarlanıyor...")
-    if not send_at("AT+CMGF=1", "OK", 1):
-        print("SMS modu ayarlanamadı.")
-        return False
-    
-    print("Kısa Mesaj Gönderiliyor...")
-    if not send_at(f'AT+CMGS="{number}"', '>', 5):
-        print('Mesaj gönderme başlatılamadı (AT+CMGS).')
-        return False
-
-    ser.write(message.encode())
-    ser.write(b'\x1A') # CTRL+Z karakteri (mesaj sonu)
-    time.sleep(1) # CTRL+Z sonrası bekleme
-
-    # Modülün mesajı işleyip "OK" dönmesini bekle
-    # Bu kısımda daha detaylı yanıt takibi için bir döngü eklenebilir
-    response_after_sms = ''
-    start_time = time.time()
-    while time.time() - start_time < 20: # 20 saniye bekle
-        if ser.inWaiting():
-            time.sleep(0.1)
-            response_after_sms += ser.read(ser.inWaiting()).decode('utf-8', errors='ignore')
-            if "OK" in response_after_sms:
-                print(f"SMS gönderim yanıtı (OK): {response_after_sms.strip()}")
-                print('Mesaj başarıyla gönderildi.')
-                return True
-            elif "ERROR" in response_after_sms or "+CMS ERROR" in response_after_sms:
-                print(f"SMS gönderim yanıtı (ERROR): {response_after_sms.strip()}")
-                print('Mesaj gönderme hatası (modül raporu).')
-                return False
-        time.sleep(0.5) # Kısa bekleme
-    
-    print(f"SMS gönderim yanıtı (timeout): {response_after_sms.strip()}")
-    print('Mesaj gönderme hatası (zaman aşımı veya OK alınamadı).')
-    return False
+    if "confidence_levels" in changed:
+        for camera, _ in frame_sources:
+            camera_state = state["cameras"][camera["id"]]
+            confidence_levels = camera_confidence_levels(camera)
+            camera_state["confidence_levels"] = confidence_levels
+            camera_state["tiers"] = tier_table(confidence_levels)
+        image_writer.update_levels(CONFIG["confidence_levels"])
+    if "capture_scheduler" in changed:
+        # Kamera sözlüğündeki capture_scheduler genel ayarın yerine geçmeye devam eder (kameralar yeniden yüklenmez)
+        cameras = {camera["id"]: camera for camera in camera_configs(CONFIG)}
+        for camera, _ in frame_sources:
+            state["cameras"][camera["id"]]["capture_scheduler"].update(**scheduler_settings(cameras[camera["id"]]))
+    if {"call_threshold", "sms_threshold", "sms_message"} & set(changed):
+        state["alert_settings"] = alert_settings()
+    if {"recipients", "alerting"} & set(changed):
+        # Süren arama/SMS işleri eski dağıtıcıda tamamlanır; yeni bildirimler yeni listeye gider
+        state["alerts"] = create_alert_dispatcher(CONFIG, modem)
+        if sms_failover is not None:
+            # Yedek kanal her gönderimde recipient'ı okur; sabit alıcı verilmediyse yeni birincil numaraya geçer
+            sms_failover.recipient = failover_recipient(CONFIG)
+    if "logging" in changed:
+        setup_logging(CONFIG)
+    thresholds = ", ".join(f'{level["folder"]}={level["threshold"]:.2f}' for level in CONFIG["confidence_levels"])
+    log.info("Çalışan ayarlar güncellendi: seviyeler [%s], arama eşiği %.2f, SMS eşiği %.2f.",
+             thresholds, CONFIG["call_threshold"], CONFIG["sms_threshold"])
+
+def run_detection_pipeline(frame_sources, gps_tracker):
+    """
+    İşlem hattını kurar ve tüm kare kaynakları bitene kadar (durdurma modunda ilk alarma kadar) çalıştırır.
+    En az bir alarm verildiyse True döndürür.
+    """
+    pipeline, state = build_detection_pipeline(frame_sources, gps_tracker)
+    reload_listener = functools.partial(apply_runtime_config, state, frame_sources)
+    if config_watcher is not None:
+        config_watcher.add_listener(reload_listener)
+    def print_stats():
+        # Tüm istatistikler tek kayıtta yazılır (hız sınırı satır başına değil, kayıt başınadır)
+        lines = [pipeline.format_stats(), model.format_stats()]
+        for camera_id, camera_state in state["cameras"].items():
+            lines.append(f"--- {camera_id} ---")
+            lines.append(camera_state["detector"].format_stats())
+            lines.append(camera_state["capture_scheduler"].format_stats())
+            lines.append(camera_state["alarm_state"].format_stats())
+            if camera_state["motion_gate"] is not None:
+                lines.append(camera_state["motion_gate"].format_stats())
+        lines.append(state["alerts"].format_stats())
+        if state["telemetry"] is not None:
+            lines.append(state["telemetry"].format_stats())
+        if sms_failover is not None:
+            lines.append(sms_failover.format_stats())
+        if firebase is not None:
+            firebase_stats = firebase.stats()
+            lines.append(f"[firebase] gönderilen={firebase_stats['bytes_sent'] / 1024:.1f}KB "
+                         f"son_saat={firebase_stats['bytes_last_hour'] / 1024:.1f}KB istek={firebase_stats['requests_sent']}")
+        log.info("İşlem hattı istatistikleri:\n%s", "\n".join(lines))
+
+    pipeline.start()
+    try:
+        # Ana iş parçacığı yalnızca hattı izler ve periyodik olarak aşama istatistiklerini yazdırır
+        while not pipeline.join(timeout=CONFIG["pipeline_stats_interval_seconds"]):
+            print_stats()
+    except KeyboardInterrupt:
+        pipeline.stop(drain=False)
+        pipeline.join(timeout=5)
+        raise
+    finally:
+        if config_watcher is not None:
+            config_watcher.remove_listener(reload_listener)
+        print_stats()
+
+    if CONFIG["continuous_mode"] or not state["fire_alert_triggered"]:
+        log.info("Kare kaynakları sonlandı, program sonlandırılıyor. (verilen alarm: %d)", state['alarms'])
+    return state["fire_alert_triggered"]
 
-# --- Ana Entegrasyon Logiği ---
 def main():
-    global ser # ser objesini global olarak kullan
+    global ser, at_transport, modem, firebase, image_writer, model, gpio, event_store, sms_failover # seri port, modem, Firebase, kaydedici, model, GPIO, olay kaydı ve SMS yedek kanalı objelerini global olarak kullan
+    global config_watcher, FIREBASE_URL, GPS_PORT, power_key # Ayar dosyası bu modül sabitlerini de değiştirebilir
+    frame_sources = []
+    gps_tracker = None
+
+    setup_logging(CONFIG)
+    # Ayar dosyası varsa doğrulanıp varsayılanların üzerine uygulanır; geçersizse donanıma dokunmadan çıkılır
+    if os.path.exists(CONFIG_FILE):
+        try:
+            config_watcher = create_config_watcher(CONFIG_FILE, CONFIG)
+        except (OSError, ValueError, RuntimeError) as e:
+            log.error("%s", e)
+            sys.exit(1)
+        FIREBASE_URL = config_watcher.settings.get("firebase_url", FIREBASE_URL)
+        GPS_PORT = config_watcher.settings.get("gps_port", GPS_PORT)
+        power_key = config_watcher.settings.get("power_key", power_key)
+        setup_logging(CONFIG)
+        log.info("Ayar dosyası yüklendi: %s (değişiklikler ve SIGHUP ile yeniden yüklenir)", CONFIG_FILE)
+    # Alıcı listesi hatalıysa hiçbir arka plan bileşeni ve modem başlatılmadan dur
+    try:
+        load_recipients(CONFIG)
+    except ValueError as e:
+        log.error("Alıcı listesi geçersiz: %s", e)
+        sys.exit(1)
 
-    setup_directories()
+    # Sahte donanımda güç anahtarı darbesi sahte modemi açıp kapatır
+    fake_modem = None
+    if CONFIG["serial_backend"] == "fake":
+        from fakes import FakeModem
+        fake_modem = FakeModem(pty=False, powered=False).start()
+    gpio = create_gpio(CONFIG, on_pulse=fake_modem.press_power_key if fake_modem is not None else None)
 
     # Seri portu başlatma
     try:
-        ser = serial.Serial(GPS_PORT, GPS_BAUDRATE, timeout=1)
-        print(f"Seri port {GPS_PORT} başarıyla açıldı.")
-    except serial.SerialException as e:
-        print(f"HATA: Seri port açılamadı: {e}")
-        print("Lütfen:")
-        print(f"1. SIM7600 modülünüzün {GPS_PORT} portuna bağlı olduğundan emin olun.")
-        print("2. Portun başka bir program tarafından kullanılmadığından emin olun (örn: minicom, ModemManager).")
-        print("3. Kullanıcınızın seri porta erişim izinlerinin olduğundan emin olun (örn: `sudo adduser $USER dialout`).")
-        print("4. Gerekirse Raspberry Pi'nin dahili seri port ayarlarını kontrol edin (`sudo raspi-config`).")
-        sys.exit(1) # Hata durumunda betikten çık
+        ser = open_serial(CONFIG, GPS_PORT, GPS_BAUDRATE, timeout=1, fake_modem=fake_modem)
+        log.info("Seri port %s başarıyla açıldı.", GPS_PORT)
+    except OSError as e:
+        log.error("Seri port açılamadı: %s\n"
+                  "Lütfen:\n"
+                  "1. SIM7600 modülünüzün %s portuna bağlı olduğundan emin olun.\n"
+                  "2. Portun başka bir program tarafından kullanılmadığından emin olun (örn: minicom, ModemManager).\n"
+                  "3. Kullanıcınızın seri porta erişim izinlerinin olduğundan emin olun (örn: `sudo adduser $USER dialout`).\n"
+                  "4. Gerekirse Raspberry Pi'nin dahili seri port ayarlarını kontrol edin (`sudo raspi-config`).", e, GPS_PORT)
+        if fake_modem is not None:
+            fake_modem.stop()
+        sys.exit(1) # Hata durumunda betikten çık (henüz durdurulacak arka plan bileşeni yok)
 
+    # Seri port açıldı; bundan sonra başlatılan her bileşen (kurulum sırasında hata olsa da) finally bloğunda
+    # durdurulur. Henüz oluşturulmamış bileşenler None kalır ve atlanır.
+    metrics_server = None
+    bring_up = None
+    image_writer = firebase = event_store = at_transport = modem = None
     try:
-        # SIM7600 modülünü aç
-        power_on(power_key)
-
-        # SIM PIN Kodu Girişi
-        print("SIM PIN durumunu sorguluyor...")
-        if not send_at('AT+CPIN?', 'READY', 5):
-            print("SIM PIN girilmesi gerekiyor...")
-            if CONFIG["pin_code"]:
-                if not send_at(f'AT+CPIN="{CONFIG["pin_code"]}"', 'OK', 5):
-                    print("HATA: PIN kodu girişi BAŞARISIZ oldu. Lütfen doğru PIN kodunu girdiğinizden emin olun.")
-                    power_down(power_key)
-                    sys.exit(1)
-                print("PIN kodu başarıyla girildi.")
-                time.sleep(2)
-            else:
-                print("HATA: PIN kodu 'pin_code' değişkenine girilmemiş veya çevre değişkeninden okunamadı. Lütfen kodu düzenleyin veya çevre değişkenini ayarlayın.")
-                power_down(power_key)
-                sys.exit(1)
-        else:
-            print("SIM zaten READY durumunda, PIN kodu girişi gerekli değil.")
-
-        # Ağ Kaydını Kontrol Etme
-        print("Ağ kaydı kontrol ediliyor...")
-        max_wait_time = 60
-        start_time = time.time()
-        registered = False
-        while time.time() - start_time < max_wait_time:
-            # +CREG: 0,1 -> Kayıtlı (ana ağ)
-            # +CREG: 0,5 -> Kayıtlı (dolaşım)
-            if send_at('AT+CREG?', '+CREG: 0,1', 3) or send_at('AT+CREG?', '+CREG: 0,5', 3):
-                print("SIM7600X ağa başarıyla kayıtlı.")
-                registered = True
-                break
-            print("Ağ kaydı bekleniyor... Lütfen bekleyin.")
-            time.sleep(5)
-        
-        if not registered:
-            print("HATA: SIM7600X zaman aşımı içinde ağa kaydolamadı. Lütfen SIM kartı, anteni ve sinyal gücünü kontrol edin.")
-            power_down(power_key)
+        if config_watcher is not None:
+            config_watcher.start()
+
+        # Ölçüm sunucusu yalnızca izleme içindir; port kullanımdaysa tespit yine de başlar
+        try:
+            metrics_server = create_metrics_server(CONFIG)
+            if metrics_server is not None:
+                metrics_server.start()
+                log.info("Ölçümler yayında: %s", metrics_server.url)
+        except OSError as e:
+            log.warning("Ölçüm sunucusu başlatılamadı: %s", e)
+
+        setup_directories()
+
+        # --- YOLO Modeli Yükle ---
+        # Model arka planda yüklenir; modem başlatma ile eşzamanlı ilerler ve ilk kareden hemen önce beklenir
+        model_future = create_backend(CONFIG).load_async()
+
+        image_writer = ImageWriter(CONFIG["output_base_folder"], CONFIG["confidence_levels"],
+                                   workers=CONFIG["image_writer_workers"],
+                                   queue_size=CONFIG["image_writer_queue_size"],
+                                   quota_bytes=CONFIG["disk_quota_mb"] * 1024 * 1024 if CONFIG["disk_quota_mb"] else None)
+        image_writer.start()
+
+        try:
+            event_store = create_event_store(CONFIG)
+            if event_store is not None:
+                event_store.start()
+        except (OSError, sqlite3.Error) as e:
+            # Yerel kayıt yalnızca sorgu içindir; açılamazsa tespit ve bildirimler yine çalışır
+            log.error("Olay kaydı açılamadı (%s): %s", CONFIG["event_store"]["path"], e)
+            event_store = None
+
+        # Firebase yükleyicisi modemden bağımsızdır; önceki çalışmadan kalan olaylar hemen gönderilmeye başlanır
+        firebase = FirebaseUploader(FIREBASE_URL, CONFIG["firebase_spool_path"],
+                                    flush_interval=CONFIG["firebase_flush_interval_seconds"],
+                                    max_batch=CONFIG["firebase_max_batch"],
+                                    retry_interval=CONFIG["firebase_retry_interval_seconds"])
+        firebase.start()
+
+        # Seri porttan gelen satırları sürekli okuyan AT katmanını başlat
+        at_transport = ATTransport(ser)
+        at_transport.start()
+        modem = ModemManager(at_transport)
+        modem.start()
+        bring_up = create_bring_up(modem, functools.partial(press_power_key, power_key), CONFIG)
+
+        # SIM7600 modülünü hazırla: zaten açıksa güç anahtarı atlanır, hazır olma durumu AT/URC ile izlenir
+        try:
+            bring_up.run()
+        except RuntimeError as e:
+            log.error("%s", e)
             sys.exit(1)
-        
-        time.sleep(2)
+
+        # Modem hazır; Firebase'e ulaşılamazsa olaylar alarm SMS'lerinin arkasında, GPS sorgularının önünde gönderilir
+        sms_failover = create_sms_failover(CONFIG, firebase, functools.partial(modem.send_short_message, priority=PRIORITY_NORMAL))
+        if sms_failover is not None:
+            sms_failover.start()
 
         # GPS'i bir kez etkinleştir (ana döngüden önce)
-        print("GPS modülü etkinleştiriliyor...")
-        # AT+CGPS=1,1: GPS'i aç, konum bilgilerini sorgulanabilir yap
-        if not send_at('AT+CGPS=1,1','OK',10): # Daha uzun timeout verilebilir
-            print("HATA: GPS modülü etkinleştirilemedi. GPS fonksiyonları çalışmayabilir.")
+        log.info("GPS modülü etkinleştiriliyor...")
+        # AT+CGPS=1,1: GPS'i aç, konum bilgilerini sorgulanabilir yap (zaten açıksa modül hata döndürür)
+        with bring_up.phase("gps"):
+            gps_enabled = send_at('AT+CGPS=1,1','OK',10)
+        if not gps_enabled:
+            log.error("GPS modülü etkinleştirilemedi. GPS fonksiyonları çalışmayabilir.")
             # GPS etkinleşmese bile diğer fonksiyonlara devam edebiliriz, ancak bu bir uyarıdır.
         else:
-            print("GPS modülü başarıyla etkinleştirildi.")
-            time.sleep(5) # GPS'in ilk kilitlenmesi için biraz daha bekle
-
-        # Konfigürasyon değerlerini değişkene ata
-        camera_width = CONFIG["camera_width"]
-        camera_height = CONFIG["camera_height"]
-        detection_count_threshold = CONFIG["detection_count_threshold"]
-        output_base_folder = CONFIG["output_base_folder"]
-        photo_capture_delay_seconds = CONFIG["photo_capture_delay_seconds"]
-        fire_alert_filename_prefix = CONFIG["fire_alert_filename_prefix"]
-        buffer_max_size = CONFIG["buffer_max_size"]
-        # Güvenirlik seviyelerini büyükten küçüğe sırala (öncelik sırası için)
-        confidence_levels = sorted(CONFIG["confidence_levels"], key=lambda x: x["threshold"], reverse=True)
-        
-        call_threshold = CONFIG["call_threshold"]
-        sms_threshold = CONFIG["sms_threshold"]
-        phone_number = CONFIG["phone_number"]
-        sms_message = CONFIG["sms_message"]
-
-        cumulative_fire_detections = 0
-        fire_alert_triggered = False
-        call_triggered_for_current_alert = False
-        sms_triggered_for_current_alert = False
-        detected_frames_buffer = []
-
-        while not fire_alert_triggered:
-            jpeg_bytes = capture_photo_to_memory(camera_width, camera_height)
-            
-            if jpeg_bytes is None:
-                print("Belleğe fotoğraf çekme hatası nedeniyle program sonlandırılıyor.")
-                break
-
-            # Bellekten alınan JPEG baytlarını OpenCV görüntüsüne dönüştür
-            frame = cv2.imdecode(np.frombuffer(jpeg_bytes, np.uint8), cv2.IMREAD_COLOR)
-            
-            if frame is None:
-                print("Hata: Bellekteki fotoğraf verisi okunamadı veya çözülemedi.")
-                time.sleep(photo_capture_delay_seconds)
-                continue
-
-            # YOLO modeli ile tespiti gerçekleştir
-            results = model(frame, verbose=False)
-
-            current_frame_has_high_confidence_fire = False
-            frame_to_save = frame.copy() # Orijinal kareyi değiştirmeden kopyala
-            highest_confidence_in_frame = 0.0
-
-            fire_detected_this_frame = False
-            detection_category = "no_detection"
-            
-            for r in results:
-                # Tespit kutularını ve etiketleri görüntüye çiz
-                frame_to_save = r.plot()
-
-                for box in r.boxes:
-                    confidence = box.conf.item()
-                    highest_confidence_in_frame = max(highest_confidence_in_frame, confidence)
-                    
-                    if confidence > 0:
-                        fire_detected_this_frame = True
-
-                    # Güvenirlik seviyelerine göre kategoriyi belirle
-                    for level in confidence_levels:
-                        if confidence >= level["threshold"]:
-                            detection_category = level["firebase_tag"]
-                            # En yüksek alarm seviyesi için tampona kaydet
-                            if level["threshold"] == confidence_levels[0]["threshold"]:
-                                current_frame_has_high_confidence_fire = True
-                                detected_frames_buffer.append(frame_to_save.copy())
-                                if len(detected_frames_buffer) > buffer_max_size:
-                                    detected_frames_buffer.pop(0) # Tampon dolarsa en eski kareyi çıkar
-                            break # En yüksek eşiğe ulaştığında diğer seviyeleri kontrol etmeye gerek yok
-                
-                if current_frame_has_high_confidence_fire:
-                    break # Yüksek güvenirlikli yangın tespit edildiğinde diğer sonuçlara bakmaya gerek yok
-
-            # Loglama ve Sayaç Güncelleme
-            if current_frame_has_high_confidence_fire:
-                cumulative_fire_detections += 1
-                print(f"[{time.strftime('%H:%M:%S')}] ALARM seviyesi tespit! Güvenirlik: {highest_confidence_in_frame:.2f} | Kümülatif tespit: {cumulative_fire_detections}/{detection_count_threshold}")
-            elif fire_detected_this_frame:
-                print(f"[{time.strftime('%H:%M:%S')}] Tespit var ({detection_category})! Güvenirlik: {highest_confidence_in_frame:.2f} | Kümülatif tespit: {cumulative_fire_detections}/{detection_count_threshold}")
-                # Düşük seviye tespitlerde kümülatif sayacı sıfırlayabiliriz.
-                # Bu mantık, yüksek güvenirlikli tespit olmadığında sayacı sıfırlıyor.
-                cumulative_fire_detections = 0
-            else:
-                print(f"[{time.strftime('%H:%M:%S')}] Tespit yok veya düşük seviye. Kümülatif tespit: {cumulative_fire_detections}/{detection_count_threshold}")
-                cumulative_fire_detections = 0
-
-
-            # Tespit edilen kareyi doğruluk oranına göre ilgili klasöre kaydet
-            timestamp_file = time.strftime("%Y%m%d_%H%M%S")
-            saved_to_folder = False
-
-            for level in confidence_levels:
-                if highest_confidence_in_frame >= level["threshold"]:
-                    target_folder = os.path.join(output_base_folder, level["folder"])
-                    filename = os.path.join(target_folder, f'{level["prefix"]}_{timestamp_file}_{highest_confidence_in_frame:.2f}.jpg')
-                    cv2.imwrite(filename, frame_to_save)
-                    saved_to_folder = True
-                    break # En uygun klasöre kaydedince döngüden çık
-
-            # --- Arama ve SMS Tetikleme Mantığı ---
-            if fire_detected_this_frame:
-                # Arama eşiği aşıldıysa ve daha önce tetiklenmediyse arama yap
-                if highest_confidence_in_frame >= call_threshold and not call_triggered_for_current_alert:
-                    print(f"Güvenirlik {highest_confidence_in_frame:.2f} >= Arama Eşiği {call_threshold}. Arama başlatılıyor...")
-                    if make_call(phone_number):
-                        call_triggered_for_current_alert = True
-                
-                # SMS eşiği aşıldıysa ve daha önce tetiklenmediyse SMS gönder
-                if highest_confidence_in_frame >= sms_threshold and not sms_triggered_for_current_alert:
-                    print(f"Güvenirlik {highest_confidence_in_frame:.2f} >= SMS Eşiği {sms_threshold}. SMS gönderiliyor...")
-                    if send_short_message(phone_number, sms_message):
-                        sms_triggered_for_current_alert = True
-            else:
-                # Yangın tespit edilmediğinde iletişim tetikleme bayraklarını sıfırla
-                call_triggered_for_current_alert = False
-                sms_triggered_for_current_alert = False
-
-
-            # --- Firebase'e Veri Gönderimi (Her Karede Güncel Durum ve Yangın Tespitinde Olay Kaydı) ---
-            latitude, longitude, gps_timestamp = get_gps_position_from_module()
-            
-            # Her karede güncel sistem durumunu Firebase'e gönder (PUT)
-            # path'ler FIREBASE_URL'ye göre göreceli olmalı (örn. "current_system_status")
-            current_system_status_data = {
-                "system_time": datetime.now().isoformat(),
-                "last_processed_frame_confidence": f"{highest_confidence_in_frame:.2f}",
-                "last_processed_frame_category": detection_category,
-                "fire_detected_in_last_frame": fire_detected_this_frame,
-                "gps": {
-                    "latitude": latitude if latitude is not None else "N/A",
-                    "longitude": longitude if longitude is not None else "N/A",
-                    "timestamp": gps_timestamp if gps_timestamp else datetime.now().isoformat()
-                },
-                "cumulative_fire_detections": cumulative_fire_detections,
-                "fire_alert_triggered": fire_alert_triggered
-            }
-            send_to_firebase("current_system_status", current_system_status_data)
-            print(f"Firebase'e güncel sistem durumu gönderildi (yangın tespit: {fire_detected_this_frame}).")
-
-
-            if fire_detected_this_frame: # Sadece yangın tespit edildiğinde ayrıca bir olay kaydı ekle (POST)
-                firebase_event_data = {
-                    "detection_time": datetime.now().isoformat(),
-                    "confidence": f"{highest_confidence_in_frame:.2f}",
-                    "category": detection_category,
-                    "gps": {
-                        "latitude": latitude if latitude is not None else "N/A",
-                        "longitude": longitude if longitude is not None else "N/A",
-                        "timestamp": gps_timestamp if gps_timestamp else datetime.now().isoformat()
-                    }
-                }
-                push_to_firebase("fire_detections", firebase_event_data)
-                # Eğer ALARM seviyesindeyse en son alarm detayını da güncelleyebiliriz
-                if current_frame_has_high_confidence_fire:
-                    send_to_firebase("current_status/last_alarm_details", firebase_event_data)
-
-            # Kümülatif ALARM eşiğine ulaşıldı mı?
-            if cumulative_fire_detections >= detection_count_threshold and not fire_alert_triggered:
-                print("\n" + "="*60)
-                print("!!! KÜMÜLATİF YÜKSEK GÜVENİLİRLİKLİ YANGIN ALARMI TETİKLENDİ! SİSTEM DURDURULUYOR. !!!")
-                print(f"'{len(detected_frames_buffer)}' adet ALARM seviyesi tespit kaydediliyor...")
-                print("="*60 + "\n")
-                
-                fire_alert_triggered = True
-                
-                alert_output_folder = os.path.join(output_base_folder, confidence_levels[0]["folder"])
-                
-                for idx, buffered_frame in enumerate(detected_frames_buffer):
-                    alert_photo_filename = os.path.join(alert_output_folder, f'{fire_alert_filename_prefix}_ALARM_ANIT_part{idx+1}_{timestamp_file}.jpg')
-                    cv2.imwrite(alert_photo_filename, buffered_frame)
-                    print(f"Alarm anı fotoğrafı '{alert_photo_filename}' kaydedildi.")
-                
-                # Alarm tetiklendiğinde Firebase'e özel bir durum gönder
-                latitude, longitude, gps_timestamp = get_gps_position_from_module()
-                alarm_data = {
-                    "alarm_time": datetime.now().isoformat(),
-                    "message": "CUMULATIVE HIGH CONFIDENCE FIRE ALERT TRIGGERED!",
-                    "final_confidence": f"{highest_confidence_in_frame:.2f}",
-                    "gps": {
-                        "latitude": latitude if latitude is not None else "N/A",
-                        "longitude": longitude if longitude is not None else "N/A",
-                        "timestamp": gps_timestamp if gps_timestamp else datetime.now().isoformat()
-                    }
-                }
-                push_to_firebase("system_alerts", alarm_data) # Yeni bir alarm kaydı olarak ekle
-                send_to_firebase("current_status/system_alarm_status", {"status": "ACTIVE", "last_alarm_time": datetime.now().isoformat(), "triggered_by_confidence": f"{highest_confidence_in_frame:.2f}"})
-
-                break # Ana döngüden çık
-            
-            # cv2.imshow("Anlik Yangin Tespit Sistemi", frame_to_save)
-            # # 'q' tuşuna basıldığında döngüyü sonlandır
-            # if cv2.waitKey(1) & 0xFF == ord('q'):
-            #     print("Kullanıcı 'q' tuşuna basarak sistemi durdurdu.")
-            #     break
-            
-            time.sleep(photo_capture_delay_seconds)
+            log.info("GPS modülü başarıyla etkinleştirildi.")
+
+        # Konum arka planda takip edilir; tespit döngüsü GPS kilidini beklemez
+        # GPS sorguları rutin öncelikte; alarm SMS'i ve araması kuyrukta önlerine geçer
+        gps_tracker = GpsTracker(functools.partial(send_at, priority=PRIORITY_ROUTINE),
+                                 poll_interval=CONFIG["gps_poll_interval_seconds"],
+                                 stale_after=CONFIG["gps_stale_after_seconds"],
+                                 no_lock_interval=CONFIG["gps_no_lock_interval_seconds"])
+        gps_tracker.start()
+
+        # Her kamera kaynağını bir kez aç (sürekli akış açılamazsa tek çekim moduna düşer)
+        with bring_up.phase("camera"):
+            for camera in camera_configs(CONFIG):
+                frame_source = open_frame_source(capture_config(camera))
+                frame_sources.append((camera, frame_source))
+                log.info("Kare kaynağı [%s]: %s", camera['id'], frame_source.name)
+        with bring_up.phase("model_wait"):
+            model = model_future.result()
+        log.info("%s", bring_up.format_timings())
+
+        run_detection_pipeline(frame_sources, gps_tracker)
 
     except KeyboardInterrupt:
-        print("\nSistem kullanıcı tarafından durduruldu (Ctrl+C).")
+        log.info("Sistem kullanıcı tarafından durduruldu (Ctrl+C).")
     except Exception as e:
-        print(f"Ana döngü sırasında beklenmeyen bir hata oluştu: {e}")
+        log.exception("Ana döngü sırasında beklenmeyen bir hata oluştu: %s", e)
     finally:
         # cv2.imshow kullanılıyorsa, pencereleri kapat
         # cv2.destroyAllWindows() 
-        print("İşlem tamamlandı.")
+        log.info("İşlem tamamlandı.")
+        for camera, frame_source in frame_sources:
+            try:
+                frame_source.close()
+                log.info("Kare kaynağı [%s] kapatıldı.", camera['id'])
+            except Exception as e:
+                log.error("Kare kaynağı [%s] kapatılırken hata: %s", camera['id'], e)
+        if gps_tracker is not None:
+            gps_tracker.stop()
+            log.info("GPS takibi durduruldu.")
+        if sms_failover is not None:
+            sms_failover.stop()
+            log.info("SMS yedek kanalı durduruldu: %s", sms_failover.stats())
+        if image_writer is not None:
+            try:
+                image_writer.stop()
+                log.info("Görüntü kaydedici durduruldu: %s", image_writer.stats())
+            except Exception as e:
+                log.error("Görüntü kaydedici durdurulurken hata: %s", e)
+        if firebase is not None:
+            try:
+                firebase.stop(flush=True)
+                log.info("Firebase yükleyicisi durduruldu: %s", firebase.stats())
+            except Exception as e:
+                log.error("Firebase yükleyicisi durdurulurken hata: %s", e)
+        if event_store is not None:
+            event_store.stop()
+            log.info("Olay kaydı durduruldu: %s", event_store.stats())
+        # Modem kapatma onayı AT ile beklendiği için seri port kapanmadan önce yapılır
+        if bring_up is not None and CONFIG["modem_bringup"]["power_down_on_exit"]:
+            try:
+                power_down(bring_up)
+            except Exception as e:
+                log.error("SIM7600X kapatılırken hata: %s", e)
+        if modem is not None:
+            modem.stop()
+        if at_transport is not None:
+            at_transport.stop()
         if ser and ser.is_open:
             try:
                 ser.close()
-                print("Seri port kapatıldı.")
+                log.info("Seri port kapatıldı.")
             except Exception as e:
-                print(f"Seri port kapatılırken hata: {e}")
-        try:
-            power_down(power_key)
-        except Exception as e:
-            print(f"SIM7600X kapatılırken hata: {e}")
+                log.error("Seri port kapatılırken hata: %s", e)
+        if fake_modem is not None:
+            fake_modem.stop()
         try:
-            GPIO.cleanup()
-            print("GPIO temizlendi.")
+            gpio.cleanup()
+            log.info("GPIO temizlendi.")
         except Exception as e:
-            print(f"GPIO temizlenirken hata: {e}")
+            log.error("GPIO temizlenirken hata: %s", e)
+        if metrics_server is not None:
+            metrics_server.stop()
+        if config_watcher is not None:
+            config_watcher.stop()
 
 if __name__ == "__main__":
     main()
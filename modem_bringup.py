@@ -0,0 +1,195 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+from modem_manager import PRIORITY_NORMAL
+
+
+# --- Hızlı Modem Başlatma ---
+# Sabit 20+5 sn bekleme yerine modül hazır olduğu anda devam edilir: önce 'AT' ile modülün zaten açık olup
+# olmadığı yoklanır (açıksa güç anahtarına basılmaz, basmak modülü kapatırdı). Açılışta RDY, +CPIN: READY ve
+# PB DONE URC'leri dinlenir; SIM ve ağ kaydı kısa aralıklarla, üstel geri çekilmeyle sorgulanır.
+# Her aşamanın süresi başlatma süre dökümü olarak günlüğe yazılır.
+
+BOOT_URCS = ("RDY", "+CPIN: READY", "PB DONE", "SMS DONE")
+REGISTERED_STATUSES = ("1", "5") # +CREG: <n>,<stat> -> 1: kayıtlı (ana ağ), 5: kayıtlı (dolaşım)
+POWER_DOWN_URC = "NORMAL POWER DOWN"
+
+log = logging.getLogger(__name__)
+
+
+def backoff_delays(initial=0.25, maximum=4.0, factor=2.0):
+    """initial, initial*factor, ... maximum'da sabitlenen bekleme süreleri üretir."""
+    delay = initial
+    while True:
+        yield delay
+        delay = min(maximum, delay * factor)
+
+
+class ModemBringUp:
+    """
+    run() modülü kullanıma hazır hale getirir ve aşama sürelerini timings sözlüğünde tutar.
+    press_power_key(hold_seconds): güç anahtarını verilen süre basılı tutan fonksiyon (GPIO).
+    Hata durumunda RuntimeError yükseltilir.
+    """
+
+    def __init__(self, modem, press_power_key, pin_code="", power_on_pulse=2.0, power_off_pulse=3.0, boot_timeout=30,
+                 sim_timeout=15, pb_done_timeout=10, registration_timeout=60, power_down_timeout=20, backoff_initial=0.25,
+                 backoff_max=4.0):
+        self.modem = modem
+        self.press_power_key = press_power_key
+        self.pin_code = pin_code
+        self.power_on_pulse = power_on_pulse
+        self.power_off_pulse = power_off_pulse
+        self.boot_timeout = boot_timeout
+        self.sim_timeout = sim_timeout
+        self.pb_done_timeout = pb_done_timeout
+        self.registration_timeout = registration_timeout
+        self.power_down_timeout = power_down_timeout
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.timings = {}
+        self.already_on = None
+        self.already_off = None
+        self._urcs = {urc: threading.Event() for urc in BOOT_URCS + (POWER_DOWN_URC,)}
+        self._urc_seen = threading.Event() # Herhangi bir açılış URC'si gelince bekleyenleri uyandırır
+        modem.transport.subscribe("", self._on_urc)
+
+    def _on_urc(self, line):
+        for urc, event in self._urcs.items():
+            if line.startswith(urc):
+                event.set()
+                self._urc_seen.set()
+
+    @contextmanager
+    def phase(self, name):
+        """Bloğun süresini başlatma süre dökümüne name adıyla ekler."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.timings[name] = round(time.monotonic() - started, 2)
+
+    def _command(self, command, timeout):
+        return self.modem.command(command, timeout, PRIORITY_NORMAL).result()
+
+    def _poll(self, check, timeout):
+        """check() doğru olana kadar üstel geri çekilmeyle sorgular; bir açılış URC'si beklemeyi kısaltır."""
+        deadline = time.monotonic() + timeout
+        for delay in backoff_delays(self.backoff_initial, self.backoff_max):
+            result = check()
+            if result:
+                return result
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            self._urc_seen.clear()
+            self._urc_seen.wait(min(delay, remaining))
+
+    def probe(self, attempts=3, timeout=0.5):
+        """Modül 'AT' komutuna yanıt veriyorsa (açıksa) True."""
+        return any(self._command("AT", timeout).ok for _ in range(attempts))
+
+    def power_on(self):
+        """Güç anahtarına basar ve modül AT komutlarına yanıt verene kadar bekler."""
+        for event in self._urcs.values():
+            event.clear()
+        with self.phase("power_key"):
+            self.press_power_key(self.power_on_pulse)
+        with self.phase("boot"):
+            # RDY gelmeden önce de AT yanıtlanabilir; hangisi önce olursa
+            if not self._poll(lambda: self._urcs["RDY"].is_set() or self._command("AT", 0.5).ok, self.boot_timeout):
+                raise RuntimeError(f"SIM7600X {self.boot_timeout} sn içinde açılmadı (AT yanıtı veya RDY alınamadı).")
+
+    def power_down(self):
+        """
+        Güç anahtarına basar ve modül kapanana kadar (NORMAL POWER DOWN veya AT yanıtı kesilene kadar) bekler.
+        Önce 'AT' ile yoklanır: modül zaten kapalıysa (örn. açılış zaman aşımından sonra) anahtara basılmaz,
+        basmak modülü açardı; bu durumda already_off True olur.
+        """
+        self._urcs[POWER_DOWN_URC].clear()
+        with self.phase("power_down"):
+            self.already_off = not self.probe()
+            if self.already_off:
+                return True
+            self.press_power_key(self.power_off_pulse)
+            return bool(self._poll(lambda: self._urcs[POWER_DOWN_URC].is_set() or not self._command("AT", 0.5).ok,
+                                   self.power_down_timeout))
+
+    def _sim_status(self):
+        response = self._command("AT+CPIN?", 5)
+        for line in response.lines:
+            if line.startswith("+CPIN:"):
+                return line.split(":", 1)[1].strip()
+        return None
+
+    def unlock_sim(self):
+        """SIM READY olana kadar bekler; PIN isteniyorsa pin_code girilir."""
+        status = self._poll(self._sim_status, self.sim_timeout)
+        if status == "READY":
+            log.info("SIM zaten READY durumunda, PIN kodu girişi gerekli değil.")
+            return
+        if status != "SIM PIN":
+            raise RuntimeError(f"SIM kart hazır değil (durum: {status or 'yanıt yok'}).")
+        log.info("SIM PIN girilmesi gerekiyor...")
+        if not self.pin_code:
+            raise RuntimeError("PIN kodu 'pin_code' değişkenine girilmemiş veya çevre değişkeninden okunamadı. "
+                               "Lütfen kodu düzenleyin veya çevre değişkenini ayarlayın.")
+        if not self._command(f'AT+CPIN="{self.pin_code}"', 5).ok:
+            raise RuntimeError("PIN kodu girişi BAŞARISIZ oldu. Lütfen doğru PIN kodunu girdiğinizden emin olun.")
+        if self._poll(lambda: self._sim_status() == "READY", self.sim_timeout) is None:
+            raise RuntimeError("PIN kodu girildi ancak SIM READY durumuna geçmedi.")
+        log.info("PIN kodu başarıyla girildi.")
+
+    def _registered(self):
+        for line in self._command("AT+CREG?", 3).lines:
+            if line.startswith("+CREG:") and line.split(",")[-1].strip() in REGISTERED_STATUSES:
+                return True
+        return False
+
+    def wait_registration(self):
+        if not self._poll(self._registered, self.registration_timeout):
+            raise RuntimeError("SIM7600X zaman aşımı içinde ağa kaydolamadı. "
+                               "Lütfen SIM kartı, anteni ve sinyal gücünü kontrol edin.")
+        log.info("SIM7600X ağa başarıyla kayıtlı.")
+
+    def run(self):
+        with self.phase("probe"):
+            self.already_on = self.probe()
+        if self.already_on:
+            log.info("SIM7600X zaten açık, güç anahtarı atlandı.")
+        else:
+            log.info("SIM7600X başlatılıyor...")
+            self.power_on()
+            log.info("SIM7600X hazır.")
+        with self.phase("sim"):
+            self.unlock_sim()
+        if not self.already_on:
+            # Telefon defteri hazır olmadan SMS gönderimi başarısız olabilir; gelmezse yalnızca uyarılır
+            with self.phase("pb_done"):
+                if not self._poll(lambda: self._urcs["PB DONE"].is_set(), self.pb_done_timeout):
+                    log.warning("%s sn içinde PB DONE alınamadı, devam ediliyor.", self.pb_done_timeout)
+        with self.phase("registration"):
+            self.wait_registration()
+        return self.timings
+
+    def format_timings(self):
+        total = sum(seconds for name, seconds in self.timings.items() if name != "power_down")
+        phases = " | ".join(f"{name}={seconds:.2f}sn" for name, seconds in self.timings.items())
+        return f"[başlatma süreleri] {phases} | toplam={total:.2f}sn"
+
+
+def create_bring_up(modem, press_power_key, config):
+    """CONFIG["modem_bringup"] ayarlarından modem başlatma akışını oluşturur."""
+    bringup_config = config.get("modem_bringup") or {}
+    return ModemBringUp(modem, press_power_key, pin_code=config.get("pin_code", ""),
+                        power_on_pulse=bringup_config.get("power_on_pulse_seconds", 2.0),
+                        power_off_pulse=bringup_config.get("power_off_pulse_seconds", 3.0),
+                        boot_timeout=bringup_config.get("boot_timeout_seconds", 30),
+                        sim_timeout=bringup_config.get("sim_timeout_seconds", 15),
+                        pb_done_timeout=bringup_config.get("pb_done_timeout_seconds", 10),
+                        registration_timeout=bringup_config.get("registration_timeout_seconds", 60),
+                        power_down_timeout=bringup_config.get("power_down_timeout_seconds", 20),
+                        backoff_initial=bringup_config.get("backoff_initial_seconds", 0.25),
+                        backoff_max=bringup_config.get("backoff_max_seconds", 4.0))
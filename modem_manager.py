@@ -0,0 +1,339 @@
+import queue
+import logging
+import itertools
+import threading
+from concurrent.futures import Future, InvalidStateError
+
+from logs import fields
+
+
+# --- Modem Yöneticisi ---
+# Seri port tek bir iş parçacığı tarafından sahiplenilir. Tüm AT işlemleri öncelikli bir kuyruktan
+# sırayla yürütülür: alarm SMS'i ve araması, rutin GPS sorgularının önüne geçer. Arama ve SMS
+# iş akışları eşzamansız çalışır ve sonuçları Future nesneleriyle döner; tespit döngüsü beklemez.
+
+PRIORITY_ALARM = 0     # Alarm SMS'i / araması
+PRIORITY_NORMAL = 5    # Başlatma ve genel komutlar
+PRIORITY_ROUTINE = 10  # Periyodik GPS sorguları gibi rutin işler
+
+CALL_END_URCS = ("NO CARRIER", "VOICE CALL: END", "BUSY", "NO ANSWER")
+CALL_BEGIN_URC = "VOICE CALL: BEGIN" # Karşı taraf aramayı açtı
+CLCC_ACTIVE = "0" # +CLCC: <id>,<dir>,<stat>,...; stat 0 = görüşme sürüyor (2: çevriliyor, 3: çalıyor)
+
+# Arama sonuçları (call() Future sonucu)
+CALL_ANSWERED = "answered"
+CALL_NO_ANSWER = "no_answer"
+CALL_BUSY = "busy"
+CALL_FAILED = "failed"
+SMS_SINGLE_CHARS = 160 # Metin modunda (GSM 7 bit) tek mesaj
+SMS_PART_CHARS = 153   # Birleştirilmiş mesajın her parçası (UDH başlığından sonra kalan)
+
+log = logging.getLogger(__name__)
+
+
+def split_message(message, single=SMS_SINGLE_CHARS, part=SMS_PART_CHARS):
+    """
+    Mesajı SMS parçalarına böler. single karaktere sığıyorsa tek parça döner; aksi halde parçalar
+    part karakteri aşmaz ve mümkünse satır sonunda, değilse boşlukta bölünür.
+    """
+    if len(message) <= single:
+        return [message]
+    parts = []
+    while len(message) > part:
+        cut = message.rfind("\n", 0, part + 1)
+        if cut < part // 2: # Satır sonu yoksa veya çok erkense boşlukta böl
+            cut = message.rfind(" ", 0, part + 1)
+        if cut <= 0:
+            cut = part
+        parts.append(message[:cut])
+        message = message[cut + 1:] if message[cut] in "\n " else message[cut:]
+    if message:
+        parts.append(message)
+    return parts
+
+
+def call_answered(line):
+    """'+CLCC: 1,0,0,0,0,"+90...",145' satırı sesli görüşmenin açıldığını bildiriyorsa True."""
+    if not line.startswith("+CLCC:"):
+        return False
+    values = [value.strip() for value in line.split(":", 1)[1].split(",")]
+    return len(values) >= 4 and values[2] == CLCC_ACTIVE and values[3] == "0" # mode 0 = ses
+
+
+class _Call:
+    """Süren arama: numara, sonuç Future'ı, zamanlayıcı (çalma veya konuşma süresi) ve açılma durumu."""
+
+    def __init__(self, number, result, talk_seconds):
+        self.number = number
+        self.result = result
+        self.talk_seconds = talk_seconds
+        self.timer = None
+        self.answered = False
+
+
+def _resolve(future, value):
+    """Future henüz tamamlanmadıysa sonucu yazar (birden çok iş parçacığı yarışabilir)."""
+    try:
+        future.set_result(value)
+    except InvalidStateError:
+        pass
+
+
+class ModemManager:
+    """
+    ATTransport üzerinde öncelikli iş kuyruğu.
+    submit(func, priority) ile verilen func(transport) modem iş parçacığında çalışır ve sonucu Future ile döner.
+    Aynı önceliğe sahip işler geliş sırasıyla yürütülür.
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+        self._jobs = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._worker = None
+        self._stop_event = threading.Event()
+        self._call_lock = threading.Lock()
+        self._active_call = None # _Call
+        self._sms_reference = itertools.count() # Birleştirilmiş SMS başvuru numarası (mod 256)
+        self.jobs_done = 0
+        self.jobs_failed = 0
+        transport.subscribe("", self._on_urc)
+
+    # --- Yaşam döngüsü ---
+    def start(self):
+        if self._worker is not None:
+            return
+        self._stop_event.clear()
+        self._worker = threading.Thread(target=self._run, name="modem-manager", daemon=True)
+        self._worker.start()
+
+    def stop(self, timeout=5):
+        self._stop_event.set()
+        self._jobs.put((-1, next(self._sequence), None, None, None))
+        if self._worker is not None:
+            self._worker.join(timeout)
+            self._worker = None
+        with self._call_lock:
+            if self._active_call is not None:
+                self._active_call.timer.cancel()
+                self._active_call = None
+        # Yürütülmemiş işleri iptal et
+        while True:
+            try:
+                _, _, _, _, future = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if future is not None:
+                future.cancel()
+
+    @property
+    def is_open(self):
+        return self.transport.is_open
+
+    def pending_jobs(self):
+        return self._jobs.qsize()
+
+    # --- İş kuyruğu ---
+    def submit(self, func, priority=PRIORITY_NORMAL, name=None):
+        """func(transport) işini kuyruğa ekler ve Future döndürür."""
+        future = Future()
+        self._jobs.put((priority, next(self._sequence), name or getattr(func, "__name__", "job"), func, future))
+        return future
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            _, _, name, func, future = self._jobs.get()
+            if func is None:
+                break
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = func(self.transport)
+            except Exception as e:
+                self.jobs_failed += 1
+                log.error("Modem işi '%s' sırasında hata: %s", name, e)
+                future.set_exception(e)
+                continue
+            self.jobs_done += 1
+            future.set_result(result)
+
+    def command(self, command, timeout=5, priority=PRIORITY_NORMAL):
+        """Tek bir AT komutunu kuyruğa ekler; Future sonucu ATResponse'dur."""
+        return self.submit(lambda transport: transport.command(command, timeout), priority, name=command)
+
+    # --- Arama ---
+    def make_call(self, number, duration=20, priority=PRIORITY_ALARM):
+        """
+        Belirtilen numarayı arar; açılmazsa duration saniye çaldıktan, açılırsa duration saniye konuştuktan sonra kapatır.
+        Future sonucu: arama başlatıldıysa True, aksi halde False.
+        """
+        result = Future()
+        result.set_running_or_notify_cancel()
+        self.call(number, duration, duration, priority).add_done_callback(
+            lambda call: _resolve(result, not call.cancelled() and call.exception() is None and call.result() != CALL_FAILED))
+        return result
+
+    def call(self, number, ring_seconds=20, talk_seconds=20, priority=PRIORITY_ALARM, poll_interval=1.0):
+        """
+        Belirtilen numarayı arar. Arama ring_seconds içinde açılmazsa kapatılır; açılırsa talk_seconds sonra kapatılır.
+        Açılma VOICE CALL: BEGIN veya +CLCC (görüşme sürüyor) ile anlaşılır; +CLCC poll_interval aralıkla sorgulanır.
+        Arama sürerken modem diğer işler (GPS, SMS) için kullanılabilir.
+        Future sonucu: CALL_ANSWERED, CALL_NO_ANSWER, CALL_BUSY veya CALL_FAILED.
+        """
+        result = Future()
+        result.set_running_or_notify_cancel()
+
+        def dial(transport):
+            log.info("Arama yapılıyor: %s", number)
+            response = transport.command(f'ATD{number};', 10)
+            if not response.ok:
+                log.error('Arama başlatılamadı.')
+                _resolve(result, CALL_FAILED)
+                return False
+            log.info("Arama başlatıldı. %s saniye içinde açılmazsa sonlandırılacak (tespit döngüsü devam ediyor).", ring_seconds)
+            call = _Call(number, result, talk_seconds)
+            with self._call_lock:
+                self._active_call = call
+                call.timer = self._start_timer(ring_seconds, self._hang_up, priority)
+            if poll_interval:
+                self._start_timer(poll_interval, self._poll_call, call, priority, poll_interval)
+            return True
+
+        def on_dial_done(dial_future):
+            if dial_future.cancelled() or dial_future.exception() is not None:
+                _resolve(result, CALL_FAILED)
+
+        self.submit(dial, priority, name=f"ATD{number}").add_done_callback(on_dial_done)
+        return result
+
+    @staticmethod
+    def _start_timer(seconds, function, *args):
+        timer = threading.Timer(seconds, function, args=args)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def _poll_call(self, call, priority, poll_interval):
+        # Açılma URC'si gelmeyen ağlar için +CLCC sorgusu; arama bittiyse veya açıldıysa durur
+        def poll(transport):
+            with self._call_lock:
+                if self._active_call is not call or call.answered:
+                    return True
+            response = transport.command("AT+CLCC", 3)
+            if any(call_answered(line) for line in response.lines):
+                self._mark_answered(call, priority)
+            else:
+                self._start_timer(poll_interval, self._poll_call, call, priority, poll_interval)
+            return response.ok
+
+        self.submit(poll, priority, name="AT+CLCC")
+
+    def _mark_answered(self, call, priority):
+        with self._call_lock:
+            if self._active_call is not call or call.answered:
+                return
+            call.answered = True
+            call.timer.cancel()
+            call.timer = self._start_timer(call.talk_seconds, self._hang_up, priority)
+        log.info("Arama açıldı: %s. %s saniye sonra sonlandırılacak.", call.number, call.talk_seconds)
+
+    def _hang_up(self, priority):
+        self.submit(self._hang_up_job, priority, name="AT+CHUP")
+
+    def _hang_up_job(self, transport):
+        with self._call_lock:
+            active = self._active_call
+            self._active_call = None
+        if active is None:
+            return True # Karşı taraf zaten kapattı
+        active.timer.cancel()
+        log.info("Arama sonlandırılıyor...")
+        ok = transport.command('AT+CHUP', 3).ok
+        if ok:
+            log.info('Arama başarıyla sonlandırıldı.')
+        else:
+            log.error('Arama sonlandırılamadı.')
+        _resolve(active.result, CALL_ANSWERED if active.answered else CALL_NO_ANSWER)
+        return ok
+
+    def call_in_progress(self):
+        with self._call_lock:
+            return self._active_call is not None
+
+    def _on_urc(self, line):
+        if line.startswith(CALL_BEGIN_URC) or call_answered(line):
+            with self._call_lock:
+                active = self._active_call
+            if active is not None:
+                self._mark_answered(active, PRIORITY_ALARM)
+            return
+        if line.startswith(CALL_END_URCS):
+            with self._call_lock:
+                active = self._active_call
+                self._active_call = None
+            if active is not None:
+                active.timer.cancel()
+                log.info("Arama karşı taraf tarafından sonlandırıldı (%s): %s", line, active.number)
+                if active.answered:
+                    _resolve(active.result, CALL_ANSWERED)
+                else:
+                    _resolve(active.result, CALL_BUSY if line.startswith("BUSY") else CALL_NO_ANSWER)
+
+    # --- SMS ---
+    def send_short_message(self, number, message, priority=PRIORITY_ALARM):
+        """
+        Belirtilen numaraya kısa mesaj gönderir. Future sonucu: gönderildiyse True.
+        160 karakteri aşan mesajlar aynı iş içinde birleştirilmiş (concatenated) parçalar olarak AT+CMGSEX ile gönderilir.
+        """
+        result = Future()
+        result.set_running_or_notify_cancel()
+        self.send_short_messages([number], message, priority).add_done_callback(
+            lambda sms: _resolve(result, not sms.cancelled() and sms.exception() is None and sms.result()[number]))
+        return result
+
+    def send_short_messages(self, numbers, message, priority=PRIORITY_ALARM, retries=1):
+        """
+        Aynı mesajı numaralara tek modem işinde art arda gönderir (AT+CMGF bir kez ayarlanır, araya başka iş girmez).
+        Gönderilemeyen numaralar sonda retries kez yeniden denenir. Future sonucu: {numara: gönderildiyse True}.
+        """
+        parts = split_message(message)
+        numbers = list(dict.fromkeys(numbers))
+
+        def send(transport):
+            log.debug("SMS modu ayarlanıyor...")
+            if not transport.command("AT+CMGF=1", 1).ok:
+                log.error("SMS modu ayarlanamadı.")
+                return {number: False for number in numbers}
+
+            status = {}
+            remaining = numbers
+            for _ in range(1 + retries):
+                for number in remaining:
+                    status[number] = self._send_parts(transport, number, parts)
+                remaining = [number for number in remaining if not status[number]]
+                if not remaining:
+                    break
+            return status
+
+        return self.submit(send, priority, name=f"SMS {', '.join(numbers)}")
+
+    def _send_parts(self, transport, number, parts):
+        log.info("Kısa Mesaj Gönderiliyor...", extra=fields(number=number, parts=len(parts)))
+        reference = next(self._sms_reference) % 256
+        for index, part in enumerate(parts, start=1):
+            if len(parts) == 1:
+                command = f'AT+CMGS="{number}"'
+            else:
+                command = f'AT+CMGSEX="{number}",{reference},{index},{len(parts)}'
+            # '>' istemi gelince metin ve CTRL+Z gönderilir; modülün OK dönmesi en fazla 20 saniye beklenir
+            response = transport.command(command, timeout=20, payload=part)
+            reply = " ".join(response.text.split()) # Yanıt satırları tek satırda
+            if response.ok:
+                continue
+            if response.timed_out:
+                log.error('Mesaj gönderme hatası (zaman aşımı veya OK alınamadı).', extra=fields(number=number, response=reply, part=index))
+            else:
+                log.error('Mesaj gönderme hatası (modül raporu).', extra=fields(number=number, response=reply, part=index))
+            return False
+        log.info('Mesaj başarıyla gönderildi.', extra=fields(number=number, response=reply))
+        return True
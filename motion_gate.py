@@ -0,0 +1,122 @@
+import time
+
+import numpy as np
+
+
+# --- Hareket / Değişim Ön Filtresi ---
+# Sahne saatlerce değişmediğinde her karede YOLO çalıştırmak gereksizdir. Kare küçültülmüş halde
+# (JPEG'den doğrudan 1/4 ölçekte çözülerek) hareketli ortalama arka plan modeliyle karşılaştırılır ve
+# alev renginde piksel oranı ölçülür. Değişim ya da alev rengi yoksa kare çıkarıma gönderilmez.
+# Zorunlu çıkarım aralığı ve tespit sonrası bekleme süresi, yavaş gelişen dumanın kaçırılmasını önler.
+
+# Alev/kor rengi için HSV aralığı (OpenCV: H 0-179). Parlak turuncu-sarı tonlar.
+FLAME_HSV_LOWER = (0, 120, 180)
+FLAME_HSV_UPPER = (35, 255, 255)
+
+GATE_REASONS = ("first", "unreadable", "forced", "hold", "motion", "flame_color")
+
+
+class MotionGate:
+    """
+    check() kare için (çıkarım_yapılsın_mı, neden) döndürür. Neden:
+    first (ilk kare), unreadable (küçük kare çözülemedi), forced (zorunlu aralık doldu), hold (yakın zamanda tespit vardı),
+    motion (arka plandan farklı piksel oranı yüksek), flame_color (alev rengi oranı yüksek) veya gated (atlandı).
+    """
+
+    def __init__(self, width=160, pixel_threshold=25, min_changed_ratio=0.005, background_alpha=0.05,
+                 flame_min_ratio=0.001, force_interval_seconds=30, hold_seconds=10,
+                 flame_hsv_lower=FLAME_HSV_LOWER, flame_hsv_upper=FLAME_HSV_UPPER):
+        self.width = width
+        self.pixel_threshold = pixel_threshold # Gri seviye farkı bu değeri aşan piksel "değişmiş" sayılır
+        self.min_changed_ratio = min_changed_ratio
+        self.background_alpha = background_alpha # Arka planın yeni kareye uyum hızı (ışık değişimlerini emer)
+        self.flame_min_ratio = flame_min_ratio
+        self.force_interval_seconds = force_interval_seconds
+        self.hold_seconds = hold_seconds
+        self.flame_hsv_lower = np.array(flame_hsv_lower, dtype=np.uint8)
+        self.flame_hsv_upper = np.array(flame_hsv_upper, dtype=np.uint8)
+        self._background = None
+        self._last_inference = None
+        self._last_detection = None
+        self.frames = 0
+        self.gated = 0
+        self.passed = {reason: 0 for reason in GATE_REASONS}
+        self.last_changed_ratio = 0.0
+        self.last_flame_ratio = 0.0
+
+    def _small_image(self, jpeg_bytes=None, frame=None):
+        import cv2 # OpenCV içe aktarımı yavaştır; ilk karede yüklenir
+        if jpeg_bytes is not None:
+            # Tam çözme yerine JPEG'i doğrudan 1/4 ölçekte çöz (DCT ölçekleme, çok daha ucuz)
+            small = cv2.imdecode(np.frombuffer(jpeg_bytes, dtype=np.uint8), cv2.IMREAD_REDUCED_COLOR_4)
+        else:
+            small = frame
+        if small is None:
+            return None
+        if small.shape[1] != self.width:
+            height = max(1, round(small.shape[0] * self.width / small.shape[1]))
+            small = cv2.resize(small, (self.width, height), interpolation=cv2.INTER_AREA)
+        return small
+
+    def notify_detection(self, now=None):
+        """Çıkarım aşaması tespit bulduğunda çağırır; hold_seconds boyunca kareler filtrelenmez."""
+        self._last_detection = time.monotonic() if now is None else now
+
+    def check(self, jpeg_bytes=None, frame=None, now=None):
+        now = time.monotonic() if now is None else now
+        self.frames += 1
+        small = self._small_image(jpeg_bytes, frame)
+        if small is None:
+            return self._pass("unreadable", now) # Küçültülemeyen kare filtrelenmez; karar çözme/çıkarıma bırakılır
+
+        import cv2
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        if self._background is None or self._background.shape != gray.shape:
+            self._background = gray.astype(np.float32)
+            return self._pass("first", now)
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+        self.last_changed_ratio = cv2.countNonZero(cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)[1]) / diff.size
+        cv2.accumulateWeighted(gray, self._background, self.background_alpha)
+
+        flame_mask = cv2.inRange(cv2.cvtColor(small, cv2.COLOR_BGR2HSV), self.flame_hsv_lower, self.flame_hsv_upper)
+        self.last_flame_ratio = cv2.countNonZero(flame_mask) / flame_mask.size
+
+        if self._last_detection is not None and now - self._last_detection < self.hold_seconds:
+            return self._pass("hold", now)
+        if self.last_changed_ratio >= self.min_changed_ratio:
+            return self._pass("motion", now)
+        if self.last_flame_ratio >= self.flame_min_ratio:
+            return self._pass("flame_color", now)
+        if self.force_interval_seconds and now - self._last_inference >= self.force_interval_seconds:
+            return self._pass("forced", now)
+        self.gated += 1
+        return False, "gated"
+
+    def _pass(self, reason, now):
+        self.passed[reason] += 1
+        self._last_inference = now
+        return True, reason
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "gated": self.gated,
+            "gated_ratio": round(self.gated / self.frames, 3) if self.frames else 0.0,
+            "passed": dict(self.passed),
+            "last_changed_ratio": round(self.last_changed_ratio, 4),
+            "last_flame_ratio": round(self.last_flame_ratio, 4),
+        }
+
+    def format_stats(self):
+        s = self.stats()
+        passed = " ".join(f"{reason}={count}" for reason, count in s["passed"].items())
+        return f"[ön filtre] kare={s['frames']} atlanan={s['gated']} ({s['gated_ratio']:.0%}) geçen: {passed}"
+
+
+def create_motion_gate(config):
+    """CONFIG["motion_gate"] ayarlarından ön filtreyi oluşturur; devre dışıysa None döndürür."""
+    gate_config = dict(config.get("motion_gate") or {})
+    if not gate_config.pop("enabled", False):
+        return None
+    return MotionGate(**gate_config)
@@ -0,0 +1,350 @@
+import math
+import time
+import logging
+import threading
+from collections import deque
+
+import metrics
+
+
+# --- Çok Aşamalı İşlem Hattı ---
+# Her aşama kendi iş parçacığında çalışır ve aşamalar sınırlı kuyruklarla birbirine bağlanır.
+# OpenCV ve YOLO çıkarımı GIL'i bıraktığı için aşamalar gerçekten paralel ilerler.
+
+_CLOSED = object() # Kuyruk kapatıldı ve boşaldı işareti
+
+log = logging.getLogger(__name__)
+QUEUE_DEPTH = metrics.gauge("pipeline_queue_depth", "Aşamalar arası kuyruktaki öğe sayısı", ("pipeline", "queue"))
+QUEUE_DROPPED = metrics.counter("pipeline_queue_dropped", "Kuyruk dolu olduğu için atılan en eski öğeler",
+                                ("pipeline", "queue"))
+STAGE_ERRORS = metrics.counter("pipeline_stage_errors", "Aşama fonksiyonunda oluşan hatalar", ("pipeline", "stage"))
+
+
+def percentile(sorted_values, fraction):
+    """Sıralı listede en yakın sıra yöntemiyle yüzdelik değeri döndürür (fraction: 0-1)."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class StageQueue:
+    """
+    Aşamalar arasındaki sınırlı kuyruk.
+    drop_oldest=True ise kuyruk dolduğunda en eski öğe atılır (tüketici hep en güncel öğeyi görür),
+    False ise üretici yer açılana kadar bekler.
+    """
+
+    def __init__(self, name, maxsize=1, drop_oldest=True):
+        self.name = name
+        self.maxsize = max(1, int(maxsize))
+        self.drop_oldest = drop_oldest
+        self._items = deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._producers = 0 # Bu kuyruğa yazan aşama sayısı; hepsi bitince kuyruk kapanır
+        self.put_count = 0
+        self.dropped_count = 0
+        self.max_depth = 0
+        self.dropped_metric = None # Pipeline.add_queue tarafından bağlanan ölçüm sayacı
+
+    def put(self, item):
+        """Öğeyi kuyruğa ekler. Kuyruk kapatılmışsa False döndürür."""
+        with self._condition:
+            while len(self._items) >= self.maxsize and not self._closed:
+                if self.drop_oldest:
+                    self._items.popleft()
+                    self.dropped_count += 1
+                    if self.dropped_metric is not None:
+                        self.dropped_metric.inc()
+                else:
+                    self._condition.wait()
+            if self._closed:
+                return False
+            self._items.append(item)
+            self.put_count += 1
+            self.max_depth = max(self.max_depth, len(self._items))
+            self._condition.notify_all()
+            return True
+
+    def get(self):
+        """Sıradaki öğeyi döndürür; kuyruk kapatılıp boşaldıysa _CLOSED döndürür."""
+        with self._condition:
+            while not self._items and not self._closed:
+                self._condition.wait()
+            if not self._items:
+                return _CLOSED
+            item = self._items.popleft()
+            self._condition.notify_all()
+            return item
+
+    def get_batch(self, max_items, timeout=0.0):
+        """
+        İlk öğeyi bekler, ardından en fazla timeout saniye boyunca max_items öğeye kadar toplar.
+        Kuyruk kapatılıp boşaldıysa _CLOSED döndürür.
+        """
+        with self._condition:
+            while not self._items and not self._closed:
+                self._condition.wait()
+            if not self._items:
+                return _CLOSED
+            deadline = time.monotonic() + timeout
+            while len(self._items) < max_items and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = [self._items.popleft() for _ in range(min(max_items, len(self._items)))]
+            self._condition.notify_all()
+            return batch
+
+    def add_producer(self):
+        with self._condition:
+            self._producers += 1
+
+    def close(self, discard=False):
+        """
+        Bir üreticinin işinin bittiğini bildirir; kuyruk son üretici de bitince kapanır.
+        discard=True ise kuyruk hemen kapatılır ve bekleyen öğeler de atılır.
+        """
+        with self._condition:
+            self._producers -= 1
+            if discard or self._producers <= 0:
+                self._closed = True
+            if discard:
+                self._items.clear()
+            self._condition.notify_all()
+
+    def depth(self):
+        with self._condition:
+            return len(self._items)
+
+    def stats(self):
+        return {
+            "depth": self.depth(),
+            "maxsize": self.maxsize,
+            "max_depth": self.max_depth,
+            "put": self.put_count,
+            "dropped": self.dropped_count,
+            "policy": "drop_oldest" if self.drop_oldest else "block",
+        }
+
+
+class Stage:
+    """
+    Tek bir işlem aşaması. Kaynak aşaması (source) bir yineleyiciden öğe üretir;
+    diğer aşamalar giriş kuyruğundan öğe alıp func(item) sonucunu çıkış kuyruklarına iletir.
+    func None döndürürse öğe ileri aktarılmaz.
+    interval yalnızca kaynak aşamalarında kullanılır: iki öğe arasındaki en kısa süre (saniye) ya da
+    her öğeden sonra bu süreyi döndüren çağrılabilir nesne (örn. uyarlamalı zamanlayıcı).
+    batch_size verilirse func tek öğe yerine en fazla batch_size öğelik bir liste alır (ilk öğeden sonra
+    en fazla batch_timeout saniye beklenir) ve sonuç listesi döndürür; None olan sonuçlar iletilmez.
+    Yüzdelik gecikmeler son latency_window öğe (toplu aşamada parti) üzerinden hesaplanır.
+    """
+
+    def __init__(self, name, func=None, input_queue=None, output_queues=(), source=None, interval=0,
+                 batch_size=None, batch_timeout=0.0, latency_window=1000):
+        if (source is None) == (input_queue is None):
+            raise ValueError(f"'{name}' aşaması için ya source ya da input_queue verilmelidir.")
+        self.name = name
+        self.func = func
+        self.source = source
+        self.input_queue = input_queue
+        self.output_queues = list(output_queues)
+        for q in self.output_queues:
+            q.add_producer()
+        self.interval = interval
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.batches = 0
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.pipeline_name = "" # Ölçüm etiketi; Pipeline.add_stage tarafından atanır
+        self._latencies = deque(maxlen=latency_window)
+        self.started_at = None
+        self.stopped_at = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name=f"stage-{self.name}", daemon=True)
+        self._thread.start()
+
+    def request_stop(self):
+        self._stop_event.set()
+
+    def _forward(self, item):
+        for q in self.output_queues:
+            q.put(item)
+
+    def _run(self):
+        try:
+            if self.source is not None:
+                self._run_source()
+            else:
+                self._run_worker()
+        finally:
+            self.stopped_at = time.monotonic()
+            # Aşağı akıştaki aşamalar kalan öğeleri işleyip kendiliğinden dursun
+            for q in self.output_queues:
+                q.close()
+
+    def _run_source(self):
+        iterator = iter(self.source)
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            except Exception as e:
+                self.errors += 1
+                STAGE_ERRORS.labels(pipeline=self.pipeline_name, stage=self.name).inc()
+                log.exception("'%s' aşamasında hata: %s", self.name, e)
+                break
+            latency = time.monotonic() - started
+            self.busy_seconds += latency
+            self._latencies.append(latency)
+            if self._stop_event.is_set():
+                break
+            if item is None:
+                continue
+            if self.func is not None:
+                item = self.func(item)
+                if item is None:
+                    continue
+            self.processed += 1
+            self._forward(item)
+            interval = self.interval() if callable(self.interval) else self.interval
+            if interval:
+                # Bekleme süresi meşguliyete sayılmaz; durdurma isteği beklemeyi hemen keser
+                self._stop_event.wait(max(0.0, interval - (time.monotonic() - started)))
+
+    def _run_worker(self):
+        while True:
+            if self.batch_size:
+                item = self.input_queue.get_batch(self.batch_size, self.batch_timeout)
+            else:
+                item = self.input_queue.get()
+            if item is _CLOSED:
+                break
+            started = time.monotonic()
+            try:
+                result = self.func(item)
+            except Exception as e:
+                self.errors += 1
+                STAGE_ERRORS.labels(pipeline=self.pipeline_name, stage=self.name).inc()
+                log.exception("'%s' aşamasında beklenmedik hata: %s", self.name, e)
+                continue
+            finally:
+                latency = time.monotonic() - started
+                self.busy_seconds += latency
+                self._latencies.append(latency)
+            if self.batch_size:
+                self.batches += 1
+                self.processed += len(item)
+                for single in result or ():
+                    if single is not None:
+                        self._forward(single)
+                continue
+            self.processed += 1
+            if result is not None:
+                self._forward(result)
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stats(self):
+        end = self.stopped_at or time.monotonic()
+        elapsed = max(end - self.started_at, 1e-9) if self.started_at else 0.0
+        latencies = sorted(self._latencies)
+        return {
+            "processed": self.processed,
+            "errors": self.errors,
+            "throughput_fps": round(self.processed / elapsed, 3) if elapsed else 0.0,
+            "avg_latency_ms": round(1000 * self.busy_seconds / self.processed, 2) if self.processed else 0.0,
+            "p50_latency_ms": round(1000 * percentile(latencies, 0.50), 2),
+            "p95_latency_ms": round(1000 * percentile(latencies, 0.95), 2),
+            "p99_latency_ms": round(1000 * percentile(latencies, 0.99), 2),
+            # Doluluk oranı 1'e yakın olan aşama darboğazdır
+            "utilization": round(self.busy_seconds / elapsed, 3) if elapsed else 0.0,
+            "input_queue": self.input_queue.name if self.input_queue else None,
+            "avg_batch": round(self.processed / self.batches, 2) if self.batches else None,
+        }
+
+
+class Pipeline:
+    """Aşamaları ve kuyrukları bir arada başlatan, durduran ve ölçen işlem hattı."""
+
+    def __init__(self, name="pipeline"):
+        self.name = name
+        self.stages = []
+        self.queues = []
+
+    def add_queue(self, name, maxsize=1, drop_oldest=True):
+        q = StageQueue(name, maxsize, drop_oldest)
+        QUEUE_DEPTH.labels(pipeline=self.name, queue=name).set_function(q.depth)
+        q.dropped_metric = QUEUE_DROPPED.labels(pipeline=self.name, queue=name)
+        self.queues.append(q)
+        return q
+
+    def add_stage(self, name, func=None, input_queue=None, output_queues=(), source=None, interval=0,
+                  batch_size=None, batch_timeout=0.0):
+        stage = Stage(name, func, input_queue=input_queue, output_queues=output_queues,
+                      source=source, interval=interval, batch_size=batch_size, batch_timeout=batch_timeout)
+        stage.pipeline_name = self.name
+        self.stages.append(stage)
+        return stage
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self, drain=True):
+        """
+        Kaynak aşamalarını durdurur. drain=True ise kuyruklardaki öğeler işlenerek
+        hat doğal olarak boşalır; False ise bekleyen öğeler atılır.
+        """
+        for stage in self.stages:
+            if stage.source is not None:
+                stage.request_stop()
+                if not drain:
+                    for q in stage.output_queues:
+                        q.close(discard=True)
+        if not drain:
+            for q in self.queues:
+                q.close(discard=True)
+
+    def join(self, timeout=None):
+        """Tüm aşamalar bitene kadar (veya zaman aşımına kadar) bekler. Hat bittiyse True."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for stage in self.stages:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            stage.join(remaining)
+        return not self.is_running()
+
+    def is_running(self):
+        return any(stage.is_alive() for stage in self.stages)
+
+    def stats(self):
+        stage_stats = {stage.name: stage.stats() for stage in self.stages}
+        queue_stats = {q.name: q.stats() for q in self.queues}
+        bottleneck = max(stage_stats, key=lambda name: stage_stats[name]["utilization"]) if stage_stats else None
+        return {"stages": stage_stats, "queues": queue_stats, "bottleneck": bottleneck}
+
+    def format_stats(self):
+        stats = self.stats()
+        lines = [f"[{self.name}] darboğaz: {stats['bottleneck']}"]
+        for name, s in stats["stages"].items():
+            lines.append(f"  {name:<12} işlenen={s['processed']:<6} fps={s['throughput_fps']:<7} "
+                         f"ort={s['avg_latency_ms']}ms p95={s['p95_latency_ms']}ms doluluk={s['utilization']:.0%} hata={s['errors']}")
+        for name, q in stats["queues"].items():
+            lines.append(f"  kuyruk {name:<10} derinlik={q['depth']}/{q['maxsize']} en_fazla={q['max_depth']} "
+                         f"atılan={q['dropped']} ({q['policy']})")
+        return "\n".join(lines)
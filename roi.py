@@ -0,0 +1,289 @@
+import os
+import sys
+import json
+import time
+import argparse
+from collections import deque
+
+import numpy as np
+
+from inference import Detections, box_iou, nms
+
+
+# --- İlgi Bölgesi (ROI) ve Karolu Çıkarım ---
+# Uzaktaki küçük duman bulutları 640x480 karenin tamamı modele verildiğinde yalnızca birkaç piksel kaplar.
+# ROI modu gökyüzü gibi ilgisiz alanları çokgen maskeyle siler ve kareyi ROI'nin sınırlayıcı dikdörtgenine
+# kırpar. Karolu mod yüksek çözünürlüklü kareyi örtüşen karolara böler, tüm karoları tek bir toplu
+# (batch) model çağrısında işler ve kutuları NMS ile birleştirir.
+
+
+class RegionOfInterest:
+    """
+    polygons: çokgen listesi; her çokgen [x, y] köşe listesidir. Tüm değerler 1'den küçük veya eşitse
+    koordinatlar kare boyutuna göre oransal (0-1), aksi halde piksel kabul edilir.
+    Maske her kare boyutu için bir kez oluşturulup önbelleğe alınır.
+    """
+
+    def __init__(self, polygons):
+        if not polygons:
+            raise ValueError("ROI için en az bir çokgen gereklidir.")
+        self.polygons = [np.asarray(polygon, dtype=np.float32).reshape(-1, 2) for polygon in polygons]
+        self.normalized = all(polygon.max() <= 1.0 for polygon in self.polygons)
+        self._cache = {} # (yükseklik, genişlik) -> (maske, (x0, y0, x1, y1))
+
+    def _mask(self, height, width):
+        key = (height, width)
+        if key not in self._cache:
+            import cv2 # OpenCV içe aktarımı yavaştır; ilk kullanımda yüklenir
+            scale = np.array([width, height], dtype=np.float32) if self.normalized else np.ones(2, dtype=np.float32)
+            points = [np.round(polygon * scale).astype(np.int32) for polygon in self.polygons]
+            mask = np.zeros((height, width), dtype=np.uint8)
+            cv2.fillPoly(mask, points, 255)
+            x, y, w, h = cv2.boundingRect(np.concatenate(points))
+            x0, y0 = max(0, x), max(0, y)
+            bounds = (x0, y0, min(width, x + w), min(height, y + h))
+            self._cache[key] = (mask, bounds)
+        return self._cache[key]
+
+    def crop(self, frame):
+        """ROI dışını siyaha boyar, ROI'nin sınırlayıcı dikdörtgenine kırpar; (görüntü, (x0, y0)) döndürür."""
+        import cv2
+        mask, (x0, y0, x1, y1) = self._mask(*frame.shape[:2])
+        cropped = frame[y0:y1, x0:x1]
+        return cv2.bitwise_and(cropped, cropped, mask=mask[y0:y1, x0:x1]), (x0, y0)
+
+    def contains(self, frame_shape, boxes):
+        """Merkezi ROI içinde kalan kutular için True olan (N,) dizi döndürür."""
+        mask, _ = self._mask(*frame_shape[:2])
+        if not len(boxes):
+            return np.zeros(0, dtype=bool)
+        cx = np.clip(((boxes[:, 0] + boxes[:, 2]) / 2).astype(np.int32), 0, mask.shape[1] - 1)
+        cy = np.clip(((boxes[:, 1] + boxes[:, 3]) / 2).astype(np.int32), 0, mask.shape[0] - 1)
+        return mask[cy, cx] > 0
+
+
+def tile_grid(width, height, tile_size, overlap=0.2):
+    """
+    width x height görüntüyü kapsayan, komşularıyla overlap oranında örtüşen tile_size boyutlu
+    karoların (x0, y0, x1, y1) listesini döndürür. Son karolar kenara hizalanır.
+    """
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        stride = max(1, int(tile_size * (1 - overlap)))
+        positions = list(range(0, length - tile_size, stride))
+        positions.append(length - tile_size)
+        return positions
+
+    return [(x, y, min(x + tile_size, width), min(y + tile_size, height))
+            for y in starts(height) for x in starts(width)]
+
+
+class RegionDetector:
+    """
+    Modeli ROI ve/veya karolu modda çalıştırıp tek bir Detections döndüren tespit edici.
+    roi None ve tile_size None ise model(frame) ile aynıdır.
+    include_full_frame=True ise karolara ek olarak kırpılmış görüntünün tamamı da aynı toplu çağrıda
+    işlenir; karoya sığmayan büyük alevler de yakalanır.
+    """
+
+    def __init__(self, model, roi=None, tile_size=None, overlap=0.2, include_full_frame=True, nms_iou=0.5,
+                 latency_window=500):
+        self.model = model
+        self.roi = roi
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.include_full_frame = include_full_frame
+        self.nms_iou = nms_iou
+        self._latencies = deque(maxlen=latency_window)
+        self.frames = 0
+        self.images_inferred = 0
+
+    @property
+    def mode(self):
+        if self.roi is not None and self.tile_size:
+            return "roi+tiled"
+        if self.tile_size:
+            return "tiled"
+        return "roi" if self.roi is not None else "full"
+
+    def prepare(self, frame):
+        """Modele verilecek alt görüntülerin listesini ve her birinin tam karedeki sol üst köşesini döndürür."""
+        image, (ox, oy) = self.roi.crop(frame) if self.roi is not None else (frame, (0, 0))
+        height, width = image.shape[:2]
+        if not self.tile_size or (width <= self.tile_size and height <= self.tile_size):
+            return [image], [(ox, oy)]
+        tiles = tile_grid(width, height, self.tile_size, self.overlap)
+        images = [image[y0:y1, x0:x1] for x0, y0, x1, y1 in tiles]
+        origins = [(x0 + ox, y0 + oy) for x0, y0, _, _ in tiles]
+        if self.include_full_frame:
+            images.append(image)
+            origins.append((ox, oy))
+        return images, origins
+
+    def collect(self, frame, results, origins):
+        """prepare() ile hazırlanan görüntülerin model sonuçlarını tam kare koordinatlarında birleştirir."""
+        parts = [Detections.from_result(r, origin) for r, origin in zip(results, origins)]
+        detections = parts[0] if len(parts) == 1 else nms(Detections.concat(parts), self.nms_iou)
+        if self.roi is not None and len(detections):
+            detections = detections.select(self.roi.contains(frame.shape, detections.boxes))
+        if detections.class_names is None:
+            detections.class_names = getattr(self.model, "names", None)
+        return detections
+
+    def detect(self, frame):
+        return detect_batch(self.model, [self], [frame])[0]
+
+    def _record(self, seconds, images):
+        self._latencies.append(seconds)
+        self.frames += 1
+        self.images_inferred += images
+
+    def reset_stats(self):
+        self._latencies.clear()
+        self.frames = 0
+        self.images_inferred = 0
+
+    def stats(self):
+        values = np.array(self._latencies) * 1000 if self._latencies else np.zeros(1)
+        return {
+            "mode": self.mode,
+            "frames": self.frames,
+            "images_per_frame": round(self.images_inferred / self.frames, 2) if self.frames else 0.0,
+            "mean_ms": round(float(values.mean()), 2),
+            "p95_ms": round(float(np.percentile(values, 95)), 2),
+        }
+
+    def format_stats(self):
+        s = self.stats()
+        return (f"[tespit] mod={s['mode']} kare={s['frames']} kare_başına_görüntü={s['images_per_frame']} "
+                f"ort={s['mean_ms']}ms p95={s['p95_ms']}ms")
+
+
+def detect_batch(model, detectors, frames):
+    """
+    Birden fazla karenin (örn. farklı kameralar) tüm alt görüntülerini tek bir toplu model çağrısında işler.
+    detectors[i], frames[i] için kullanılan tespit edicidir; Detections listesi döndürür.
+    """
+    started = time.perf_counter()
+    prepared = [detector.prepare(frame) for detector, frame in zip(detectors, frames)]
+    batch = [image for images, _ in prepared for image in images]
+    results = model(batch if len(batch) > 1 else batch[0]) # Tüm kameralar ve karolar tek çağrıda
+    if len(results) != len(batch):
+        # Sonuçlar görüntü sırasıyla dilimlenir; eksik sonuç tespitleri yanlış kareye/karoya kaydırırdı
+        raise RuntimeError(f"Model {len(batch)} görüntü için {len(results)} sonuç döndürdü")
+    detections = []
+    position = 0
+    for detector, frame, (images, origins) in zip(detectors, frames, prepared):
+        detections.append(detector.collect(frame, results[position:position + len(images)], origins))
+        position += len(images)
+    elapsed = time.perf_counter() - started
+    for detector, (images, _) in zip(detectors, prepared):
+        detector._record(elapsed, len(images))
+    return detections
+
+
+def create_region_detector(model, config):
+    """CONFIG["roi_polygons"] ve CONFIG["inference_tiling"] ayarlarından tespit ediciyi oluşturur."""
+    polygons = config.get("roi_polygons")
+    tiling = config.get("inference_tiling") or {}
+    return RegionDetector(
+        model,
+        roi=RegionOfInterest(polygons) if polygons else None,
+        tile_size=tiling.get("tile_size") if tiling.get("enabled") else None,
+        overlap=tiling.get("overlap", 0.2),
+        include_full_frame=tiling.get("include_full_frame", True),
+        nms_iou=tiling.get("nms_iou", 0.5),
+    )
+
+
+def capture_config(config):
+    """Karolu mod açıksa kameranın yüksek çözünürlükte açılması için CONFIG'in bir kopyasını döndürür."""
+    tiling = config.get("inference_tiling") or {}
+    if not tiling.get("enabled"):
+        return config
+    return dict(config, camera_width=tiling["capture_width"], camera_height=tiling["capture_height"])
+
+
+# --- Mod Karşılaştırması (gecikme ve duyarlılık) ---
+def load_yolo_labels(label_path, width, height):
+    """YOLO biçimindeki etiket dosyasını ('sınıf cx cy w h', oransal) piksel xyxy kutulara dönüştürür."""
+    if not os.path.exists(label_path):
+        return np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.int32)
+    rows = np.loadtxt(label_path, ndmin=2, dtype=np.float32)
+    if rows.size == 0:
+        return np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.int32)
+    cx, cy, w, h = rows[:, 1] * width, rows[:, 2] * height, rows[:, 3] * width, rows[:, 4] * height
+    return np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1), rows[:, 0].astype(np.int32)
+
+
+def evaluate_modes(model, image_paths, label_folder, polygons=None, tile_size=640, overlap=0.2,
+                   iou_threshold=0.5, conf_threshold=0.25, warmup=2):
+    """
+    Her mod (full, roi, tiled, roi+tiled) için kare başına gecikmeyi ve etiketli kutuların
+    bulunma oranını (recall, IoU >= iou_threshold) hesaplar.
+    """
+    import cv2
+    images = [(path, cv2.imread(path)) for path in image_paths]
+    images = [(path, image) for path, image in images if image is not None]
+    roi = RegionOfInterest(polygons) if polygons else None
+    modes = {"full": RegionDetector(model), "tiled": RegionDetector(model, tile_size=tile_size, overlap=overlap)}
+    if roi is not None:
+        modes["roi"] = RegionDetector(model, roi=roi)
+        modes["roi+tiled"] = RegionDetector(model, roi=roi, tile_size=tile_size, overlap=overlap)
+
+    report = {}
+    for name, detector in modes.items():
+        for _, image in images[:warmup]:
+            detector.detect(image)
+        detector.reset_stats()
+        found = total = 0
+        for path, image in images:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            truth_boxes, truth_classes = load_yolo_labels(os.path.join(label_folder, stem + ".txt"), image.shape[1], image.shape[0])
+            detections = detector.detect(image)
+            keep = detections.confidences >= conf_threshold
+            iou = box_iou(truth_boxes, detections.boxes[keep])
+            iou[truth_classes[:, None] != detections.classes[keep][None, :]] = 0.0
+            total += len(truth_boxes)
+            found += int((iou >= iou_threshold).any(axis=1).sum()) if iou.size else 0
+        stats = detector.stats()
+        report[name] = {
+            "mean_ms": stats["mean_ms"],
+            "p95_ms": stats["p95_ms"],
+            "images_per_frame": stats["images_per_frame"],
+            "recall": round(found / total, 3) if total else None,
+            "labels": total,
+        }
+    return report
+
+
+def main(argv=None):
+    from inference import InferenceBackend
+
+    parser = argparse.ArgumentParser(description="Tam kare, ROI ve karolu çıkarım modlarının gecikme ve duyarlılığını karşılaştırır.")
+    parser.add_argument("--images", required=True, help="Resim klasörü")
+    parser.add_argument("--labels", required=True, help="YOLO biçiminde etiket klasörü (resimle aynı ad, .txt)")
+    parser.add_argument("--roi", default=None, help="ROI çokgenleri JSON dosyası ([[[x, y], ...], ...])")
+    parser.add_argument("--backend", default="pytorch")
+    parser.add_argument("--weights", default="best.pt")
+    parser.add_argument("--tile-size", type=int, default=640)
+    parser.add_argument("--overlap", type=float, default=0.2)
+    parser.add_argument("--conf", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    polygons = None
+    if args.roi:
+        with open(args.roi, "r", encoding="utf-8") as f:
+            polygons = json.load(f)
+    image_paths = sorted(os.path.join(args.images, name) for name in os.listdir(args.images)
+                         if name.lower().endswith((".jpg", ".jpeg", ".png")))
+    model = InferenceBackend(args.backend, args.weights).load()
+    report = evaluate_modes(model, image_paths, args.labels, polygons, args.tile_size, args.overlap,
+                            conf_threshold=args.conf)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
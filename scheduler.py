@@ -0,0 +1,114 @@
+import time
+import logging
+import threading
+
+
+# --- Uyarlamalı Kare Yakalama Zamanlayıcısı ---
+# Sabit bekleme yerine kare aralığı tespit durumuna göre belirlenir: sessiz dönemlerde düşük kare
+# hızında beklenir (CPU ve güç tasarrufu), herhangi bir güvenirlik seviyesine ulaşan tespitte ölçülen
+# işleme süresinin izin verdiği en yüksek hıza çıkılır ve tespit bitince kademeli olarak boşta hızına dönülür.
+# Aralık yakalama başlangıcından ölçülür; işleme süresi aralığın üzerine eklenmez.
+
+MODE_IDLE = "idle"
+MODE_ACTIVE = "active"
+MODE_DECAY = "decay"
+
+log = logging.getLogger(__name__)
+
+
+class CaptureScheduler:
+    """
+    next_interval() iki kare yakalaması arasındaki hedef süreyi (saniye) döndürür.
+    record_processing() çıkarım aşamasının kare başına süresini bildirir (sürdürülebilir en yüksek hız);
+    on_detection(tier_hit) her işlenen karenin sonucunu bildirir.
+    """
+
+    def __init__(self, idle_interval=2.0, min_interval=0.0, hold_seconds=15, decay_seconds=60, ewma_alpha=0.2):
+        self.idle_interval = idle_interval
+        self.min_interval = min_interval
+        self.hold_seconds = hold_seconds # Son tespitten sonra en yüksek hızda kalınan süre
+        self.decay_seconds = decay_seconds # Ardından boşta aralığına doğrusal dönüş süresi
+        self.ewma_alpha = ewma_alpha
+        self._lock = threading.Lock()
+        self._processing_seconds = None # Kare başına işleme süresinin üstel hareketli ortalaması
+        self._last_hit = None
+        self.mode = MODE_IDLE
+        self.mode_changes = 0
+        self.tier_hits = 0
+
+    def update(self, idle_interval, min_interval, hold_seconds, decay_seconds):
+        """Aralık ayarlarını çalışırken değiştirir (ayar yeniden yükleme); ölçülen işleme süresi ve son tespit korunur."""
+        self.idle_interval = idle_interval
+        self.min_interval = min_interval
+        self.hold_seconds = hold_seconds
+        self.decay_seconds = decay_seconds
+        log.info("Kare yakalama aralıkları güncellendi: boşta %.2f sn, en kısa %.2f sn, bekleme %s sn, dönüş %s sn",
+                 idle_interval, min_interval, hold_seconds, decay_seconds)
+
+    def record_processing(self, seconds):
+        with self._lock:
+            if self._processing_seconds is None:
+                self._processing_seconds = seconds
+            else:
+                self._processing_seconds += self.ewma_alpha * (seconds - self._processing_seconds)
+
+    def on_detection(self, tier_hit, now=None):
+        if not tier_hit:
+            return
+        with self._lock:
+            self._last_hit = time.monotonic() if now is None else now
+            self.tier_hits += 1
+
+    def sustainable_interval(self):
+        """Ölçülen işleme süresine göre kareler birikmeden ulaşılabilecek en kısa aralık."""
+        with self._lock:
+            processing = self._processing_seconds or 0.0
+        return min(max(self.min_interval, processing), self.idle_interval)
+
+    def next_interval(self, now=None):
+        now = time.monotonic() if now is None else now
+        fastest = self.sustainable_interval()
+        since_hit = None if self._last_hit is None else now - self._last_hit
+        if since_hit is None or since_hit >= self.hold_seconds + self.decay_seconds:
+            mode, interval = MODE_IDLE, self.idle_interval
+        elif since_hit < self.hold_seconds:
+            mode, interval = MODE_ACTIVE, fastest
+        else:
+            progress = (since_hit - self.hold_seconds) / self.decay_seconds if self.decay_seconds else 1.0
+            mode, interval = MODE_DECAY, fastest + (self.idle_interval - fastest) * progress
+        if mode != self.mode:
+            self.mode_changes += 1
+            log.info("Kare yakalama modu: %s -> %s (aralık %.2f sn)", self.mode, mode, interval)
+            self.mode = mode
+        return interval
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "idle_interval": self.idle_interval,
+            "sustainable_interval": round(self.sustainable_interval(), 3),
+            "processing_ms": round(1000 * (self._processing_seconds or 0.0), 1),
+            "tier_hits": self.tier_hits,
+            "mode_changes": self.mode_changes,
+        }
+
+    def format_stats(self):
+        s = self.stats()
+        return (f"[zamanlayıcı] mod={s['mode']} en_kısa_aralık={s['sustainable_interval']}sn "
+                f"işleme={s['processing_ms']}ms seviye_tespiti={s['tier_hits']}")
+
+
+def scheduler_settings(config):
+    """CONFIG["capture_scheduler"] ayarlarını CaptureScheduler parametrelerine çevirir."""
+    scheduler_config = config["capture_scheduler"]
+    return {
+        "idle_interval": scheduler_config["idle_interval_seconds"],
+        "min_interval": scheduler_config.get("min_interval_seconds", 0.0),
+        "hold_seconds": scheduler_config.get("hold_seconds", 15),
+        "decay_seconds": scheduler_config.get("decay_seconds", 60),
+    }
+
+
+def create_capture_scheduler(config):
+    """CONFIG["capture_scheduler"] ayarlarından zamanlayıcıyı oluşturur."""
+    return CaptureScheduler(**scheduler_settings(config))
@@ -0,0 +1,147 @@
+import json
+import math
+import time
+
+import metrics
+
+
+# --- Değişiklik Odaklı Telemetri ---
+# current_system_status her karede tamamen gönderilmez. Yol başına son gönderilen değerler tutulur; yalnızca
+# eşik (deadband) üstünde değişen alanlar Firebase'e alan yolu olarak yazılır ("…/current_system_status/alarm_state").
+# Sayısal alanlar (güvenirlik, alarm skoru) mutlak farkla, GPS metre cinsinden mesafeyle karşılaştırılır; diğer
+# alanlar eşitlikle. Sessiz dönemlerde heartbeat_seconds aralıkla yalnızca system_time gönderilir (cihaz canlı).
+# İlk gönderim tam nesnedir; Firebase'deki şema (tüm alanlarıyla current_system_status) değişmez.
+
+VOLATILE_FIELDS = ("system_time",) # Her güncellemeye eklenir, tek başına değişiklik sayılmaz
+EARTH_RADIUS_METERS = 6371000.0
+
+TELEMETRY_UPDATES = metrics.counter("telemetry_updates", "Gönderilen durum güncellemeleri (full, delta, heartbeat)", ("kind",))
+TELEMETRY_SUPPRESSED = metrics.counter("telemetry_suppressed", "Değişiklik olmadığı için gönderilmeyen durumlar")
+
+
+def haversine_meters(lat1, lon1, lat2, lon2):
+    """İki enlem/boylam arasındaki büyük daire mesafesi (metre)."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(min(1.0, a)))
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _json_size(value):
+    return len(json.dumps(value, separators=(",", ":")).encode())
+
+
+class TelemetryEncoder:
+    """
+    encode(path, status) her karenin tam durum sözlüğünü alır ve (tür, veri) döndürür:
+    ("full", tam_nesne) ilk gönderimde, ("delta", değişen_alanlar) eşik aşıldığında, ("heartbeat", {"system_time": …})
+    sessiz dönemde heartbeat_seconds dolduğunda, aksi halde (None, None).
+    deadbands: {alan: en küçük mutlak fark}; sayısal metin alanlar ("0.53") da sayı olarak karşılaştırılır.
+    """
+
+    def __init__(self, deadbands=None, gps_deadband_meters=25.0, heartbeat_seconds=300, volatile_fields=VOLATILE_FIELDS):
+        self.deadbands = dict(deadbands or {})
+        self.gps_deadband_meters = gps_deadband_meters
+        self.heartbeat_seconds = heartbeat_seconds
+        self.volatile_fields = tuple(volatile_fields)
+        self._sent = {} # yol -> son gönderilen alan değerleri
+        self._sent_at = {} # yol -> son gönderim zamanı
+        self.frames = 0
+        self.counts = {"full": 0, "delta": 0, "heartbeat": 0, "suppressed": 0}
+        self.bytes_full = 0 # Her karede tam nesne gönderilseydi (gövde baytı)
+        self.bytes_encoded = 0 # Gönderilen gövde baytı
+
+    def encode(self, path, status, now=None):
+        now = time.monotonic() if now is None else now
+        self.frames += 1
+        self.bytes_full += _json_size(status)
+        last = self._sent.get(path)
+        if last is None:
+            kind, payload = "full", dict(status)
+            self._sent[path] = dict(status)
+        else:
+            changed = {field: value for field, value in status.items()
+                       if field not in self.volatile_fields and self._changed(field, last.get(field), value)}
+            if changed:
+                kind, payload = "delta", changed
+                last.update(changed)
+            elif now - self._sent_at[path] >= self.heartbeat_seconds:
+                kind, payload = "heartbeat", {}
+            else:
+                self.counts["suppressed"] += 1
+                TELEMETRY_SUPPRESSED.inc()
+                return None, None
+            for field in self.volatile_fields:
+                if field in status:
+                    payload[field] = last[field] = status[field]
+        self._sent_at[path] = now
+        self.counts[kind] += 1
+        self.bytes_encoded += _json_size(payload)
+        TELEMETRY_UPDATES.labels(kind=kind).inc()
+        return kind, payload
+
+    def _changed(self, field, old, new):
+        if field == "gps":
+            return self._gps_changed(old, new)
+        threshold = self.deadbands.get(field)
+        if threshold is not None:
+            old_number, new_number = _number(old), _number(new)
+            if old_number is not None and new_number is not None:
+                return abs(new_number - old_number) >= threshold
+        return old != new
+
+    def _gps_changed(self, old, new):
+        # Zaman damgası ve konum yaşı her karede değişir; yalnızca konum, bayatlık ve kilit durumu karşılaştırılır
+        if not isinstance(old, dict) or not isinstance(new, dict):
+            return old != new
+        if old.get("stale") != new.get("stale"):
+            return True
+        coordinates = [_number(d.get(key)) for d in (old, new) for key in ("latitude", "longitude")]
+        if None in coordinates:
+            return (old.get("latitude"), old.get("longitude")) != (new.get("latitude"), new.get("longitude"))
+        return haversine_meters(*coordinates) >= self.gps_deadband_meters
+
+    def reset(self, path=None):
+        """Sonraki gönderimi tam nesne yapar (path None ise tüm yollar için)."""
+        if path is None:
+            self._sent.clear()
+            self._sent_at.clear()
+        else:
+            self._sent.pop(path, None)
+            self._sent_at.pop(path, None)
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            **self.counts,
+            "bytes_full": self.bytes_full,
+            "bytes_encoded": self.bytes_encoded,
+            "saved_percent": round(100 * (1 - self.bytes_encoded / self.bytes_full), 1) if self.bytes_full else 0.0,
+        }
+
+    def format_stats(self):
+        s = self.stats()
+        return (f"[telemetri] kare={s['frames']} tam={s['full']} değişiklik={s['delta']} nabız={s['heartbeat']} "
+                f"atlanan={s['suppressed']} gövde={s['bytes_encoded'] / 1024:.1f}KB (tam gönderime göre %{s['saved_percent']} az)")
+
+
+def create_telemetry_encoder(config):
+    """CONFIG["telemetry"] ayarlarından durum kodlayıcısını oluşturur; devre dışıysa None döndürür (her karede tam durum)."""
+    telemetry_config = config.get("telemetry") or {}
+    if not telemetry_config.get("enabled", False):
+        return None
+    return TelemetryEncoder(
+        deadbands={
+            "last_processed_frame_confidence": telemetry_config.get("confidence_deadband", 0.05),
+            "alarm_score": telemetry_config.get("alarm_score_deadband", 0.05),
+        },
+        gps_deadband_meters=telemetry_config.get("gps_deadband_meters", 25.0),
+        heartbeat_seconds=telemetry_config.get("heartbeat_seconds", 300),
+    )
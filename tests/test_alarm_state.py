@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+from alarm_state import (AlarmStateMachine, NotificationLimiter, STATE_ALARM, STATE_COOLDOWN, STATE_IDLE,
+                         STATE_SUSPECT)
+
+
+def window(triggered=False, score=0.0):
+    return SimpleNamespace(triggered=triggered, score=score)
+
+
+def test_state_machine_lifecycle():
+    machine = AlarmStateMachine(alarm_clear_seconds=30, cooldown_seconds=300, suspect_clear_score=0.05)
+    assert machine.update(window(score=0.2), now=0) == (STATE_SUSPECT, (STATE_IDLE, STATE_SUSPECT))
+    assert machine.update(window(triggered=True, score=0.6), now=1) == (STATE_ALARM, (STATE_SUSPECT, STATE_ALARM))
+    assert machine.update(window(score=0.1), now=20) == (STATE_ALARM, None)
+    assert machine.update(window(score=0.0), now=31) == (STATE_COOLDOWN, (STATE_ALARM, STATE_COOLDOWN))
+    # COOLDOWN'da koşul yeniden sağlanırsa aynı olay sürer
+    assert machine.update(window(triggered=True), now=40) == (STATE_ALARM, (STATE_COOLDOWN, STATE_ALARM))
+    assert machine.episode == 1
+    machine.update(window(), now=71)
+    assert machine.update(window(), now=371) == (STATE_IDLE, (STATE_COOLDOWN, STATE_IDLE))
+    assert machine.alarms == 2
+
+
+def test_suspect_clears_back_to_idle():
+    machine = AlarmStateMachine(suspect_clear_score=0.05)
+    machine.update(window(score=0.2), now=0)
+    assert machine.update(window(score=0.01), now=1) == (STATE_IDLE, (STATE_SUSPECT, STATE_IDLE))
+
+
+def allowed_sends(limiter, frames):
+    """frames: (zaman, alarm_active, first_alarm) listesi; izin verilen gönderim sayısını döndürür."""
+    return sum(limiter.allow("call", active, first, now=now) for now, active, first in frames)
+
+
+def test_direct_alarm_allows_initial_and_max_renotifications():
+    limiter = NotificationLimiter(renotify_interval_seconds=10, max_renotifications=3)
+    frames = [(0, True, True)] + [(t, True, False) for t in range(1, 100)]
+    assert allowed_sends(limiter, frames) == 4
+
+
+def test_suspect_to_alarm_upgrade_is_not_a_renotification():
+    limiter = NotificationLimiter(renotify_interval_seconds=10, max_renotifications=3)
+    frames = [(0, False, False), (2, True, True)] + [(t, True, False) for t in range(3, 100)]
+    # Erken (SUSPECT) bildirim + alarm bildirimi + 3 tekrar
+    assert allowed_sends(limiter, frames) == 5
+
+
+def test_revoked_upgrade_is_retried_without_using_a_renotification():
+    limiter = NotificationLimiter(renotify_interval_seconds=10, max_renotifications=3)
+    assert limiter.allow("call", False, now=0)
+    assert limiter.allow("call", True, first_alarm=True, now=2)
+    limiter.revoke("call") # Alarm bildirimi gönderilemedi
+    assert limiter.allow("call", True, now=3) # Aralık beklenmeden yeniden denenir
+    assert not limiter.allow("call", True, now=4)
+    assert allowed_sends(limiter, [(t, True, False) for t in range(5, 100)]) == 3
+
+
+def test_revoked_first_notification_is_retried_and_reset_clears():
+    limiter = NotificationLimiter(renotify_interval_seconds=10, max_renotifications=1)
+    assert limiter.allow("sms", True, first_alarm=True, now=0)
+    limiter.revoke("sms")
+    assert limiter.allow("sms", True, now=1)
+    assert not limiter.allow("sms", True, now=2)
+    limiter.reset()
+    assert limiter.allow("sms", False, now=3)
+    assert limiter.stats()["sent"] == {"sms": 1}
@@ -0,0 +1,59 @@
+import pytest
+
+from alerting import AlertDispatcher, load_recipients, primary_number
+from at_transport import ATTransport
+from fakes import FakeModem
+from modem_manager import CALL_ANSWERED, CALL_NO_ANSWER, ModemManager
+
+ROSTER = [
+    {"name": "nöbetçi", "number": "+905550000001", "call_order": 1},
+    {"name": "şef", "number": "+905550000002", "call_order": 2},
+    {"name": "merkez", "number": "+905550000003", "sms": True},
+]
+
+
+@pytest.fixture
+def fake_modem():
+    fake = FakeModem(pty=False, answer_after={"+905550000002": 0.1}).start()
+    transport = ATTransport(fake.open_port(timeout=0.1))
+    transport.start()
+    manager = ModemManager(transport)
+    manager.start()
+    yield fake, manager
+    manager.stop()
+    transport.stop()
+    fake.stop()
+
+
+def test_load_recipients_and_primary_number():
+    recipients = load_recipients({"recipients": ROSTER})
+    assert [r["name"] for r in recipients] == ["nöbetçi", "şef", "merkez"]
+    assert primary_number(recipients) == "+905550000001"
+    with pytest.raises(ValueError):
+        load_recipients({"recipients": [{"name": "eksik"}]})
+
+
+def test_sms_only_roster_escalation_resolves_true_without_calling():
+    recipients = load_recipients({"recipients": [{"number": "+905550000003"}]})
+    dispatcher = AlertDispatcher(modem=None, recipients=recipients) # Modeme hiç dokunulmamalı
+    assert dispatcher.call_recipients == []
+    assert dispatcher.escalate().result(timeout=1) is True
+    assert dispatcher.stats()["calls"] == 0
+
+
+def test_sms_goes_to_every_sms_recipient(fake_modem):
+    fake, manager = fake_modem
+    dispatcher = AlertDispatcher(manager, load_recipients({"recipients": ROSTER}))
+    assert dispatcher.send_sms("YANGIN").result(timeout=10)
+    assert sorted(number for number, _ in fake.sms_sent) == ["+905550000001", "+905550000002", "+905550000003"]
+    assert set(dispatcher.stats()["last_sms_status"].values()) == {"sent"}
+
+
+def test_escalation_stops_at_first_answer(fake_modem):
+    fake, manager = fake_modem
+    dispatcher = AlertDispatcher(manager, load_recipients({"recipients": ROSTER}), ring_seconds=0.5, talk_seconds=0.2)
+    assert dispatcher.escalate().result(timeout=10)
+    stats = dispatcher.stats()
+    assert stats["last_escalation"] == [("nöbetçi", CALL_NO_ANSWER), ("şef", CALL_ANSWERED)]
+    assert stats["answered_by"] == "şef"
+    assert fake.calls == ["+905550000001", "+905550000002"]
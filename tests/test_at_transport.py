@@ -0,0 +1,75 @@
+import time
+import threading
+
+import pytest
+
+from at_transport import ATTransport, LATE_RESPONSE_GRACE_SECONDS
+from fakes import FakeModem
+
+
+@pytest.fixture
+def modem():
+    fake = FakeModem(pty=False).start()
+    transport = ATTransport(fake.open_port(timeout=0.1))
+    transport.start()
+    yield fake, transport
+    transport.stop()
+    fake.stop()
+
+
+def test_command_completes_on_final_code(modem):
+    fake, transport = modem
+    response = transport.command("AT+CPIN?", timeout=2)
+    assert response.ok
+    assert response.lines == ["+CPIN: READY"]
+    assert not response.timed_out
+
+
+def test_timeout_then_late_final_code_is_ignored(modem):
+    fake, transport = modem
+    fake.response_delay = 0.4
+    response = transport.command("AT", timeout=0.1)
+    assert response.timed_out and response.final is None
+
+    # Geç OK yeni komutu tamamlamamalı; sonraki komut bekleme süresi dolana kadar gönderilmez
+    fake.response_delay = 0.01
+    started = time.monotonic()
+    response = transport.command("AT+CREG?", timeout=2)
+    assert response.ok
+    assert response.lines == ["+CREG: 0,1"]
+    assert transport.late_responses == 1
+    assert time.monotonic() - started >= LATE_RESPONSE_GRACE_SECONDS - 0.15
+
+
+def test_sms_timeout_cancels_text_entry(modem):
+    fake, transport = modem
+    fake.response_delay = 0.3 # '>' istemi zaman aşımından sonra gelir
+    response = transport.command('AT+CMGS="+905551112233"', timeout=0.1, payload="YANGIN")
+    assert response.timed_out
+
+    fake.response_delay = 0.01
+    assert transport.command("AT", timeout=2).ok
+    assert fake.sms_sent == []
+    assert fake.sms_cancelled == 1
+    assert transport.late_responses == 1
+
+
+def test_stray_prompt_does_not_complete_plain_command(modem):
+    fake, transport = modem
+    fake.response_delay = 0.3
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault("response", transport.command("AT", timeout=2)))
+    thread.start()
+    time.sleep(0.1)
+    fake.inject(">") # Önceki bir SMS komutunun geç istemi
+    thread.join(3)
+    assert result["response"].final == "OK"
+    assert transport.late_responses == 1
+    assert fake.received.count("AT") == 1
+
+
+def test_sms_payload_is_sent_after_prompt(modem):
+    fake, transport = modem
+    response = transport.command('AT+CMGS="+905551112233"', timeout=2, payload="YANGIN")
+    assert response.ok
+    assert fake.sms_sent == [("+905551112233", "YANGIN")]
@@ -0,0 +1,64 @@
+import os
+import sys
+
+import pytest
+
+from camera import JpegStreamParser, LibcameraStreamSource
+
+FRAME = b"\xff\xd8" + b"kare" * 16 + b"\xff\xd9"
+
+
+def fake_libcamera_vid(directory, monkeypatch, frames, then):
+    """PATH'in başına, frames kare yazıp ardından then ('sleep' veya 'exit') yapan sahte libcamera-vid koyar."""
+    script = directory / "libcamera-vid"
+    script.write_text(
+        f"#!{sys.executable}\n"
+        "import sys, time\n"
+        f"for _ in range({frames}):\n"
+        f"    sys.stdout.buffer.write({FRAME!r}); sys.stdout.buffer.flush(); time.sleep(0.05)\n"
+        f"{'time.sleep(3600)' if then == 'sleep' else 'pass'}\n"
+    )
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{directory}{os.pathsep}{os.environ['PATH']}")
+
+
+def test_parser_splits_frames_across_chunks():
+    parser = JpegStreamParser()
+    stream = b"\x00\xffgurultu" + FRAME + FRAME
+    frames = []
+    for start in range(0, len(stream), 7):
+        frames.extend(parser.feed(stream[start:start + 7]))
+    assert frames == [FRAME, FRAME]
+
+
+def test_stalled_stream_is_restarted(tmp_path, monkeypatch):
+    fake_libcamera_vid(tmp_path, monkeypatch, frames=1, then="sleep")
+    source = LibcameraStreamSource(64, 48, first_frame_timeout=3, stall_timeout=0.3)
+    source.open()
+    try:
+        assert source.read() == (FRAME, None)
+        # Süreç canlı ama kare üretmiyor: okuma sonsuza dek beklemez, akış yeniden başlatılır
+        assert source.read() == (FRAME, None)
+        assert source.restarts == 1
+    finally:
+        source.close()
+
+
+def test_ended_stream_returns_none(tmp_path, monkeypatch):
+    fake_libcamera_vid(tmp_path, monkeypatch, frames=1, then="exit")
+    source = LibcameraStreamSource(64, 48, first_frame_timeout=3, stall_timeout=0.3)
+    source.open()
+    try:
+        assert source.read() == (FRAME, None)
+        assert source.read() is None
+        assert source.restarts == 0
+    finally:
+        source.close()
+
+
+@pytest.mark.parametrize("then", ["sleep", "exit"])
+def test_open_fails_without_frames(tmp_path, monkeypatch, then):
+    fake_libcamera_vid(tmp_path, monkeypatch, frames=0, then=then)
+    source = LibcameraStreamSource(64, 48, first_frame_timeout=0.3)
+    with pytest.raises(RuntimeError):
+        source.open()
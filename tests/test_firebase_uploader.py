@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from fakes import FakeFirebaseServer
+from firebase_uploader import FIREBASE_EVENTS_SPOOLED, FirebaseUploader
+
+
+def spooled_metric():
+    return FIREBASE_EVENTS_SPOOLED.labels().value
+
+
+@pytest.fixture
+def server():
+    with FakeFirebaseServer() as fake:
+        yield fake
+
+
+@pytest.fixture
+def uploader(server, tmp_path):
+    uploader = FirebaseUploader(server.url + "/veri", str(tmp_path / "spool.jsonl"), timeout=2, retry_interval=60)
+    yield uploader
+    uploader.session.close()
+
+
+def test_flush_sends_state_and_events(server, uploader):
+    uploader.put("current_system_status", {"status": "normal"})
+    key = uploader.push("fire_events", {"confidence": 0.9})
+    assert uploader.flush()
+    assert server.get("veri/current_system_status") == {"status": "normal"}
+    assert server.get(f"veri/fire_events/{key}") == {"confidence": 0.9}
+
+
+def test_failed_flush_spools_events_and_counts_metric(server, uploader):
+    server.fail = True
+    before = spooled_metric()
+    uploader.push("fire_events", {"confidence": 0.9})
+    uploader.push("fire_events", {"confidence": 0.8})
+    assert not uploader.flush()
+    assert uploader.spooled_count() == 2
+    assert uploader.events_spooled == 2
+    assert spooled_metric() - before == 2
+
+    # Bağlantı yokken gelen olaylar da dosyaya yazılır ve sayılır
+    uploader.push("fire_events", {"confidence": 0.7})
+    assert not uploader.flush()
+    assert uploader.spooled_count() == 3
+    assert spooled_metric() - before == 3
+
+
+def test_spooled_events_are_replayed_when_online(server, uploader):
+    server.fail = True
+    keys = [uploader.push("fire_events", {"index": index}) for index in range(3)]
+    uploader.put("current_system_status", {"status": "alarm"})
+    assert not uploader.flush()
+
+    server.fail = False
+    assert uploader.flush(force=True)
+    assert not os.path.exists(uploader.spool_path)
+    assert server.get("veri/current_system_status") == {"status": "alarm"} # Gönderilemeyen durum yeniden kuyruğa alındı
+    assert [server.get(f"veri/fire_events/{key}") for key in keys] == [{"index": index} for index in range(3)]
+
+
+def test_spool_survives_restart(server, tmp_path):
+    spool_path = str(tmp_path / "spool.jsonl")
+    server.fail = True
+    first = FirebaseUploader(server.url + "/veri", spool_path, timeout=2)
+    key = first.push("fire_events", {"confidence": 0.9})
+    assert not first.flush()
+    first.session.close()
+
+    server.fail = False
+    second = FirebaseUploader(server.url + "/veri", spool_path, timeout=2)
+    assert second.spooled_count() == 1
+    assert second.flush()
+    second.session.close()
+    assert server.get(f"veri/fire_events/{key}") == {"confidence": 0.9}
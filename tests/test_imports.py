@@ -0,0 +1,15 @@
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("cv2", "ultralytics", "RPi", "serial")
+
+
+def test_import_main_defers_heavy_dependencies():
+    # Ayrı süreçte: bu test oturumunda başka testler cv2'yi zaten yüklemiş olabilir
+    code = ("import sys, main; "
+            f"print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
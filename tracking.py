@@ -0,0 +1,290 @@
+import os
+import sys
+import json
+import time
+import argparse
+from collections import deque
+
+import numpy as np
+
+from inference import box_iou
+
+
+# --- Zamansal Takip ve Kayan Pencereli Alarm Kararı ---
+# Ardışık kare sayacı tek bir kaçırılmış karede (alev titremesi, dumanın kutuyu örtmesi) sıfırlanır.
+# Bunun yerine kutular IoU ile kareler arasında eşleştirilip takip kimliği alır ve alarm kararı
+# zaman pencereli bir skorla (n karenin k'sı veya üstel ağırlıklı güvenirlik) verilir.
+
+ALARM_MODES = ("k_of_n", "ewma")
+
+
+class Track:
+    """Kareler boyunca aynı nesneye ait kutu dizisi."""
+
+    __slots__ = ("track_id", "box", "confidence", "cls", "first_seen", "last_seen", "hits", "misses")
+
+    def __init__(self, track_id, box, confidence, cls, now):
+        self.track_id = track_id
+        self.box = box
+        self.confidence = confidence
+        self.cls = cls
+        self.first_seen = now
+        self.last_seen = now
+        self.hits = 1
+        self.misses = 0
+
+    @property
+    def duration(self):
+        return self.last_seen - self.first_seen
+
+
+class IoUTracker:
+    """
+    Her karede kutuları mevcut izlerle aynı sınıfta en yüksek IoU'ya göre açgözlü eşleştirir.
+    Eşleşmeyen kutular yeni iz açar; max_missed_frames kare boyunca görülmeyen izler silinir.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_missed_frames=5):
+        self.iou_threshold = iou_threshold
+        self.max_missed_frames = max_missed_frames
+        self.tracks = []
+        self._next_id = 1
+        self.tracks_created = 0
+
+    def update(self, boxes, confidences, classes, now=None):
+        """Kutuları izlerle eşleştirir; her kutunun iz kimliğini (N,) dizi olarak döndürür."""
+        now = time.monotonic() if now is None else now
+        track_ids = np.zeros(len(confidences), dtype=np.int64)
+        matched_tracks = set()
+        if self.tracks and len(confidences):
+            iou = box_iou(np.array([track.box for track in self.tracks]), boxes)
+            iou[np.array([track.cls for track in self.tracks])[:, None] != classes[None, :]] = 0.0
+            for flat_index in np.argsort(-iou, axis=None):
+                t, d = np.unravel_index(flat_index, iou.shape)
+                if iou[t, d] < self.iou_threshold:
+                    break
+                if t in matched_tracks or track_ids[d]:
+                    continue
+                track = self.tracks[t]
+                track.box, track.confidence = boxes[d], float(confidences[d])
+                track.last_seen = now
+                track.hits += 1
+                track.misses = 0
+                matched_tracks.add(t)
+                track_ids[d] = track.track_id
+
+        survivors = []
+        for index, track in enumerate(self.tracks):
+            if index not in matched_tracks:
+                track.misses += 1
+                if track.misses > self.max_missed_frames:
+                    continue
+            survivors.append(track)
+        for d in np.flatnonzero(track_ids == 0):
+            track = Track(self._next_id, boxes[d], float(confidences[d]), int(classes[d]), now)
+            self._next_id += 1
+            self.tracks_created += 1
+            survivors.append(track)
+            track_ids[d] = track.track_id
+        self.tracks = survivors
+        return track_ids
+
+    def get(self, track_id):
+        for track in self.tracks:
+            if track.track_id == track_id:
+                return track
+        return None
+
+    def reset(self):
+        self.tracks = []
+
+
+class SlidingWindowAlarm:
+    """
+    mode="k_of_n": son window_frames kare içinde (ve window_seconds saniyeden yeni) en az min_hits
+    karede ALARM seviyesinde, en az min_track_hits karedir izlenen bir kutu varsa alarm verilir.
+    mode="ewma": ALARM seviyesindeki izlenen kutuların en yüksek güvenirliği üstel ağırlıklı
+    ortalamaya katılır (isabetsiz kare 0 sayılır); ortalama ewma_threshold'u aşınca alarm verilir.
+    """
+
+    def __init__(self, mode="k_of_n", window_frames=20, min_hits=12, window_seconds=60, ewma_alpha=0.3,
+                 ewma_threshold=0.6, min_track_hits=2):
+        if mode not in ALARM_MODES:
+            raise ValueError(f"Bilinmeyen alarm karar modu: '{mode}'. Geçerli değerler: {', '.join(ALARM_MODES)}")
+        self.mode = mode
+        self.window_frames = window_frames
+        self.min_hits = min_hits
+        self.window_seconds = window_seconds
+        self.ewma_alpha = ewma_alpha
+        self.ewma_threshold = ewma_threshold
+        self.min_track_hits = min_track_hits
+        self._window = deque(maxlen=window_frames) # (zaman, isabet)
+        self.ewma = 0.0
+
+    def update(self, alarm_confidence, track_hits, now=None):
+        """
+        alarm_confidence: karedeki ALARM seviyesi kutuların en yüksek güvenirliği (yoksa 0).
+        track_hits: o kutunun izinin kaç karedir görüldüğü. Alarm koşulu sağlanıyorsa True döndürür.
+        """
+        now = time.monotonic() if now is None else now
+        hit = alarm_confidence > 0 and track_hits >= self.min_track_hits
+        self._window.append((now, hit))
+        if self.window_seconds:
+            while self._window and now - self._window[0][0] > self.window_seconds:
+                self._window.popleft()
+        self.ewma += self.ewma_alpha * ((alarm_confidence if hit else 0.0) - self.ewma)
+        return self.triggered
+
+    @property
+    def hits(self):
+        return sum(1 for _, hit in self._window if hit)
+
+    @property
+    def score(self):
+        """0-1 arası alarm skoru: k_of_n modunda isabet/min_hits, ewma modunda ortalama/eşik."""
+        if self.mode == "k_of_n":
+            return min(1.0, self.hits / self.min_hits) if self.min_hits else 1.0
+        return min(1.0, self.ewma / self.ewma_threshold) if self.ewma_threshold else 1.0
+
+    @property
+    def triggered(self):
+        if self.mode == "k_of_n":
+            return self.hits >= self.min_hits
+        return self.ewma >= self.ewma_threshold
+
+    def describe(self):
+        if self.mode == "k_of_n":
+            return f"{self.hits}/{self.min_hits} isabet (son {len(self._window)} kare)"
+        return f"ewma={self.ewma:.2f}/{self.ewma_threshold:.2f}"
+
+    def reset(self):
+        self._window.clear()
+        self.ewma = 0.0
+
+
+def create_tracker(config):
+    """CONFIG["tracker"] ayarlarından kutu takipçisini oluşturur."""
+    tracker_config = config.get("tracker") or {}
+    return IoUTracker(iou_threshold=tracker_config.get("iou_threshold", 0.3),
+                      max_missed_frames=tracker_config.get("max_missed_frames", 5))
+
+
+def create_alarm_window(config):
+    """CONFIG["alarm_decision"] ayarlarından kayan pencereli alarm kararını oluşturur."""
+    return SlidingWindowAlarm(**(config.get("alarm_decision") or {}))
+
+
+# --- Kayıtlı Kayıtlarla Değerlendirme (alarma kadar geçen süre ve yanlış alarm oranı) ---
+def frame_signals(detections_per_frame, alarm_threshold, tracker):
+    """Her kare için (ALARM seviyesindeki en yüksek güvenirlik, o kutunun iz uzunluğu) üretir."""
+    for index, (boxes, confidences, classes) in enumerate(detections_per_frame):
+        track_ids = tracker.update(boxes, confidences, classes, now=float(index))
+        alarm = np.flatnonzero(confidences >= alarm_threshold)
+        if not len(alarm):
+            yield 0.0, 0
+            continue
+        best = alarm[np.argmax(confidences[alarm])]
+        yield float(confidences[best]), tracker.get(int(track_ids[best])).hits
+
+
+def simulate(detections_per_frame, fps, alarm_threshold, tracker_config, decision_config, fire_start_frame=None):
+    """
+    Bir kaydın tespitlerini takip ve alarm kararından geçirir. Zamanlar kayıt zamanıdır (kare / fps).
+    Alarm yangın başlangıcından önce veya yangınsız kayıtta verilirse yanlış alarm sayılır.
+    """
+    tracker = IoUTracker(**tracker_config)
+    alarm = SlidingWindowAlarm(**decision_config)
+    for index, (confidence, hits) in enumerate(frame_signals(detections_per_frame, alarm_threshold, tracker)):
+        if alarm.update(confidence, hits, now=index / fps):
+            false_alarm = fire_start_frame is None or index < fire_start_frame
+            return {
+                "alarm_frame": index,
+                "false_alarm": false_alarm,
+                "time_to_alarm_seconds": None if false_alarm else round((index - fire_start_frame) / fps, 2),
+            }
+    return {"alarm_frame": None, "false_alarm": False, "time_to_alarm_seconds": None}
+
+
+def simulate_consecutive_counter(detections_per_frame, fps, alarm_threshold, count_threshold, fire_start_frame=None):
+    """Eski ardışık kare sayacıyla karşılaştırma (ALARM seviyesi olmayan her karede sıfırlanır)."""
+    counter = 0
+    for index, (_, confidences, _) in enumerate(detections_per_frame):
+        counter = counter + 1 if (confidences >= alarm_threshold).any() else 0
+        if counter >= count_threshold:
+            false_alarm = fire_start_frame is None or index < fire_start_frame
+            return {
+                "alarm_frame": index,
+                "false_alarm": false_alarm,
+                "time_to_alarm_seconds": None if false_alarm else round((index - fire_start_frame) / fps, 2),
+            }
+    return {"alarm_frame": None, "false_alarm": False, "time_to_alarm_seconds": None}
+
+
+def summarize(results, fixtures):
+    fire_runs = [r for r, f in zip(results, fixtures) if f["fire_start_frame"] is not None]
+    detected = [r["time_to_alarm_seconds"] for r in fire_runs if r["time_to_alarm_seconds"] is not None]
+    # Yanlış alarm oranı yangınsız görüntü saatine göre hesaplanır
+    quiet_hours = sum((f["fire_start_frame"] if f["fire_start_frame"] is not None else f["frames"]) / f["fps"]
+                      for f in fixtures) / 3600
+    false_alarms = sum(1 for r in results if r["false_alarm"])
+    return {
+        "fire_fixtures": len(fire_runs),
+        "detected": len(detected),
+        "mean_time_to_alarm_seconds": round(float(np.mean(detected)), 2) if detected else None,
+        "max_time_to_alarm_seconds": round(float(np.max(detected)), 2) if detected else None,
+        "false_alarms": false_alarms,
+        "false_alarms_per_hour": round(false_alarms / quiet_hours, 3) if quiet_hours else None,
+    }
+
+
+def main(argv=None):
+    from camera import ReplaySource
+    from inference import Detections, InferenceBackend
+
+    parser = argparse.ArgumentParser(description="Takip ve kayan pencereli alarm kararını kayıtlı görüntülerde değerlendirir.")
+    parser.add_argument("fixtures", nargs="+",
+                        help="Kare klasörleri. Klasördeki fixture.json: {\"fps\": 1, \"fire_start_frame\": 12} (yangınsızsa null)")
+    parser.add_argument("--backend", default="pytorch")
+    parser.add_argument("--weights", default="best.pt")
+    parser.add_argument("--alarm-threshold", type=float, default=0.5, help="ALARM seviyesi güvenirlik eşiği")
+    parser.add_argument("--decision", default=None, help="alarm_decision ayarları (JSON metni)")
+    parser.add_argument("--tracker", default=None, help="tracker ayarları (JSON metni)")
+    parser.add_argument("--legacy-count", type=int, default=50, help="Karşılaştırma için eski ardışık kare eşiği")
+    args = parser.parse_args(argv)
+
+    decision_config = json.loads(args.decision) if args.decision else {}
+    tracker_config = json.loads(args.tracker) if args.tracker else {}
+    model = InferenceBackend(args.backend, args.weights).load()
+
+    fixtures, per_fixture, legacy = [], [], []
+    for path in args.fixtures:
+        meta_path = os.path.join(path, "fixture.json")
+        meta = {}
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        detections_per_frame = []
+        with ReplaySource(path) as source:
+            for _, frame in source.frames(decode=True):
+                detections = Detections.from_result(model(frame)[0])
+                detections_per_frame.append((detections.boxes, detections.confidences, detections.classes))
+        fixture = {"path": path, "fps": meta.get("fps", 1.0), "fire_start_frame": meta.get("fire_start_frame"),
+                   "frames": len(detections_per_frame)}
+        fixtures.append(fixture)
+        result = simulate(detections_per_frame, fixture["fps"], args.alarm_threshold, tracker_config,
+                          decision_config, fixture["fire_start_frame"])
+        per_fixture.append(dict(result, fixture=os.path.basename(os.path.normpath(path))))
+        legacy.append(simulate_consecutive_counter(detections_per_frame, fixture["fps"], args.alarm_threshold,
+                                                   args.legacy_count, fixture["fire_start_frame"]))
+
+    report = {
+        "sliding_window": summarize(per_fixture, fixtures),
+        "consecutive_counter": summarize(legacy, fixtures),
+        "fixtures": per_fixture,
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())